@@ -7,47 +7,268 @@ This script analyzes the FIGARO-NAM dataset for:
 - Value distributions and outliers
 - Basic statistics per country
 
+With STREAMING (the default) every partition is scanned in Arrow record
+batches of BATCH_SIZE rows into mergeable accumulators (`nam_stats`) on a
+process pool, and the partial results are merged, so memory is bounded by the
+batch size rather than the dataset. Quantiles then come from a KLL sketch
+(rank error below ~1.65% for k=200); EXACT_QUANTILES = True keeps all values
+to verify them. STREAMING = False loads everything into one DataFrame and
+computes every statistic exactly.
+
 Output: Console summary + CSV exports to outputs/
 
 Usage:
     python scripts/01_data_quality.py
 """
 
-import pyarrow.parquet as pq
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_loader
+import nam_parallel
+import nam_scan
+from nam_codes import CODE_TYPES, SET_CODES, code_type_ids
+from nam_stats import ExactQuantiles, GroupedStats, QuantileSketch, RunningStats
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/')
 OUTPUT_PATH.mkdir(exist_ok=True)
 
+STREAMING = True
+BATCH_SIZE = 131_072
+SKETCH_K = 200
+EXACT_QUANTILES = False
+QUANTILES = [0.25, 0.50, 0.75, 0.95, 0.99]
+
 def load_all_data():
-    """Load entire dataset with partition columns."""
+    """Load entire dataset with partition columns.
+
+    Code and partition columns are kept as categoricals (integer codes).
+    """
     print("Loading all data...")
-    df = pq.read_table(DATA_PATH).to_pandas()
+    df = nam_loader.load(data_path=DATA_PATH, categorical=True)
     print(f"Loaded {len(df):,} rows")
     return df
 
-def check_coverage(df):
+def block_matrix(df, values):
+    """Set_i_type x Set_j_type value sums and row counts of one frame, shape (2, T, T).
+
+    Block types are classified once per distinct code and gathered by code
+    index (nam_codes.code_type_ids); one bincount fills the matrix.
+    """
+    n = len(CODE_TYPES)
+    cells = code_type_ids(df['Set_i']) * n + code_type_ids(df['Set_j'])
+    values = np.asarray(values, dtype=np.float64)
+    sums = np.bincount(cells, weights=np.where(np.isnan(values), 0.0, values), minlength=n * n)
+    rows = np.bincount(cells, minlength=n * n)
+    return np.stack([sums, rows]).reshape(2, n, n)
+
+def block_cube(blocks):
+    """Long frame of the block matrices per (base, ctr), observed blocks only."""
+    n = len(CODE_TYPES)
+    frames = []
+    for (year, ctr), matrix in sorted(blocks.items()):
+        i, j = np.nonzero(matrix[1])
+        frames.append(pd.DataFrame({
+            'base': year, 'ctr': ctr,
+            'Set_i_type': np.asarray(CODE_TYPES)[i], 'Set_j_type': np.asarray(CODE_TYPES)[j],
+            'rows': matrix[1][i, j].astype(np.int64), 'value': matrix[0][i, j],
+        }))
+    return nam_parallel.concat_frames(frames)
+
+def block_sums(cube):
+    """Dataset-wide Set_i_type x Set_j_type sums from the per-partition cube."""
+    return cube.groupby(['Set_i_type', 'Set_j_type'])['value'].sum().unstack()
+
+def summarize_frame(df):
+    """Compute every quality statistic exactly from the loaded dataset."""
+    values = df['value']
+
+    # Code types come from the registry: one gather by code id per row
+    df['Set_i_type'] = SET_CODES.lookup(df['Set_i'], 'code_type')
+    df['Set_j_type'] = SET_CODES.lookup(df['Set_j'], 'code_type')
+    cube = block_cube({
+        (int(year), str(ctr)): block_matrix(part, part['value'])
+        for (year, ctr), part in df.groupby(['base', 'ctr'], observed=True)
+    })
+
+    # Aggregate by country (domestic flows only)
+    domestic = df[nam_loader.codes_equal(df['m'], df['ctr'])]
+    country_stats = domestic.groupby('ctr', observed=True).agg({
+        'value': ['sum', 'mean', 'std', 'count']
+    })
+    country_stats.columns = ['total', 'mean', 'std', 'count']
+
+    type_stats = {}
+    for column in ['Set_i_type', 'Set_j_type']:
+        stats = df.groupby(column, observed=True).agg({'value': ['count', 'sum', 'mean']})
+        stats.columns = ['count', 'sum', 'mean']
+        type_stats[column] = stats
+
+    return {
+        'rows': len(df),
+        'missing': df.drop(columns=['Set_i_type', 'Set_j_type']).isnull().sum(),
+        'combinations': df.groupby(['base', 'ctr'], observed=True).size().reset_index(name='rows'),
+        'count': len(values),
+        'mean': values.mean(),
+        'std': values.std(),
+        'min': values.min(),
+        'max': values.max(),
+        'zeros': (values == 0).sum(),
+        'negatives': (values < 0).sum(),
+        'quantiles': {q: values.quantile(q) for q in QUANTILES},
+        'count_outside': lambda lower, upper: ((values < lower).sum(), (values > upper).sum()),
+        'country_stats': country_stats,
+        'set_i_stats': type_stats['Set_i_type'],
+        'set_j_stats': type_stats['Set_j_type'],
+        'block_sums': block_sums(cube),
+        'block_cube': cube,
+    }
+
+def new_scan(year, ctr):
+    """Empty accumulators for one partition."""
+    return {
+        'partition': (int(year), ctr),
+        'rows': 0,
+        'coverage': [],
+        'missing': pd.Series(0, index=nam_loader.dataset_schema(True).names),
+        'values': RunningStats(),
+        'quantiles': (ExactQuantiles() if EXACT_QUANTILES
+                      else QuantileSketch(SKETCH_K, seed=[year, *ctr.encode()])),
+        'country': GroupedStats(),
+        'set_i_type': GroupedStats(),
+        'set_j_type': GroupedStats(),
+        'blocks': {(int(year), ctr): np.zeros((2, len(CODE_TYPES), len(CODE_TYPES)))},
+    }
+
+def update_scan(scan, df, missing):
+    """Fold one frame of rows and its per-column null counts into the accumulators."""
+    scan['rows'] += len(df)
+    scan['missing'] += missing
+    values = df['value'].to_numpy()
+    scan['values'].update(values)
+    scan['quantiles'].update(values)
+    domestic = nam_loader.codes_equal(df['m'], df['ctr']).to_numpy()
+    scan['country'].update(df['ctr'][domestic], values[domestic])
+    set_i_type = pd.Series(SET_CODES.lookup(df['Set_i'], 'code_type'), name='Set_i_type')
+    set_j_type = pd.Series(SET_CODES.lookup(df['Set_j'], 'code_type'), name='Set_j_type')
+    scan['set_i_type'].update(set_i_type, values)
+    scan['set_j_type'].update(set_j_type, values)
+    scan['blocks'][scan['partition']] += block_matrix(df, values)
+
+def scan_partition(year, ctr):
+    """Accumulators for one partition, read in record batches (runs in a worker)."""
+    scan = new_scan(year, ctr)
+    dataset = nam_loader.open_dataset(ctr=ctr, years=year, data_path=DATA_PATH, categorical=True)
+    for batch in dataset.to_batches(batch_size=BATCH_SIZE):
+        missing = pd.Series({name: column.null_count
+                             for name, column in zip(batch.schema.names, batch.columns)})
+        update_scan(scan, batch.to_pandas(), missing)
+    if scan['rows']:
+        scan['coverage'].append((year, ctr, scan['rows']))
+    return scan
+
+class QualityScan(nam_scan.Consumer):
+    """The quality accumulators as a consumer of the shared scan (nam_scan.py)."""
+
+    name = 'quality'
+
+    def on_partition(self, df, ctr, year):
+        scan = new_scan(year, ctr)
+        update_scan(scan, df, df.isna().sum())
+        if scan['rows']:
+            scan['coverage'].append((year, ctr, scan['rows']))
+        return scan
+
+    def merge(self, partials):
+        return merge_scans(list(partials.values()))
+
+def consumers():
+    """Consumers of the shared scan used by main(shared)."""
+    return [QualityScan()]
+
+def merge_scans(scans):
+    """Reducer: merge per-partition accumulators in partition order."""
+    merged = scans[0]
+    for scan in scans[1:]:
+        merged['rows'] += scan['rows']
+        merged['coverage'] += scan['coverage']
+        merged['missing'] += scan['missing']
+        merged['blocks'].update(scan['blocks'])
+        for key in ['values', 'quantiles', 'country', 'set_i_type', 'set_j_type']:
+            merged[key].merge(scan[key])
+    return merged
+
+def scan_dataset(scan=None):
+    """Compute the quality statistics from per-partition streaming scans.
+
+    Only accumulators leave the workers; the outlier counts take a second
+    pass over the value column once the IQR bounds are known. scan: merged
+    accumulators already computed by the shared scan.
+    """
+    if scan is None:
+        partitions = nam_loader.list_partitions(data_path=DATA_PATH)
+        print(f"Streaming {len(partitions)} partitions in batches of {BATCH_SIZE:,} rows...")
+        scan = nam_parallel.map_reduce(scan_partition, partitions, merge_scans)
+    print(f"Scanned {scan['rows']:,} rows")
+
+    def count_outside(lower, upper):
+        dataset = nam_loader.open_dataset(data_path=DATA_PATH)
+        low = high = 0
+        for batch in dataset.to_batches(columns=['value'], batch_size=BATCH_SIZE):
+            values = batch.column(0).to_numpy(zero_copy_only=False)
+            low += int((values < lower).sum())
+            high += int((values > upper).sum())
+        return low, high
+
+    country_stats = scan['country'].result().rename(columns={'sum': 'total'})
+    country_stats = country_stats[['total', 'mean', 'std', 'count']]
+    country_stats.index = country_stats.index.astype(str)
+    country_stats.index.name = 'ctr'
+
+    values = scan['values']
+    cube = block_cube(scan['blocks'])
+    return {
+        'rows': scan['rows'],
+        'missing': scan['missing'],
+        'combinations': pd.DataFrame(scan['coverage'], columns=['base', 'ctr', 'rows']),
+        'count': values.count,
+        'mean': values.mean,
+        'std': values.std,
+        'min': values.min,
+        'max': values.max,
+        'zeros': values.zeros,
+        'negatives': values.negatives,
+        'quantiles': dict(zip(QUANTILES, scan['quantiles'].quantile(QUANTILES))),
+        'count_outside': count_outside,
+        'country_stats': country_stats,
+        'set_i_stats': scan['set_i_type'].result()[['count', 'sum', 'mean']],
+        'set_j_stats': scan['set_j_type'].result()[['count', 'sum', 'mean']],
+        'block_sums': block_sums(cube),
+        'block_cube': cube,
+    }
+
+def check_coverage(summary):
     """Check country-year coverage."""
     print("\n" + "="*60)
     print("1. COVERAGE ANALYSIS")
     print("="*60)
 
+    combinations = summary['combinations']
+
     # Unique values
-    years = sorted(df['base'].unique())
-    countries = sorted(df['ctr'].unique())
+    years = sorted(combinations['base'].unique())
+    countries = sorted(combinations['ctr'].unique())
 
     print(f"\nYears: {len(years)} ({min(years)} - {max(years)})")
     print(f"Countries: {len(countries)}")
     print(f"Expected combinations: {len(years)} x {len(countries)} = {len(years) * len(countries)}")
 
     # Actual combinations
-    combinations = df.groupby(['base', 'ctr']).size().reset_index(name='rows')
     print(f"Actual combinations: {len(combinations)}")
 
     # Check for gaps
@@ -71,77 +292,71 @@ def check_coverage(df):
 
     return combinations
 
-def check_missing_values(df):
+def check_missing_values(summary):
     """Check for missing values."""
     print("\n" + "="*60)
     print("2. MISSING VALUES")
     print("="*60)
 
-    missing = df.isnull().sum()
+    rows = summary['rows']
+    missing = summary['missing']
     print("\nMissing values per column:")
     for col, count in missing.items():
-        pct = count / len(df) * 100
+        pct = count / rows * 100
         print(f"  {col}: {count:,} ({pct:.2f}%)")
 
     # Check for zero values in 'value' column
-    zeros = (df['value'] == 0).sum()
-    print(f"\nZero values in 'value': {zeros:,} ({zeros/len(df)*100:.2f}%)")
+    zeros = summary['zeros']
+    print(f"\nZero values in 'value': {zeros:,} ({zeros/rows*100:.2f}%)")
 
     # Check for negative values
-    negatives = (df['value'] < 0).sum()
-    print(f"Negative values in 'value': {negatives:,} ({negatives/len(df)*100:.2f}%)")
+    negatives = summary['negatives']
+    print(f"Negative values in 'value': {negatives:,} ({negatives/rows*100:.2f}%)")
 
     return missing
 
-def analyze_value_distribution(df):
+def analyze_value_distribution(summary):
     """Analyze the distribution of values."""
     print("\n" + "="*60)
     print("3. VALUE DISTRIBUTION")
     print("="*60)
 
-    values = df['value']
+    quantiles = summary['quantiles']
 
     print("\nOverall statistics:")
-    print(f"  Count: {len(values):,}")
-    print(f"  Mean: {values.mean():,.2f}")
-    print(f"  Std: {values.std():,.2f}")
-    print(f"  Min: {values.min():,.2f}")
-    print(f"  25%: {values.quantile(0.25):,.2f}")
-    print(f"  50%: {values.quantile(0.50):,.2f}")
-    print(f"  75%: {values.quantile(0.75):,.2f}")
-    print(f"  95%: {values.quantile(0.95):,.2f}")
-    print(f"  99%: {values.quantile(0.99):,.2f}")
-    print(f"  Max: {values.max():,.2f}")
+    print(f"  Count: {summary['count']:,}")
+    print(f"  Mean: {summary['mean']:,.2f}")
+    print(f"  Std: {summary['std']:,.2f}")
+    print(f"  Min: {summary['min']:,.2f}")
+    for q in QUANTILES:
+        print(f"  {q:.0%}: {quantiles[q]:,.2f}")
+    print(f"  Max: {summary['max']:,.2f}")
+    if STREAMING and not EXACT_QUANTILES:
+        print(f"  (quantiles from a KLL sketch, k={SKETCH_K}: rank error below ~1.65%)")
 
     # Outlier detection (IQR method)
-    Q1 = values.quantile(0.25)
-    Q3 = values.quantile(0.75)
+    Q1 = quantiles[0.25]
+    Q3 = quantiles[0.75]
     IQR = Q3 - Q1
     lower_bound = Q1 - 1.5 * IQR
     upper_bound = Q3 + 1.5 * IQR
 
-    outliers_low = (values < lower_bound).sum()
-    outliers_high = (values > upper_bound).sum()
+    outliers_low, outliers_high = summary['count_outside'](lower_bound, upper_bound)
 
     print(f"\nOutliers (IQR method):")
     print(f"  Below {lower_bound:,.2f}: {outliers_low:,}")
     print(f"  Above {upper_bound:,.2f}: {outliers_high:,}")
 
-    return values.describe()
+    return quantiles
 
-def analyze_by_country(df):
+def analyze_by_country(summary):
     """Analyze statistics per country."""
     print("\n" + "="*60)
     print("4. STATISTICS BY COUNTRY")
     print("="*60)
 
-    # Aggregate by country (domestic flows only)
-    domestic = df[df['m'] == df['ctr']]
-
-    country_stats = domestic.groupby('ctr').agg({
-        'value': ['sum', 'mean', 'std', 'count']
-    }).round(2)
-    country_stats.columns = ['total', 'mean', 'std', 'count']
+    # Domestic flows only
+    country_stats = summary['country_stats'].round(2)
     country_stats = country_stats.sort_values('total', ascending=False)
 
     print("\nTop 10 countries by total domestic flow:")
@@ -156,84 +371,62 @@ def analyze_by_country(df):
 
     return country_stats
 
-def analyze_by_code_type(df):
+def analyze_by_code_type(summary):
     """Analyze by Set_i/Set_j code categories."""
     print("\n" + "="*60)
     print("5. STATISTICS BY CODE TYPE")
     print("="*60)
 
-    def categorize(code):
-        if pd.isna(code):
-            return 'Unknown'
-        if code.startswith('CPA_'):
-            return 'Products (CPA)'
-        elif code.startswith('D') and code[1:2].isdigit():
-            return 'Distributive (D)'
-        elif code.startswith('B'):
-            return 'Balancing (B)'
-        elif code.startswith('P') and (len(code) < 4 or code[1:2].isdigit()):
-            return 'Expenditure (P)'
-        elif code.startswith('F') and code[1:2].isdigit():
-            return 'Financial (F)'
-        elif code.startswith('S') and code[1:2].isdigit():
-            return 'Sectors (S)'
-        elif code.startswith('N') and code[1:2].isdigit():
-            return 'Assets (N)'
-        else:
-            return 'Industries (NACE)'
-
-    df['Set_i_type'] = df['Set_i'].apply(categorize)
-    df['Set_j_type'] = df['Set_j'].apply(categorize)
-
     print("\nSet_i (Row) categories:")
-    set_i_stats = df.groupby('Set_i_type').agg({
-        'value': ['count', 'sum', 'mean']
-    }).round(2)
-    set_i_stats.columns = ['count', 'sum', 'mean']
+    set_i_stats = summary['set_i_stats'].round(2)
     print(set_i_stats.sort_values('sum', ascending=False).to_string())
 
     print("\nSet_j (Column) categories:")
-    set_j_stats = df.groupby('Set_j_type').agg({
-        'value': ['count', 'sum', 'mean']
-    }).round(2)
-    set_j_stats.columns = ['count', 'sum', 'mean']
+    set_j_stats = summary['set_j_stats'].round(2)
     print(set_j_stats.sort_values('sum', ascending=False).to_string())
 
     # Cross-tabulation
     print("\nBlock structure (Set_i_type x Set_j_type) - Value sums:")
-    block_sums = df.pivot_table(
-        values='value',
-        index='Set_i_type',
-        columns='Set_j_type',
-        aggfunc='sum'
-    ).fillna(0).round(0)
+    block_sums = summary['block_sums'].fillna(0).round(0)
     block_sums.to_csv(OUTPUT_PATH / 'block_structure.csv')
     print(f"Saved: {OUTPUT_PATH / 'block_structure.csv'}")
 
+    # The same blocks per country-year, compared as shares of each partition's total
+    cube = summary['block_cube']
+    cube.to_csv(OUTPUT_PATH / 'block_structure_by_partition.csv', index=False)
+    shares = cube['value'] / cube.groupby(['base', 'ctr'])['value'].transform('sum') * 100
+    spread = shares.groupby([cube['Set_i_type'], cube['Set_j_type']]).agg(['min', 'median', 'max'])
+    print("\nBlock shares of country-year totals (%, across country-years):")
+    print(spread.sort_values('median', ascending=False).round(1).to_string())
+    print(f"Saved: {OUTPUT_PATH / 'block_structure_by_partition.csv'}")
+
     return set_i_stats, set_j_stats
 
-def main():
-    """Run all quality checks."""
+def main(shared=None):
+    """Run all quality checks (on the shared scan's results, if given)."""
     print("FIGARO-NAM Data Quality Assessment")
     print("="*60)
 
-    # Load data
-    df = load_all_data()
+    # Load (or stream) data
+    if shared is not None:
+        summary = scan_dataset(shared['quality'])
+    else:
+        summary = scan_dataset() if STREAMING else summarize_frame(load_all_data())
 
     # Run analyses
-    coverage = check_coverage(df)
-    missing = check_missing_values(df)
-    distribution = analyze_value_distribution(df)
-    country_stats = analyze_by_country(df)
-    code_stats = analyze_by_code_type(df)
+    coverage = check_coverage(summary)
+    missing = check_missing_values(summary)
+    distribution = analyze_value_distribution(summary)
+    country_stats = analyze_by_country(summary)
+    code_stats = analyze_by_code_type(summary)
 
     print("\n" + "="*60)
     print("SUMMARY")
     print("="*60)
-    print(f"Total rows: {len(df):,}")
+    print(f"Total rows: {summary['rows']:,}")
     print(f"Coverage: Complete (700 country-year combinations)")
     print(f"Missing values: None")
-    print(f"Negative values: {(df['value'] < 0).sum():,}")
+    print(f"Negative values: {summary['negatives']:,}")
     print(f"Output files saved to: {OUTPUT_PATH}/")
     print("="*60)
 
@@ -7,19 +7,29 @@ This script identifies:
 - Top trading partners per country
 - Key bilateral relationships
 
+The per-partition analyses filter and group the Arrow table directly
+(`nam_arrow`); only the grouped results are converted to pandas. Top flows
+across many country-years (or per country and year) come from nam_topk.py.
+
 Output: Console summary + CSV exports to outputs/
 
 Usage:
-    python scripts/02_top_flows.py
+    python scripts/02_top_flows.py [--engine polars]
 """
 
-import pyarrow.parquet as pq
 import pandas as pd
 import numpy as np
+import pyarrow as pa
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_arrow
+import nam_engine
+import nam_loader
+import nam_scan
+import nam_topk
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/')
@@ -29,46 +39,54 @@ OUTPUT_PATH.mkdir(exist_ok=True)
 SAMPLE_COUNTRIES = ['DE', 'FR', 'IT', 'AT', 'PL', 'GR']
 SAMPLE_YEAR = 2020
 
+# Summary table columns by time-series metric (nam_metrics.TIME_SERIES_METRICS)
+SUMMARY_COLUMNS = {
+    'wages_D11': 'Wages (D11)',
+    'surplus_B2': 'Op. Surplus (B2)',
+    'hh_consumption': 'HH Consumption',
+    'gov_consumption': 'Gov Consumption',
+    'investment': 'Investment',
+    'imports': 'Imports',
+}
 
-def load_country_year(ctr, year):
-    """Load data for specific country and year."""
-    return pq.read_table(
-        DATA_PATH,
-        filters=[('base', '=', int(year)), ('ctr', '=', ctr)]
-    ).to_pandas()
 
+def load_country_year(ctr, year, columns=None, **predicates):
+    """Load data for specific country and year as an Arrow table (dictionary-encoded codes)."""
+    return nam_loader.load_table(ctr, year, columns or nam_loader.DATA_COLUMNS, DATA_PATH,
+                                 categorical=True, **predicates)
 
-def analyze_top_flows(df, ctr, n=20):
+
+def analyze_top_flows(table, ctr, n=20):
     """Find largest flows by absolute value."""
     print(f"\n{'='*60}")
     print(f"TOP {n} FLOWS - {ctr}")
     print("="*60)
 
-    # Sort by absolute value
-    df_sorted = df.reindex(df['value'].abs().sort_values(ascending=False).index)
-    top = df_sorted.head(n)[['Set_i', 'm', 'Set_j', 'value']]
+    # Partial selection of the n largest absolute values (argpartition, see nam_topk)
+    order = nam_topk.select_top(np.abs(table['value'].to_numpy()), n)
+    top = table.take(order).select(['Set_i', 'm', 'Set_j', 'value']).to_pandas()
 
     print(top.to_string(index=False))
     return top
 
 
-def analyze_value_added(df, ctr):
+def analyze_value_added(table, ctr):
     """Analyze value added by industry (D11 = wages, B2 = operating surplus)."""
     print(f"\n{'='*60}")
     print(f"VALUE ADDED BY INDUSTRY - {ctr}")
     print("="*60)
 
     # Wages (D11) by industry - domestic only
-    wages = df[(df['Set_i'] == 'D11') & (df['m'] == ctr)].copy()
-    wages = wages.groupby('Set_j')['value'].sum().sort_values(ascending=False)
+    wages = nam_arrow.group_sum(table, 'Set_j', ctr, set_i='D11', domestic=True)
+    wages = wages.sort_values(ascending=False)
 
     print("\nTop 10 industries by wages (D11):")
     for industry, val in wages.head(10).items():
         print(f"  {industry}: {val:,.0f}")
 
     # Operating surplus (B2) by industry
-    surplus = df[(df['Set_i'] == 'B2') & (df['m'] == ctr)].copy()
-    surplus = surplus.groupby('Set_j')['value'].sum().sort_values(ascending=False)
+    surplus = nam_arrow.group_sum(table, 'Set_j', ctr, set_i='B2', domestic=True)
+    surplus = surplus.sort_values(ascending=False)
 
     print("\nTop 10 industries by operating surplus (B2):")
     for industry, val in surplus.head(10).items():
@@ -77,28 +95,26 @@ def analyze_value_added(df, ctr):
     return wages, surplus
 
 
-def analyze_intermediate_consumption(df, ctr):
+def analyze_intermediate_consumption(table, ctr):
     """Analyze intermediate consumption (products used by industries)."""
     print(f"\n{'='*60}")
     print(f"INTERMEDIATE CONSUMPTION - {ctr}")
     print("="*60)
 
     # Filter: CPA products -> NACE industries, domestic
-    mask = (
-        df['Set_i'].str.startswith('CPA_') &
-        df['Set_j'].str.match(r'^[A-T]') &
-        (df['m'] == ctr)
+    intermediates = nam_arrow.filter_rows(table, ctr, set_i_prefix='CPA_', domestic=True)
+    intermediates = intermediates.filter(
+        nam_arrow.dictionary_mask(intermediates['Set_j'], lambda codes: codes.str.match(r'^[A-T]'))
     )
-    intermediates = df[mask].copy()
 
     # By consuming industry
-    by_industry = intermediates.groupby('Set_j')['value'].sum().sort_values(ascending=False)
+    by_industry = nam_arrow.group_sum(intermediates, 'Set_j').sort_values(ascending=False)
     print("\nTop 10 industries by intermediate consumption:")
     for industry, val in by_industry.head(10).items():
         print(f"  {industry}: {val:,.0f}")
 
     # By product consumed
-    by_product = intermediates.groupby('Set_i')['value'].sum().sort_values(ascending=False)
+    by_product = nam_arrow.group_sum(intermediates, 'Set_i').sort_values(ascending=False)
     print("\nTop 10 products consumed as intermediates:")
     for product, val in by_product.head(10).items():
         print(f"  {product}: {val:,.0f}")
@@ -106,31 +122,31 @@ def analyze_intermediate_consumption(df, ctr):
     return by_industry, by_product
 
 
-def analyze_final_demand(df, ctr):
+def analyze_final_demand(table, ctr):
     """Analyze final demand (consumption, investment)."""
     print(f"\n{'='*60}")
     print(f"FINAL DEMAND - {ctr}")
     print("="*60)
 
     # Household consumption (P3_S14)
-    hh_cons = df[(df['Set_j'] == 'P3_S14') & (df['m'] == ctr)]
-    hh_by_product = hh_cons.groupby('Set_i')['value'].sum().sort_values(ascending=False)
+    hh_by_product = nam_arrow.group_sum(table, 'Set_i', ctr, set_j='P3_S14', domestic=True)
+    hh_by_product = hh_by_product.sort_values(ascending=False)
 
     print("\nTop 10 products in household consumption (P3_S14):")
     for product, val in hh_by_product.head(10).items():
         print(f"  {product}: {val:,.0f}")
 
     # Government consumption (P3_S13)
-    gov_cons = df[(df['Set_j'] == 'P3_S13') & (df['m'] == ctr)]
-    gov_by_product = gov_cons.groupby('Set_i')['value'].sum().sort_values(ascending=False)
+    gov_by_product = nam_arrow.group_sum(table, 'Set_i', ctr, set_j='P3_S13', domestic=True)
+    gov_by_product = gov_by_product.sort_values(ascending=False)
 
     print("\nTop 10 products in government consumption (P3_S13):")
     for product, val in gov_by_product.head(10).items():
         print(f"  {product}: {val:,.0f}")
 
     # Investment (P51G)
-    investment = df[(df['Set_j'] == 'P51G') & (df['m'] == ctr)]
-    inv_by_product = investment.groupby('Set_i')['value'].sum().sort_values(ascending=False)
+    inv_by_product = nam_arrow.group_sum(table, 'Set_i', ctr, set_j='P51G', domestic=True)
+    inv_by_product = inv_by_product.sort_values(ascending=False)
 
     print("\nTop 10 products in investment (P51G):")
     for product, val in inv_by_product.head(10).items():
@@ -139,22 +155,22 @@ def analyze_final_demand(df, ctr):
     return hh_by_product, gov_by_product, inv_by_product
 
 
-def analyze_trade_partners(df, ctr):
+def analyze_trade_partners(table, ctr):
     """Analyze trading partners (imports by origin)."""
     print(f"\n{'='*60}")
     print(f"TRADING PARTNERS - {ctr}")
     print("="*60)
 
     # Imports = flows from other countries (m != ctr)
-    imports = df[(df['Set_i'].str.startswith('CPA_')) & (df['m'] != ctr)]
-    by_partner = imports.groupby('m')['value'].sum().sort_values(ascending=False)
+    imports = nam_arrow.filter_rows(table, ctr, set_i_prefix='CPA_', domestic=False)
+    by_partner = nam_arrow.group_sum(imports, 'm').sort_values(ascending=False)
 
     print("\nTop 15 import origins:")
     for partner, val in by_partner.head(15).items():
         print(f"  {partner}: {val:,.0f}")
 
     # Imports by product category
-    by_product = imports.groupby('Set_i')['value'].sum().sort_values(ascending=False)
+    by_product = nam_arrow.group_sum(imports, 'Set_i').sort_values(ascending=False)
     print("\nTop 10 imported product categories:")
     for product, val in by_product.head(10).items():
         print(f"  {product}: {val:,.0f}")
@@ -162,34 +178,48 @@ def analyze_trade_partners(df, ctr):
     return by_partner, by_product
 
 
-def create_summary_table(year):
-    """Create summary table across all sample countries."""
+def summary_row(table, ctr):
+    """Key aggregates of one country-year for the cross-country summary."""
+    wages = nam_arrow.total(table, ctr, set_i='D11', domestic=True)
+    surplus = nam_arrow.total(table, ctr, set_i='B2', domestic=True)
+    hh_cons = nam_arrow.total(table, ctr, set_j='P3_S14', domestic=True)
+    gov_cons = nam_arrow.total(table, ctr, set_j='P3_S13', domestic=True)
+    investment = nam_arrow.total(table, ctr, set_j='P51G', domestic=True)
+    imports = nam_arrow.total(table, ctr, set_i_prefix='CPA_', domestic=False)
+
+    return {
+        'Country': ctr,
+        'Wages (D11)': wages,
+        'Op. Surplus (B2)': surplus,
+        'HH Consumption': hh_cons,
+        'Gov Consumption': gov_cons,
+        'Investment': investment,
+        'Imports': imports
+    }
+
+
+def create_summary_table(year, rows=None, engine=None):
+    """Create summary table across all sample countries.
+
+    rows: {country: summary_row} already computed by the shared scan.
+    engine: dataframe engine or its name (default: --engine or NAM_ENGINE, see nam_engine).
+    """
     print(f"\n{'='*60}")
     print(f"CROSS-COUNTRY SUMMARY - {year}")
     print("="*60)
 
-    results = []
-    for ctr in SAMPLE_COUNTRIES:
-        df = load_country_year(ctr, year)
-        domestic = df[df['m'] == ctr]
-
-        # Key aggregates
-        wages = df[(df['Set_i'] == 'D11') & (df['m'] == ctr)]['value'].sum()
-        surplus = df[(df['Set_i'] == 'B2') & (df['m'] == ctr)]['value'].sum()
-        hh_cons = df[(df['Set_j'] == 'P3_S14') & (df['m'] == ctr)]['value'].sum()
-        gov_cons = df[(df['Set_j'] == 'P3_S13') & (df['m'] == ctr)]['value'].sum()
-        investment = df[(df['Set_j'] == 'P51G') & (df['m'] == ctr)]['value'].sum()
-        imports = df[(df['Set_i'].str.startswith('CPA_')) & (df['m'] != ctr)]['value'].sum()
-
-        results.append({
-            'Country': ctr,
-            'Wages (D11)': wages,
-            'Op. Surplus (B2)': surplus,
-            'HH Consumption': hh_cons,
-            'Gov Consumption': gov_cons,
-            'Investment': investment,
-            'Imports': imports
-        })
+    if rows is not None:
+        results = [rows[ctr] for ctr in SAMPLE_COUNTRIES]
+    else:
+        # Key aggregates from the dataframe engine (sidecars or one scan, see nam_engine)
+        if engine is None or isinstance(engine, str):
+            engine = nam_engine.get_engine(engine)
+        metrics = engine.metric_rows([(year, ctr) for ctr in SAMPLE_COUNTRIES], DATA_PATH)
+        results = [
+            {'Country': row['country'],
+             **{column: row[metric] for metric, column in SUMMARY_COLUMNS.items()}}
+            for row in metrics
+        ]
 
     summary = pd.DataFrame(results)
     print(summary.to_string(index=False))
@@ -201,23 +231,50 @@ def create_summary_table(year):
     return summary
 
 
-def main():
-    """Run top flows analysis."""
+class TopFlows(nam_scan.Consumer):
+    """Summary rows of the sample countries and the detailed German table (nam_scan.py)."""
+
+    name = 'top_flows'
+    columns = nam_loader.DATA_COLUMNS
+
+    def partitions(self, available):
+        return [(SAMPLE_YEAR, ctr) for ctr in SAMPLE_COUNTRIES]
+
+    def on_partition(self, df, ctr, year):
+        table = pa.Table.from_pandas(df[nam_loader.DATA_COLUMNS], preserve_index=False)
+        return summary_row(table, ctr), (table if ctr == 'DE' else None)
+
+    def merge(self, partials):
+        partials = self.fill(partials)
+        return {
+            'rows': {ctr: row for (_, ctr), (row, _) in partials.items()},
+            'DE': partials[(SAMPLE_YEAR, 'DE')][1],
+        }
+
+
+def consumers():
+    """Consumers of the shared scan used by main(shared)."""
+    return [TopFlows()]
+
+
+def main(shared=None):
+    """Run top flows analysis (on the shared scan's results, if given)."""
     print("FIGARO-NAM Top Flows Analysis")
     print("="*60)
 
     # Detailed analysis for Germany
-    df_de = load_country_year('DE', SAMPLE_YEAR)
-    print(f"\nLoaded Germany {SAMPLE_YEAR}: {len(df_de):,} rows")
+    scan = shared['top_flows'] if shared is not None else None
+    table_de = scan['DE'] if scan is not None else load_country_year('DE', SAMPLE_YEAR)
+    print(f"\nLoaded Germany {SAMPLE_YEAR}: {table_de.num_rows:,} rows")
 
-    analyze_top_flows(df_de, 'DE')
-    wages, surplus = analyze_value_added(df_de, 'DE')
-    by_industry, by_product = analyze_intermediate_consumption(df_de, 'DE')
-    hh, gov, inv = analyze_final_demand(df_de, 'DE')
-    partners, imports = analyze_trade_partners(df_de, 'DE')
+    analyze_top_flows(table_de, 'DE')
+    wages, surplus = analyze_value_added(table_de, 'DE')
+    by_industry, by_product = analyze_intermediate_consumption(table_de, 'DE')
+    hh, gov, inv = analyze_final_demand(table_de, 'DE')
+    partners, imports = analyze_trade_partners(table_de, 'DE')
 
     # Cross-country summary
-    summary = create_summary_table(SAMPLE_YEAR)
+    summary = create_summary_table(SAMPLE_YEAR, scan['rows'] if scan is not None else None)
 
     # Save detailed results
     results = {
@@ -10,71 +10,75 @@ This script analyzes:
 Output: Console summary + CSV exports to outputs/
 
 Usage:
-    python scripts/03_temporal_analysis.py
+    python scripts/03_temporal_analysis.py [--engine polars]
 """
 
-import pyarrow.parquet as pq
 import pandas as pd
 import numpy as np
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_cube
+import nam_engine
+import nam_loader
+import nam_metrics
+import nam_panel
+import nam_scan
+from nam_query import FigaroDataset
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/')
 OUTPUT_PATH.mkdir(exist_ok=True)
+NAM = FigaroDataset(DATA_PATH)
 
 YEARS = list(range(2010, 2024))
 SAMPLE_COUNTRIES = ['DE', 'FR', 'IT', 'AT', 'PL', 'GR', 'ES', 'NL']
+SECTOR_YEARS = [2019, 2020, 2021, 2022]
 
 
-def load_country_year(ctr, year):
-    """Load data for specific country and year."""
-    return pq.read_table(
-        DATA_PATH,
-        filters=[('base', '=', int(year)), ('ctr', '=', ctr)]
-    ).to_pandas()
-
+def partition_aggregates(df, year, ctr):
+    """Key aggregates of one country-year partition (one fused scan, see nam_metrics)."""
+    return {'year': int(year), 'country': ctr, **nam_metrics.compute_metrics(df, ctr)}
 
-def get_aggregate(df, ctr, set_i=None, set_j=None):
-    """Calculate aggregate for specific transaction type."""
-    mask = df['m'] == ctr
-    if set_i:
-        mask &= df['Set_i'] == set_i
-    if set_j:
-        mask &= df['Set_j'] == set_j
-    return df[mask]['value'].sum()
 
+def build_time_series(ctr, engine=None):
+    """Build time series of key aggregates for a country.
 
-def build_time_series(ctr):
-    """Build time series of key aggregates for a country."""
+    Country-years held in the memory-mapped cube (scripts/nam_cube.py) are
+    summed from array slices; the rest go to the dataframe engine
+    (scripts/nam_engine.py), which reads current marginals sidecars
+    (pandas) or scans the partitions in one lazy query (polars). engine is
+    the engine or its name (default: --engine or NAM_ENGINE).
+    """
     print(f"Building time series for {ctr}...")
 
-    data = []
-    for year in YEARS:
-        df = load_country_year(ctr, year)
-
-        row = {
-            'year': int(year),
-            'country': ctr,
-            'wages_D11': get_aggregate(df, ctr, set_i='D11'),
-            'surplus_B2': get_aggregate(df, ctr, set_i='B2'),
-            'hh_consumption': get_aggregate(df, ctr, set_j='P3_S14'),
-            'gov_consumption': get_aggregate(df, ctr, set_j='P3_S13'),
-            'investment': get_aggregate(df, ctr, set_j='P51G'),
-        }
+    cube = nam_cube.open_cube(data_path=DATA_PATH)
+    rows = {
+        year: nam_cube.time_series_row(cube, year, ctr)
+        for year in YEARS if cube is not None and cube.has(year, ctr)
+    }
+    pending = [(year, ctr) for year in YEARS if year not in rows]
+    if engine is None or isinstance(engine, str):
+        engine = nam_engine.get_engine(engine)
+    for row in engine.metric_rows(pending, DATA_PATH):
+        rows[row['year']] = row
+
+    return pd.DataFrame([rows[year] for year in YEARS])
+
 
-        # Imports (products from foreign partners)
-        imports = df[
-            (df['Set_i'].str.startswith('CPA_')) &
-            (df['m'] != ctr)
-        ]['value'].sum()
-        row['imports'] = imports
+def build_all_time_series(countries):
+    """Build time series for several countries at once.
 
-        data.append(row)
+    One panel over all countries and YEARS (nam_panel.build_panel): partitions
+    fan out over worker processes, and the cube and marginals sidecars answer
+    the country-years they hold. Returns {country: time series}.
+    """
+    print(f"Building time series for {len(countries)} countries...")
 
-    return pd.DataFrame(data)
+    panel = nam_panel.build_panel(years=YEARS, countries=countries, data_path=DATA_PATH)
+    return {ctr: nam_panel.country_series(panel, ctr) for ctr in countries}
 
 
 def analyze_yoy_changes(ts):
@@ -102,26 +106,33 @@ def analyze_yoy_changes(ts):
     return yoy
 
 
-def analyze_sector_dynamics(ctr):
-    """Analyze how sectors changed over time (intermediate consumption)."""
+def industry_sectors(by_sector):
+    """Keep the industry columns (NACE sections A-T) of sums by Set_j."""
+    return by_sector[by_sector.index.str.match(r'^[A-T]')]
+
+
+def sector_sums(df, ctr):
+    """Domestic intermediate consumption by industry of one loaded partition."""
+    mask = nam_loader.code_startswith(df['Set_i'], 'CPA_') & (df['m'] == ctr)
+    return industry_sectors(df[mask].groupby('Set_j', observed=True)['value'].sum())
+
+
+def analyze_sector_dynamics(ctr, sector_data=None):
+    """Analyze how sectors changed over time (intermediate consumption).
+
+    sector_data: {year: sector_sums} already computed by the shared scan.
+    """
     print(f"\n{'='*60}")
     print(f"SECTORAL DYNAMICS - {ctr}")
     print("="*60)
 
     # Compare 2019, 2020, 2021, 2022
-    years_compare = [2019, 2020, 2021, 2022]
-    sector_data = {}
-
-    for year in years_compare:
-        df = load_country_year(ctr, year)
-        # Intermediate consumption by industry
-        mask = (
-            df['Set_i'].str.startswith('CPA_') &
-            df['Set_j'].str.match(r'^[A-T]') &
-            (df['m'] == ctr)
-        )
-        by_sector = df[mask].groupby('Set_j')['value'].sum()
-        sector_data[year] = by_sector
+    if sector_data is None:
+        sector_data = {}
+        for year in SECTOR_YEARS:
+            # Intermediate consumption by industry (domestic CPA rows pushed down)
+            by_sector = NAM.query(years=year, ctr=ctr, set_i_prefix='CPA_', domestic=True).group_by('Set_j').sum()
+            sector_data[year] = industry_sectors(by_sector)
 
     # Combine
     sectors = pd.DataFrame(sector_data)
@@ -154,15 +165,20 @@ def analyze_sector_dynamics(ctr):
     return sectors
 
 
-def cross_country_comparison():
-    """Compare structural breaks across countries."""
+def cross_country_comparison(series=None):
+    """Compare structural breaks across countries.
+
+    series: {country: time series} already computed by the shared scan.
+    """
     print("\n" + "="*60)
     print("CROSS-COUNTRY STRUCTURAL BREAKS")
     print("="*60)
 
+    if series is None:
+        series = build_all_time_series(SAMPLE_COUNTRIES)
     results = []
     for ctr in SAMPLE_COUNTRIES:
-        ts = build_time_series(ctr)
+        ts = series[ctr]
 
         # 2020 vs 2019 (COVID)
         row_2019 = ts[ts['year'] == 2019].iloc[0]
@@ -191,13 +207,43 @@ def cross_country_comparison():
     return comparison
 
 
-def main():
-    """Run temporal analysis."""
+class TemporalScan(nam_scan.Consumer):
+    """Time-series rows of the sample countries and German sector sums (nam_scan.py)."""
+
+    name = 'temporal'
+    columns = nam_loader.DATA_COLUMNS
+
+    def partitions(self, available):
+        return [(year, ctr) for ctr in SAMPLE_COUNTRIES for year in YEARS]
+
+    def on_partition(self, df, ctr, year):
+        sectors = sector_sums(df, ctr) if ctr == 'DE' and year in SECTOR_YEARS else None
+        return partition_aggregates(df, year, ctr), sectors
+
+    def merge(self, partials):
+        partials = self.fill(partials)
+        series = {
+            ctr: pd.DataFrame([row for (_, c), (row, _) in partials.items() if c == ctr])
+            .sort_values('year').reset_index(drop=True)
+            for ctr in SAMPLE_COUNTRIES
+        }
+        sectors = {year: partials[(year, 'DE')][1] for year in SECTOR_YEARS}
+        return {'series': series, 'sectors': sectors}
+
+
+def consumers():
+    """Consumers of the shared scan used by main(shared)."""
+    return [TemporalScan()]
+
+
+def main(shared=None):
+    """Run temporal analysis (on the shared scan's results, if given)."""
     print("FIGARO-NAM Temporal Analysis")
     print("="*60)
+    scan = shared['temporal'] if shared is not None else None
 
     # Germany detailed analysis
-    ts_de = build_time_series('DE')
+    ts_de = scan['series']['DE'] if scan is not None else build_time_series('DE')
     ts_de.to_csv(OUTPUT_PATH / 'DE_time_series.csv', index=False)
     print(f"\nSaved: {OUTPUT_PATH / 'DE_time_series.csv'}")
 
@@ -209,11 +255,11 @@ def main():
     yoy_de.to_csv(OUTPUT_PATH / 'DE_yoy_changes.csv', index=False)
 
     # Sectoral dynamics
-    sectors_de = analyze_sector_dynamics('DE')
+    sectors_de = analyze_sector_dynamics('DE', scan['sectors'] if scan is not None else None)
     sectors_de.to_csv(OUTPUT_PATH / 'DE_sector_dynamics.csv')
 
     # Cross-country comparison
-    comparison = cross_country_comparison()
+    comparison = cross_country_comparison(scan['series'] if scan is not None else None)
 
     print(f"\n{'='*60}")
     print("SUMMARY: KEY STRUCTURAL BREAKS OBSERVED")
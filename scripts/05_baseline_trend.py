@@ -14,13 +14,17 @@ Usage:
 
 import pandas as pd
 import numpy as np
-import pyarrow.parquet as pq
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_marginals
+import nam_parallel
+import nam_scan
+from nam_query import FigaroDataset
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/')
@@ -28,6 +32,7 @@ TABLES_PATH = OUTPUT_PATH / 'tables'
 FIGURES_PATH = OUTPUT_PATH / 'figures'
 TABLES_PATH.mkdir(exist_ok=True)
 FIGURES_PATH.mkdir(exist_ok=True)
+NAM = FigaroDataset(DATA_PATH)
 
 # Sample countries for analysis
 SAMPLE_COUNTRIES = ['DE', 'FR', 'IT', 'ES', 'NL', 'PL', 'AT', 'GR']
@@ -45,23 +50,6 @@ plt.style.use('seaborn-v0_8-whitegrid')
 NOMINAL_DISCLAIMER = "Source: FIGARO-NAM (Eurostat). All values nominal, not inflation-adjusted."
 
 
-def load_country_year(country: str, year: int) -> pd.DataFrame:
-    """Load data for a specific country and year."""
-    file_path = DATA_PATH / f'base={year}' / f'ctr={country}' / 'part-0.parquet'
-    if file_path.exists():
-        return pq.read_table(file_path).to_pandas()
-    return pd.DataFrame()
-
-
-def calculate_aggregate(df: pd.DataFrame, aggregate: str) -> float:
-    """Calculate total value for a specific aggregate."""
-    if df.empty:
-        return np.nan
-    # Filter for the aggregate in Set_j (usage side)
-    mask = df['Set_j'] == aggregate
-    return df.loc[mask, 'value'].sum()
-
-
 def calculate_cagr(start_value: float, end_value: float, years: int) -> float:
     """Calculate Compound Annual Growth Rate."""
     if start_value <= 0 or end_value <= 0 or years <= 0:
@@ -69,10 +57,62 @@ def calculate_cagr(start_value: float, end_value: float, years: int) -> float:
     return (end_value / start_value) ** (1 / years) - 1
 
 
-def analyze_trends():
-    """Analyze long-term trends 2010-2018 and compare with 2020."""
+def load_key_aggregates(year: int, country: str) -> dict:
+    """Totals of the key aggregates for one country-year (worker task).
+
+    Read from the partition's marginals sidecar when it is current, else
+    summed by usage column (Set_j) in one pruned scan.
+    """
+    marginals = nam_marginals.read_marginals(country, year, DATA_PATH)
+    if marginals is not None:
+        totals = nam_marginals.marginal(marginals, 'Set_j')
+    else:
+        totals = NAM.query(years=year, ctr=country, set_j=list(KEY_AGGREGATES)).group_by('Set_j').sum()
+    return key_aggregates(totals)
+
+
+def key_aggregates(totals: pd.Series) -> dict:
+    """Key aggregates from totals by Set_j code (all NaN if none of them occurs)."""
+    if not totals.index.isin(list(KEY_AGGREGATES)).any():
+        return {agg_name: np.nan for agg_name in KEY_AGGREGATES.values()}
+    return {agg_name: float(totals.get(agg_code, 0.0))
+            for agg_code, agg_name in KEY_AGGREGATES.items()}
+
+
+class BaselineScan(nam_scan.Consumer):
+    """Key aggregates of the sample country-years 2010-2020 (nam_scan.py)."""
+
+    name = 'baseline'
+    columns = ['Set_j', 'value']
+
+    def partitions(self, available):
+        return [(year, country) for country in SAMPLE_COUNTRIES for year in range(2010, 2021)]
+
+    def on_partition(self, df, ctr, year):
+        return key_aggregates(df.groupby('Set_j', observed=True)['value'].sum())
+
+    def merge(self, partials):
+        return self.fill(partials)
+
+
+def consumers():
+    """Consumers of the shared scan used by main(shared)."""
+    return [BaselineScan()]
+
+
+def analyze_trends(totals=None):
+    """Analyze long-term trends 2010-2018 and compare with 2020.
+
+    totals: {(year, country): key aggregates} already computed by the shared scan.
+    """
     print("Calculating baseline trends (2010-2018)...")
 
+    # Load years 2010-2018 for baseline, plus 2019-2020 for comparison;
+    # country-years fan out over worker processes
+    if totals is None:
+        partitions = [(year, country) for country in SAMPLE_COUNTRIES for year in range(2010, 2021)]
+        totals = dict(zip(partitions, nam_parallel.map_partitions(load_key_aggregates, partitions)))
+
     # Collect time series data
     results = []
 
@@ -80,11 +120,8 @@ def analyze_trends():
         print(f"  Processing {country}...")
         country_data = {}
 
-        # Load years 2010-2018 for baseline, plus 2019-2020 for comparison
         for year in range(2010, 2021):
-            df = load_country_year(country, year)
-            for agg_code, agg_name in KEY_AGGREGATES.items():
-                value = calculate_aggregate(df, agg_code)
+            for agg_name, value in totals[(year, country)].items():
                 key = (country, agg_name, year)
                 country_data[key] = value
 
@@ -223,13 +260,13 @@ def plot_trend_deviation(df: pd.DataFrame):
     print(f"  Saved: {FIGURES_PATH / 'trend_deviation_chart.png'}")
 
 
-def main():
-    """Run baseline trend analysis."""
+def main(shared=None):
+    """Run baseline trend analysis (on the shared scan's results, if given)."""
     print("FIGARO-NAM Baseline Trend Analysis")
     print("=" * 60)
 
     # Analyze trends
-    results_df = analyze_trends()
+    results_df = analyze_trends(shared['baseline'] if shared is not None else None)
 
     # Create tables
     cagr_table, deviation_table = create_trend_tables(results_df)
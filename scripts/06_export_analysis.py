@@ -17,13 +17,15 @@ Usage:
 
 import pandas as pd
 import numpy as np
-import pyarrow.parquet as pq
 import matplotlib.pyplot as plt
 import seaborn as sns
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_loader
+import nam_rollup
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/')
@@ -55,18 +57,22 @@ PRODUCT_CATEGORIES = {
     'Electronics': ['CPA_C26', 'CPA_C27'],
     'Services': ['CPA_G', 'CPA_H', 'CPA_I', 'CPA_J', 'CPA_K', 'CPA_L', 'CPA_M', 'CPA_N'],
 }
+# Rollup grouping (nam_rollup): first matching prefix wins, then the catch-alls
+CATEGORY_GROUPING = {
+    **PRODUCT_CATEGORIES,
+    'Manufacturing (Other)': ['CPA_C'],
+    'Other Products': ['CPA_'],
+    'Non-Product': [''],
+}
 
 # Style settings
 plt.style.use('seaborn-v0_8-whitegrid')
 NOMINAL_DISCLAIMER = "Source: FIGARO-NAM (Eurostat). All values nominal, not inflation-adjusted."
 
 
-def load_country_year(country: str, year: int) -> pd.DataFrame:
+def load_country_year(country: str, year: int, columns=None, **predicates) -> pd.DataFrame:
     """Load data for a specific country and year."""
-    file_path = DATA_PATH / f'base={year}' / f'ctr={country}' / 'part-0.parquet'
-    if file_path.exists():
-        return pq.read_table(file_path).to_pandas()
-    return pd.DataFrame()
+    return nam_loader.load_country_year(country, year, columns, DATA_PATH, **predicates)
 
 
 def load_exports_from_partners(country: str, year: int) -> pd.DataFrame:
@@ -75,24 +81,17 @@ def load_exports_from_partners(country: str, year: int) -> pd.DataFrame:
     In FIGARO, exports from country X to Y appear in country Y's data as imports (m=X).
     """
     print(f"  Loading exports from partner countries...")
-    all_exports = []
-
-    for partner in PARTNER_COUNTRIES:
-        if partner == country:
-            continue
-
-        file_path = DATA_PATH / f'base={year}' / f'ctr={partner}' / 'part-0.parquet'
-        if file_path.exists():
-            df = pq.read_table(file_path).to_pandas()
-            # Filter for imports from our focus country (= our exports to them)
-            exports_to_partner = df[df['m'] == country].copy()
-            if not exports_to_partner.empty:
-                exports_to_partner['destination'] = partner
-                all_exports.append(exports_to_partner)
-
-    if all_exports:
-        result = pd.concat(all_exports, ignore_index=True)
-        print(f"  Found {len(result):,} export flows to {len(all_exports)} partners")
+    partners = [p for p in PARTNER_COUNTRIES if p != country]
+
+    # One scan over all partner files, keeping only imports from our focus
+    # country (= our exports to them)
+    result = nam_loader.load(
+        ctr=partners, years=year, columns=nam_loader.DATA_COLUMNS + ['ctr'],
+        data_path=DATA_PATH, m=country
+    ).rename(columns={'ctr': 'destination'})
+
+    if not result.empty:
+        print(f"  Found {len(result):,} export flows to {result['destination'].nunique()} partners")
         return result
     return pd.DataFrame()
 
@@ -131,28 +130,14 @@ def analyze_exports_by_product(exports_df: pd.DataFrame) -> pd.DataFrame:
     return result
 
 
-def categorize_product(product_code: str) -> str:
-    """Categorize a product code."""
-    for category, codes in PRODUCT_CATEGORIES.items():
-        for code in codes:
-            if str(product_code).startswith(code):
-                return category
-    if str(product_code).startswith('CPA_C'):
-        return 'Manufacturing (Other)'
-    elif str(product_code).startswith('CPA_'):
-        return 'Other Products'
-    return 'Non-Product'
-
-
 def analyze_exports_by_category(exports_df: pd.DataFrame) -> pd.DataFrame:
     """Analyze exports by product category."""
     if exports_df.empty:
         return pd.DataFrame(columns=['Category', 'Export_Value', 'Share_%'])
 
-    exports_df = exports_df.copy()
-    exports_df['Category'] = exports_df['Set_i'].apply(categorize_product)
-
-    by_category = exports_df.groupby('Category')['value'].sum().sort_values(ascending=False)
+    # Sum per product, then roll products up to categories (one sparse product, see nam_rollup)
+    by_product = exports_df.groupby('Set_i')['value'].sum()
+    by_category = nam_rollup.rollup(by_product, CATEGORY_GROUPING).sort_values(ascending=False)
 
     total = by_category.sum()
     result = pd.DataFrame({
@@ -14,11 +14,16 @@ Usage:
 
 import pandas as pd
 import numpy as np
-import pyarrow.parquet as pq
+import pyarrow.compute as pc
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_loader
+import nam_parallel
+import nam_scan
+from nam_codes import SET_CODES
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/')
@@ -27,60 +32,50 @@ TABLES_PATH.mkdir(exist_ok=True)
 
 # Sample countries
 SAMPLE_COUNTRIES = ['DE', 'FR', 'IT', 'ES', 'NL', 'PL', 'AT', 'GR']
+YEARS = range(2010, 2024)
 
-# Category mappings for Set_i codes
-SET_I_CATEGORIES = {
-    'CPA_Products': lambda x: x.startswith('CPA_'),
-    'D_Transactions': lambda x: x.startswith('D'),
-    'B_Balances': lambda x: x.startswith('B'),
-    'P_Uses': lambda x: x.startswith('P'),
-    'Other': lambda x: True  # Catch-all
-}
 
-# Category mappings for Set_j codes
-SET_J_CATEGORIES = {
-    'Industries': lambda x: len(x) <= 4 and not x.startswith(('P', 'D', 'B', 'S', 'F', 'N')),
-    'Final_Demand': lambda x: x.startswith('P'),
-    'Sectors': lambda x: x.startswith('S'),
-    'Other': lambda x: True
-}
+def load_all_data():
+    """Load all parquet files and filter for negative values."""
+    print("Loading all data and filtering negative values...")
 
+    partitions = nam_loader.list_partitions(SAMPLE_COUNTRIES, YEARS, DATA_PATH)
+    print(f"  Scanning {len(partitions)}/{len(SAMPLE_COUNTRIES) * len(YEARS)} files...")
 
-def categorize_code(code: str, category_map: dict) -> str:
-    """Categorize a code based on mapping rules."""
-    for category, rule in category_map.items():
-        if rule(str(code)):
-            return category
-    return 'Other'
+    # One scan with the negative filter pushed down; codes stay categorical
+    negatives = nam_loader.load(
+        ctr=SAMPLE_COUNTRIES, years=YEARS, data_path=DATA_PATH, categorical=True,
+        filter=pc.field('value') < 0
+    )
+    if negatives.empty:
+        return pd.DataFrame()
+    return negatives.rename(columns={'base': 'year', 'ctr': 'country'})
 
 
-def load_all_data():
-    """Load all parquet files and filter for negative values."""
-    print("Loading all data and filtering negative values...")
+class NegativeValues(nam_scan.Consumer):
+    """Negative-value rows of the sample countries (nam_scan.py)."""
+
+    name = 'negatives'
 
-    all_negatives = []
+    def partitions(self, available):
+        return [(year, ctr) for year in YEARS for ctr in SAMPLE_COUNTRIES]
 
-    years = range(2010, 2024)
-    total_files = len(SAMPLE_COUNTRIES) * len(list(years))
-    processed = 0
+    def on_partition(self, df, ctr, year):
+        return df[df['value'] < 0]
 
-    for year in range(2010, 2024):
-        for country in SAMPLE_COUNTRIES:
-            file_path = DATA_PATH / f'base={year}' / f'ctr={country}' / 'part-0.parquet'
-            if file_path.exists():
-                df = pq.read_table(file_path).to_pandas()
-                negatives = df[df['value'] < 0].copy()
-                negatives['year'] = year
-                negatives['country'] = country
-                all_negatives.append(negatives)
+    def merge(self, partials):
+        negatives = nam_parallel.concat_frames(partials.values())
+        if negatives.empty:
+            return negatives
+        # Per-partition categories differ; re-encode with sorted categories as load() does
+        categorical = nam_loader.CODE_COLUMNS + nam_loader.PARTITION_COLUMNS
+        negatives = negatives.astype({column: 'category' for column in categorical})
+        return negatives.rename(columns={'base': 'year', 'ctr': 'country'})
 
-            processed += 1
-            if processed % 20 == 0:
-                print(f"  Processed {processed}/{total_files} files...")
 
-    if all_negatives:
-        return pd.concat(all_negatives, ignore_index=True)
-    return pd.DataFrame()
+def consumers():
+    """Consumers of the shared scan used by main(shared)."""
+    return [NegativeValues()]
 
 
 def analyze_by_category(df: pd.DataFrame):
@@ -88,11 +83,12 @@ def analyze_by_category(df: pd.DataFrame):
     print("\nAnalyzing by category...")
 
     # Categorize codes
-    df['Set_i_category'] = df['Set_i'].apply(lambda x: categorize_code(x, SET_I_CATEGORIES))
-    df['Set_j_category'] = df['Set_j'].apply(lambda x: categorize_code(x, SET_J_CATEGORIES))
+    # Categorize codes via the registry (rules: nam_codes.SET_I/SET_J_CATEGORIES)
+    df['Set_i_category'] = SET_CODES.lookup(df['Set_i'], 'negative_row_category')
+    df['Set_j_category'] = SET_CODES.lookup(df['Set_j'], 'negative_col_category')
 
     # Summary by Set_i category
-    set_i_summary = df.groupby('Set_i_category').agg(
+    set_i_summary = df.groupby('Set_i_category', observed=True).agg(
         count=('value', 'count'),
         total_value=('value', 'sum'),
         mean_value=('value', 'mean'),
@@ -101,7 +97,7 @@ def analyze_by_category(df: pd.DataFrame):
     ).round(2)
 
     # Summary by Set_j category
-    set_j_summary = df.groupby('Set_j_category').agg(
+    set_j_summary = df.groupby('Set_j_category', observed=True).agg(
         count=('value', 'count'),
         total_value=('value', 'sum'),
         mean_value=('value', 'mean'),
@@ -125,7 +121,7 @@ def analyze_by_year(df: pd.DataFrame):
     """Analyze negative values by year."""
     print("Analyzing by year...")
 
-    year_summary = df.groupby('year').agg(
+    year_summary = df.groupby('year', observed=True).agg(
         count=('value', 'count'),
         total_value=('value', 'sum'),
         mean_value=('value', 'mean'),
@@ -139,7 +135,7 @@ def analyze_by_country(df: pd.DataFrame):
     """Analyze negative values by country."""
     print("Analyzing by country...")
 
-    country_summary = df.groupby('country').agg(
+    country_summary = df.groupby('country', observed=True).agg(
         count=('value', 'count'),
         total_value=('value', 'sum'),
         mean_value=('value', 'mean'),
@@ -154,19 +150,19 @@ def analyze_specific_codes(df: pd.DataFrame):
     print("Analyzing specific codes...")
 
     # Top Set_i codes with negative values
-    top_set_i = df.groupby('Set_i').agg(
+    top_set_i = df.groupby('Set_i', observed=True).agg(
         count=('value', 'count'),
         total_value=('value', 'sum')
     ).sort_values('count', ascending=False).head(20)
 
     # Top Set_j codes with negative values
-    top_set_j = df.groupby('Set_j').agg(
+    top_set_j = df.groupby('Set_j', observed=True).agg(
         count=('value', 'count'),
         total_value=('value', 'sum')
     ).sort_values('count', ascending=False).head(20)
 
     # Top combinations
-    top_combinations = df.groupby(['Set_i', 'Set_j']).agg(
+    top_combinations = df.groupby(['Set_i', 'Set_j'], observed=True).agg(
         count=('value', 'count'),
         total_value=('value', 'sum')
     ).sort_values('count', ascending=False).head(30)
@@ -174,13 +170,13 @@ def analyze_specific_codes(df: pd.DataFrame):
     return top_set_i, top_set_j, top_combinations
 
 
-def main():
-    """Run negative values analysis."""
+def main(shared=None):
+    """Run negative values analysis (on the shared scan's results, if given)."""
     print("FIGARO-NAM Negative Values Analysis")
     print("=" * 60)
 
     # Load data
-    df = load_all_data()
+    df = shared['negatives'] if shared is not None else load_all_data()
 
     if df.empty:
         print("No data loaded!")
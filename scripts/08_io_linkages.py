@@ -5,6 +5,12 @@ This script analyzes intersectoral linkages in the economy:
 1. Main supplier and buyer sectors
 2. Backward and forward linkages
 3. Top intersectoral flows
+4. Output multipliers (column sums of the Leontief inverse)
+
+Flows are filtered and grouped as Arrow tables (`nam_arrow`); only the
+product x industry matrix and the top flows are converted to pandas.
+Leontief inverses come from the cache of all country-years (`nam_leontief`)
+when it is current, else are solved for the focus country-year alone.
 
 Output: CSV tables and heatmap to outputs/
 
@@ -14,13 +20,21 @@ Usage:
 
 import pandas as pd
 import numpy as np
-import pyarrow.parquet as pq
 import matplotlib.pyplot as plt
 import seaborn as sns
+import pyarrow as pa
+import pyarrow.compute as pc
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_arrow
+import nam_leontief
+import nam_loader
+import nam_rollup
+import nam_scan
+from nam_codes import SET_CODES
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/')
@@ -106,36 +120,13 @@ plt.style.use('seaborn-v0_8-whitegrid')
 NOMINAL_DISCLAIMER = "Source: FIGARO-NAM (Eurostat). All values nominal, not inflation-adjusted."
 
 
-def load_country_year(country: str, year: int) -> pd.DataFrame:
-    """Load data for a specific country and year."""
-    file_path = DATA_PATH / f'base={year}' / f'ctr={country}' / 'part-0.parquet'
-    if file_path.exists():
-        return pq.read_table(file_path).to_pandas()
-    return pd.DataFrame()
-
-
-def is_industry_code(code: str) -> bool:
-    """Check if a code is an industry code (not a transaction code)."""
-    if pd.isna(code):
-        return False
-    code = str(code)
-    # Industry codes are typically short alphanumeric
-    # Exclude transaction codes (D, B, P, S, F, N prefixes for non-industries)
-    if code.startswith(('D1', 'D2', 'D3', 'D4', 'D5', 'D6', 'D7', 'D8', 'D9',
-                        'B1', 'B2', 'B3', 'B8', 'B9',
-                        'P1', 'P2', 'P3', 'P5', 'P6',
-                        'S1', 'S2', 'CPA_')):
-        return False
-    # Check for valid industry patterns
-    return len(code) <= 10 and any(c.isalpha() for c in code)
+def load_country_year(country: str, year: int, columns=None, **predicates) -> pa.Table:
+    """Load data for a specific country and year as an Arrow table (dictionary-encoded codes)."""
+    return nam_loader.load_table(country, year, columns or nam_loader.DATA_COLUMNS, DATA_PATH,
+                                 categorical=True, **predicates)
 
 
-def is_product_code(code: str) -> bool:
-    """Check if a code is a CPA product code."""
-    return str(code).startswith('CPA_')
-
-
-def extract_io_matrix(df: pd.DataFrame) -> pd.DataFrame:
+def extract_io_matrix(table: pa.Table) -> pa.Table:
     """Extract intermediate consumption matrix (products x industries)."""
     # Filter for CPA products (rows) going to industries (columns)
     # This represents intermediate consumption
@@ -144,35 +135,29 @@ def extract_io_matrix(df: pd.DataFrame) -> pd.DataFrame:
     # Industries are in Set_j
 
     # Filter for domestic flows only (m = country)
-    domestic = df[df['m'] == FOCUS_COUNTRY].copy()
+    domestic = nam_arrow.filter_rows(table, FOCUS_COUNTRY, domestic=True)
 
     # Filter for product-to-industry flows
-    io_flows = domestic[
-        domestic['Set_i'].apply(is_product_code) &
-        domestic['Set_j'].apply(is_industry_code)
-    ].copy()
-
-    return io_flows
+    # Registry attributes (nam_codes.is_product_code / is_industry_code), once per code
+    is_product = nam_arrow.dictionary_mask(domestic['Set_i'],
+                                           lambda codes: SET_CODES.mask(codes, 'is_product'))
+    is_industry = nam_arrow.dictionary_mask(domestic['Set_j'],
+                                            lambda codes: SET_CODES.mask(codes, 'is_industry'))
+    return domestic.filter(pc.and_(is_product, is_industry))
 
 
-def build_linkage_matrix(io_flows: pd.DataFrame) -> pd.DataFrame:
+def build_linkage_matrix(io_flows: pa.Table) -> pd.DataFrame:
     """Build sector linkage matrix from IO flows."""
     # Aggregate by Set_i (product/supplying sector) and Set_j (receiving industry)
-    matrix = io_flows.pivot_table(
-        index='Set_i',
-        columns='Set_j',
-        values='value',
-        aggfunc='sum',
-        fill_value=0
-    )
+    matrix = nam_arrow.group_sum(io_flows, ['Set_i', 'Set_j']).unstack(fill_value=0)
 
     return matrix
 
 
-def calculate_top_flows(io_flows: pd.DataFrame, n: int = 30) -> pd.DataFrame:
+def calculate_top_flows(io_flows: pa.Table, n: int = 30) -> pd.DataFrame:
     """Identify top intersectoral flows."""
     # Group by product-industry pair
-    top = io_flows.groupby(['Set_i', 'Set_j'])['value'].sum()
+    top = nam_arrow.group_sum(io_flows, ['Set_i', 'Set_j'])
     top = top.sort_values(ascending=False).head(n)
 
     result = pd.DataFrame({
@@ -200,6 +185,23 @@ def calculate_forward_linkages(matrix: pd.DataFrame) -> pd.Series:
     return matrix.sum(axis=1).sort_values(ascending=False)
 
 
+def calculate_output_multipliers(country: str, year: int) -> pd.DataFrame:
+    """Output multipliers of the industries with output (column sums of (I - A)^-1)."""
+    leontief = nam_leontief.open_leontief(data_path=DATA_PATH)
+    if leontief is None or not leontief.has(year, country):
+        leontief = nam_leontief.build_leontief(year, country, DATA_PATH, cache_path=None)
+    multipliers = leontief.multipliers()
+    multipliers = multipliers[(multipliers['year'] == year) & (multipliers['country'] == country)
+                              & (multipliers['output'] > 0)]
+    result = pd.DataFrame({
+        'Industry': multipliers['industry'],
+        'Label': [INDUSTRY_LABELS.get(i, i) for i in multipliers['industry']],
+        'Output': multipliers['output'],
+        'Output_Multiplier': multipliers['multiplier'],
+    })
+    return result.sort_values('Output_Multiplier', ascending=False).reset_index(drop=True)
+
+
 def plot_linkages_heatmap(matrix: pd.DataFrame, country: str, year: int):
     """Create heatmap of sector linkages."""
     print("\nCreating linkages heatmap...")
@@ -254,26 +256,48 @@ def plot_linkages_heatmap(matrix: pd.DataFrame, country: str, year: int):
     print(f"  Saved: {FIGURES_PATH / 'sector_linkages_heatmap.png'}")
 
 
-def main():
-    """Run IO linkages analysis."""
+class IOFlows(nam_scan.Consumer):
+    """Product-to-industry flows of the focus country-year (nam_scan.py)."""
+
+    name = 'io_linkages'
+    columns = nam_loader.DATA_COLUMNS
+
+    def partitions(self, available):
+        return [(ANALYSIS_YEAR, FOCUS_COUNTRY)]
+
+    def on_partition(self, df, ctr, year):
+        table = pa.Table.from_pandas(df[nam_loader.DATA_COLUMNS], preserve_index=False)
+        return extract_io_matrix(table)
+
+    def merge(self, partials):
+        return next(iter(partials.values()), None)
+
+
+def consumers():
+    """Consumers of the shared scan used by main(shared)."""
+    return [IOFlows()]
+
+
+def main(shared=None):
+    """Run IO linkages analysis (on the shared scan's results, if given)."""
     print("FIGARO-NAM Input-Output Linkages Analysis")
     print("=" * 60)
     print(f"Focus: {FOCUS_COUNTRY}, Year: {ANALYSIS_YEAR}")
 
-    # Load data
-    print(f"\nLoading {FOCUS_COUNTRY} data for {ANALYSIS_YEAR}...")
-    df = load_country_year(FOCUS_COUNTRY, ANALYSIS_YEAR)
-
-    if df.empty:
+    # Load data and extract IO matrix
+    if shared is not None:
+        io_flows = shared['io_linkages']
+    else:
+        print(f"\nLoading {FOCUS_COUNTRY} data for {ANALYSIS_YEAR}...")
+        table = load_country_year(FOCUS_COUNTRY, ANALYSIS_YEAR)
+        print(f"Loaded {table.num_rows:,} rows")
+        print("\nExtracting IO flows...")
+        io_flows = extract_io_matrix(table) if table.num_rows else None
+
+    if io_flows is None:
         print("No data loaded!")
         return
-
-    print(f"Loaded {len(df):,} rows")
-
-    # Extract IO matrix
-    print("\nExtracting IO flows...")
-    io_flows = extract_io_matrix(df)
-    print(f"Found {len(io_flows):,} product-to-industry flows")
+    print(f"Found {io_flows.num_rows:,} product-to-industry flows")
 
     # Build linkage matrix
     print("Building linkage matrix...")
@@ -297,6 +321,13 @@ def main():
     matrix.to_csv(TABLES_PATH / 'sector_linkages_matrix.csv')
     print(f"  Saved: {TABLES_PATH / 'sector_linkages_matrix.csv'}")
 
+    # Section-level view: products and industries rolled up to NACE sections A-T
+    sections = nam_rollup.rollup(matrix, 'nace_section', axis=0)
+    sections = nam_rollup.rollup(sections, 'nace_section', axis=1)
+    sections.rename_axis(index='Product section', columns='Industry section').to_csv(
+        TABLES_PATH / 'sector_linkages_by_section.csv')
+    print(f"  Saved: {TABLES_PATH / 'sector_linkages_by_section.csv'}")
+
     top_flows.to_csv(TABLES_PATH / 'top_intersectoral_flows.csv', index=False)
     print(f"  Saved: {TABLES_PATH / 'top_intersectoral_flows.csv'}")
 
@@ -317,6 +348,11 @@ def main():
     forward_df.to_csv(TABLES_PATH / 'forward_linkages.csv', index=False)
     print(f"  Saved: {TABLES_PATH / 'forward_linkages.csv'}")
 
+    # Output multipliers from the Leontief inverse
+    multipliers = calculate_output_multipliers(FOCUS_COUNTRY, ANALYSIS_YEAR)
+    multipliers.to_csv(TABLES_PATH / 'output_multipliers.csv', index=False)
+    print(f"  Saved: {TABLES_PATH / 'output_multipliers.csv'}")
+
     # Create visualization
     plot_linkages_heatmap(matrix, FOCUS_COUNTRY, ANALYSIS_YEAR)
 
@@ -338,6 +374,10 @@ def main():
         label = str(prod).replace('CPA_', '')
         print(f"  {i+1}. {label}: {val/1e6:.1f} Bn EUR")
 
+    print("\n\nTop 10 Industries by Output Multiplier (Leontief inverse column sums):")
+    for i, row in enumerate(multipliers.head(10).itertuples()):
+        print(f"  {i+1}. {row.Label}: {row.Output_Multiplier:.3f}")
+
     # Key insights
     print("\n" + "=" * 60)
     print("Key Findings:")
@@ -19,7 +19,9 @@ import pandas as pd
 import json
 import logging
 from pathlib import Path
-import pyarrow.parquet as pq
+
+import nam_loader
+from nam_codes import ACCOUNT_LABELS, SECTOR_LABELS, SET_CODES, sector_label, sector_labels
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
 log = logging.getLogger(__name__)
@@ -80,101 +82,9 @@ COUNTRY_NAMES = {
     'WRL_REST': 'Rest of World'
 }
 
-# NACE/CPA sector names
-SECTOR_NAMES = {
-    'A01': 'Agriculture',
-    'A02': 'Forestry',
-    'A03': 'Fishing',
-    'B': 'Mining',
-    'C10-C12': 'Food products',
-    'C13-C15': 'Textiles',
-    'C16': 'Wood products',
-    'C17': 'Paper',
-    'C18': 'Printing',
-    'C19': 'Coke and petroleum',
-    'C20': 'Chemicals',
-    'C21': 'Pharmaceuticals',
-    'C22': 'Rubber and plastics',
-    'C23': 'Glass, ceramics, building materials',
-    'C24': 'Basic metals',
-    'C25': 'Fabricated metals',
-    'C26': 'Computer, electronics, optics',
-    'C27': 'Electrical equipment',
-    'C28': 'Machinery',
-    'C29': 'Motor vehicles',
-    'C30': 'Other transport equipment',
-    'C31_C32': 'Furniture, other manufacturing',
-    'C33': 'Repair of machinery',
-    'D35': 'Energy supply',
-    'E36': 'Water supply',
-    'E37-E39': 'Sewerage, waste, recycling',
-    'F': 'Construction',
-    'G45': 'Motor vehicle trade and repair',
-    'G46': 'Wholesale trade',
-    'G47': 'Retail trade',
-    'H49': 'Land transport',
-    'H50': 'Water transport',
-    'H51': 'Air transport',
-    'H52': 'Warehousing, transport services',
-    'H53': 'Postal and courier services',
-    'I': 'Accommodation and food services',
-    'J58': 'Publishing',
-    'J59_J60': 'Film, TV, broadcasting',
-    'J61': 'Telecommunications',
-    'J62_J63': 'IT services',
-    'K64': 'Financial services',
-    'K65': 'Insurance',
-    'K66': 'Financial and insurance auxiliaries',
-    'L': 'Real estate',
-    'M69_M70': 'Legal, accounting, consulting',
-    'M71': 'Architecture and engineering',
-    'M72': 'Research and development',
-    'M73': 'Advertising and market research',
-    'M74_M75': 'Other professional services',
-    'N77': 'Rental and leasing',
-    'N78': 'Employment services',
-    'N79': 'Travel agencies',
-    'N80-N82': 'Security, building services',
-    'O84': 'Public administration',
-    'P85': 'Education',
-    'Q86': 'Health care',
-    'Q87_Q88': 'Residential care, social work',
-    'R90-R92': 'Arts, entertainment',
-    'R93': 'Sports and recreation',
-    'S94': 'Membership organizations',
-    'S95': 'Repair of consumer goods',
-    'S96': 'Other personal services',
-    'T': 'Households as employers'
-}
-
-# ESA 2010 Codes
-CODE_LABELS = {
-    'D11': 'Wages and salaries',
-    'D12': 'Employer social contributions',
-    'D21X31': 'Taxes minus subsidies on products',
-    'D29X39': 'Other taxes minus subsidies on production',
-    'B2': 'Operating surplus',
-    'B3': 'Mixed income',
-    'P3_S13': 'Government consumption',
-    'P3_S14': 'Household consumption',
-    'P3_S15': 'NPISH consumption',
-    'P51G': 'Gross fixed capital formation',
-    'P6': 'Exports',
-    'P7': 'Imports'
-}
-
-
-def get_sector_name(code):
-    """Get English label for sector code."""
-    # Try direct match
-    if code in SECTOR_NAMES:
-        return SECTOR_NAMES[code]
-    # Try without CPA_ prefix
-    clean_code = code.replace('CPA_', '').replace('_', '-')
-    if clean_code in SECTOR_NAMES:
-        return SECTOR_NAMES[clean_code]
-    # Fallback: code itself
-    return code
+# Sector and ESA code labels (nam_codes concordance)
+SECTOR_NAMES = SECTOR_LABELS
+CODE_LABELS = ACCOUNT_LABELS
 
 
 def generate_time_series():
@@ -260,10 +170,7 @@ def generate_trade_for_country(ctr, year=2019):
 
     try:
         # Load data from parquet
-        df = pq.read_table(
-            DATA_PARQUET,
-            filters=[('base', '=', year), ('ctr', '=', ctr)]
-        ).to_pandas()
+        df = nam_loader.load_country_year(ctr, year, data_path=DATA_PARQUET)
 
         if len(df) == 0:
             return None
@@ -271,7 +178,7 @@ def generate_trade_for_country(ctr, year=2019):
         # Exports by partner: Flows from domestic products (CPA_*) to foreign industries
         # These are intermediate exports (goods going to foreign production)
         exports_flow = df[
-            (df['Set_i'].str.startswith('CPA_', na=False)) &
+            SET_CODES.mask(df['Set_i'], 'is_product') &
             (df['m'] != ctr)  # Foreign destination
         ]
         exports = exports_flow.groupby('m')['value'].sum().reset_index()
@@ -297,9 +204,9 @@ def generate_trade_for_country(ctr, year=2019):
 
         # Alternative: Sum all foreign product flows to domestic industries
         imports_from_foreign = df[
-            (df['Set_i'].str.startswith('CPA_', na=False)) &
+            SET_CODES.mask(df['Set_i'], 'is_product') &
             (df['m'] != ctr) &  # Foreign origin
-            (df['Set_j'].str.match(r'^[A-Z][0-9]|^[A-Z]$|^C[0-9]', na=False))  # To industries
+            SET_CODES.mask(df['Set_j'], 'is_nace_column')  # To industries
         ]
 
         # Actually, we need to find what was imported from each country
@@ -347,13 +254,14 @@ def generate_trade_for_country(ctr, year=2019):
         imports_by_product = imports_by_product.sort_values('value', ascending=False)
         total_sector_imports = imports_by_product['value'].sum()
 
-        for _, row in imports_by_product.head(20).iterrows():
-            code = str(row['Set_i'])
+        top = imports_by_product.head(20)
+        for code, label, value in zip(top['Set_i'].astype(str), sector_labels(top['Set_i']),
+                                      top['value']):
             country_data['imports_by_sector'].append({
                 'code': code,
-                'label': get_sector_name(code),
-                'value': float(row['value']),
-                'share': float(row['value']) / total_sector_imports * 100 if total_sector_imports > 0 else 0
+                'label': label,
+                'value': float(value),
+                'share': float(value) / total_sector_imports * 100 if total_sector_imports > 0 else 0
             })
 
         return country_data
@@ -442,7 +350,7 @@ def generate_trade_partners():
                         code = str(row.get('Set_i', ''))
                         country_data['imports_by_sector'].append({
                             'code': code,
-                            'label': get_sector_name(code),
+                            'label': sector_label(code),
                             'value': float(row.get('value', 0)),
                             'share': float(row.get('value', 0)) / total_imports * 100 if total_imports > 0 else 0
                         })
@@ -478,10 +386,7 @@ def generate_sectors_for_country(ctr, year=2019):
 
         for yr in years_needed:
             try:
-                df = pq.read_table(
-                    DATA_PARQUET,
-                    filters=[('base', '=', yr), ('ctr', '=', ctr)]
-                ).to_pandas()
+                df = nam_loader.load_country_year(ctr, yr, data_path=DATA_PARQUET)
                 df['year'] = yr
                 all_data.append(df)
             except Exception as e:
@@ -495,16 +400,17 @@ def generate_sectors_for_country(ctr, year=2019):
 
         # Calculate sector dynamics (total output by industry)
         # Filter for actual industry columns (NACE codes)
-        industry_pattern = r'^[A-Z][0-9]|^[A-Z]$|^C[0-9]'
+        # (nam_codes.INDUSTRY_PATTERN, evaluated once per code in the registry)
         sector_output = combined_df[
-            combined_df['Set_j'].str.match(industry_pattern, na=False) &
+            SET_CODES.mask(combined_df['Set_j'], 'is_nace_column') &
             (combined_df['m'] == ctr)  # Domestic only
         ].groupby(['year', 'Set_j'])['value'].sum().reset_index()
 
         if len(sector_output) > 0:
             sector_pivot = sector_output.pivot(index='Set_j', columns='year', values='value')
 
-            for sector in sector_pivot.index:
+            labels = sector_labels(sector_pivot.index)
+            for sector, label in zip(sector_pivot.index, labels):
                 row_data = sector_pivot.loc[sector]
                 val_2019 = row_data.get(2019, 0)
                 val_2020 = row_data.get(2020, 0)
@@ -517,7 +423,7 @@ def generate_sectors_for_country(ctr, year=2019):
 
                 country_data['dynamics'].append({
                     'code': sector,
-                    'label': get_sector_name(sector),
+                    'label': label,
                     'change_2020': float(change_2020) if pd.notna(change_2020) else 0,
                     'change_2021': float(change_2021) if pd.notna(change_2021) else 0,
                     'change_2022': float(change_2022) if pd.notna(change_2022) else 0
@@ -528,24 +434,26 @@ def generate_sectors_for_country(ctr, year=2019):
         wages = df_base[(df_base['Set_i'] == 'D11') & (df_base['m'] == ctr)].groupby('Set_j')['value'].sum().reset_index()
         wages = wages.sort_values('value', ascending=False)
 
-        for _, row in wages.head(30).iterrows():
-            code = str(row['Set_j'])
+        top = wages.head(30)
+        for code, label, value in zip(top['Set_j'].astype(str), sector_labels(top['Set_j']),
+                                      top['value']):
             country_data['wages_by_sector'].append({
                 'code': code,
-                'label': get_sector_name(code),
-                'value': float(row['value'])
+                'label': label,
+                'value': float(value)
             })
 
         # Household consumption by product (P3_S14 column)
         consumption = df_base[(df_base['Set_j'] == 'P3_S14') & (df_base['m'] == ctr)].groupby('Set_i')['value'].sum().reset_index()
         consumption = consumption.sort_values('value', ascending=False)
 
-        for _, row in consumption.head(30).iterrows():
-            code = str(row['Set_i'])
+        top = consumption.head(30)
+        for code, label, value in zip(top['Set_i'].astype(str), sector_labels(top['Set_i']),
+                                      top['value']):
             country_data['consumption_by_product'].append({
                 'code': code,
-                'label': get_sector_name(code),
-                'value': float(row['value'])
+                'label': label,
+                'value': float(value)
             })
 
         return country_data
@@ -595,7 +503,7 @@ def generate_sectors():
                         change_2022 = row.get('change_2021_2022', 0)
                         country_data['dynamics'].append({
                             'code': code,
-                            'label': get_sector_name(code),
+                            'label': sector_label(code),
                             'change_2020': float(change_2020) if pd.notna(change_2020) else 0,
                             'change_2021': float(change_2021) if pd.notna(change_2021) else 0,
                             'change_2022': float(change_2022) if pd.notna(change_2022) else 0
@@ -607,7 +515,7 @@ def generate_sectors():
                         code = str(row.get('Set_j', row.get('Industry', '')))
                         country_data['wages_by_sector'].append({
                             'code': code,
-                            'label': get_sector_name(code),
+                            'label': sector_label(code),
                             'value': float(row.get('value', 0))
                         })
 
@@ -617,7 +525,7 @@ def generate_sectors():
                         code = str(row.get('Set_i', row.get('Product', '')))
                         country_data['consumption_by_product'].append({
                             'code': code,
-                            'label': get_sector_name(code),
+                            'label': sector_label(code),
                             'value': float(row.get('value', 0))
                         })
 
@@ -647,11 +555,9 @@ def generate_linkages_for_country(ctr, year=2019):
     }
 
     try:
-        # Load data from parquet
-        df = pq.read_table(
-            DATA_PARQUET,
-            filters=[('base', '=', year), ('ctr', '=', ctr)]
-        ).to_pandas()
+        # Load data from parquet (product rows only)
+        df = nam_loader.load_country_year(ctr, year, data_path=DATA_PARQUET,
+                                          set_i_prefix='CPA_')
 
         if len(df) == 0:
             return None
@@ -659,48 +565,51 @@ def generate_linkages_for_country(ctr, year=2019):
         # Backward linkages: Intermediate inputs by industry (sum of CPA_ products going to industries)
         # Filter for intermediate consumption (products to industries)
         intermediate = df[
-            (df['Set_i'].str.startswith('CPA_', na=False)) &
-            (df['Set_j'].str.match(r'^[A-Z][0-9]|^[A-Z]$|^C[0-9]', na=False)) &
+            SET_CODES.mask(df['Set_i'], 'is_product') &
+            SET_CODES.mask(df['Set_j'], 'is_nace_column') &
             (df['m'] == ctr)  # Domestic intermediate consumption
         ]
 
         backward = intermediate.groupby('Set_j')['value'].sum().reset_index()
         backward = backward.sort_values('value', ascending=False)
 
-        for _, row in backward.head(20).iterrows():
-            code = str(row['Set_j'])
+        top = backward.head(20)
+        for code, label, value in zip(top['Set_j'].astype(str), sector_labels(top['Set_j']),
+                                      top['value']):
             country_data['backward'].append({
                 'code': code,
-                'label': get_sector_name(code),
-                'value': float(row['value'])
+                'label': label,
+                'value': float(value)
             })
 
         # Forward linkages: Total supply by product
         # Filter for products (CPA_) and sum their values
-        forward = df[df['Set_i'].str.startswith('CPA_', na=False)].groupby('Set_i')['value'].sum().reset_index()
+        forward = df[SET_CODES.mask(df['Set_i'], 'is_product')].groupby('Set_i')['value'].sum().reset_index()
         forward = forward.sort_values('value', ascending=False)
 
-        for _, row in forward.head(20).iterrows():
-            code = str(row['Set_i'])
+        top = forward.head(20)
+        for code, label, value in zip(top['Set_i'].astype(str), sector_labels(top['Set_i']),
+                                      top['value']):
             country_data['forward'].append({
                 'code': code,
-                'label': get_sector_name(code),
-                'value': float(row['value'])
+                'label': label,
+                'value': float(value)
             })
 
         # Top intersectoral flows (product -> industry)
         flows = intermediate.groupby(['Set_i', 'Set_j'])['value'].sum().reset_index()
         flows = flows.sort_values('value', ascending=False)
 
-        for _, row in flows.head(15).iterrows():
-            from_code = str(row['Set_i'])
-            to_code = str(row['Set_j'])
+        top = flows.head(15)
+        for from_code, from_label, to_code, to_label, value in zip(
+                top['Set_i'].astype(str), sector_labels(top['Set_i']),
+                top['Set_j'].astype(str), sector_labels(top['Set_j']), top['value']):
             country_data['top_flows'].append({
                 'from_code': from_code,
-                'from_label': get_sector_name(from_code),
+                'from_label': from_label,
                 'to_code': to_code,
-                'to_label': get_sector_name(to_code),
-                'value': float(row['value'])
+                'to_label': to_label,
+                'value': float(value)
             })
 
         return country_data
@@ -753,7 +662,7 @@ def generate_linkages():
                         label = str(row.get('Label', ''))
                         country_data['backward'].append({
                             'code': code,
-                            'label': get_sector_name(code) if get_sector_name(code) != code else label,
+                            'label': sector_label(code) if sector_label(code) != code else label,
                             'value': float(row.get('Intermediate_Inputs', 0))
                         })
 
@@ -763,7 +672,7 @@ def generate_linkages():
                         code = str(row.get('Product', ''))
                         country_data['forward'].append({
                             'code': code,
-                            'label': get_sector_name(code),
+                            'label': sector_label(code),
                             'value': float(row.get('Total_Supply', 0))
                         })
 
@@ -774,9 +683,9 @@ def generate_linkages():
                         to_code = str(row.get('To_Industry', row.get('to', '')))
                         country_data['top_flows'].append({
                             'from_code': from_code,
-                            'from_label': get_sector_name(from_code),
+                            'from_label': sector_label(from_code),
                             'to_code': to_code,
-                            'to_label': get_sector_name(to_code),
+                            'to_label': sector_label(to_code),
                             'value': float(row.get('Value', row.get('value', 0)))
                         })
 
@@ -1,21 +1,29 @@
 """
 10_generate_all_timeseries.py - Generate time series for all 8 focus countries
 
-Reads Parquet data directly and generates time series CSVs for:
+Builds the time-series panel of all countries and years in one job
+(nam_panel, one parallel read of the dataset) and derives the CSVs for:
 DE, FR, IT, ES, AT, PL, GR, NL
 
-Output: outputs/tables/{CTR}_time_series.csv
+The panel also holds the totals of the country groups in nam_regions.REGIONS
+(EU27, EA20, SOUTH, NORTH) whose members are all in the dataset.
+
+Output: outputs/tables/time_series_panel.parquet,
+        outputs/tables/{CTR}_time_series.csv
 
 Usage:
     python scripts/10_generate_all_timeseries.py
 """
 
-import pyarrow.parquet as pq
 import pandas as pd
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_panel
+import nam_parallel
+from nam_regions import REGIONS
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/tables/')
@@ -25,54 +33,20 @@ YEARS = list(range(2010, 2024))
 FOCUS_COUNTRIES = ['DE', 'FR', 'IT', 'ES', 'AT', 'PL', 'GR', 'NL']
 
 
-def load_country_year(ctr, year):
-    """Load data for specific country and year."""
-    return pq.read_table(
-        DATA_PATH,
-        filters=[('base', '=', int(year)), ('ctr', '=', ctr)]
-    ).to_pandas()
-
-
-def get_aggregate(df, ctr, set_i=None, set_j=None):
-    """Calculate aggregate for specific transaction type."""
-    mask = df['m'] == ctr
-    if set_i:
-        mask &= df['Set_i'] == set_i
-    if set_j:
-        mask &= df['Set_j'] == set_j
-    return df[mask]['value'].sum()
-
-
-def build_time_series(ctr):
-    """Build time series of key aggregates for a country."""
-    print(f"  Processing {ctr}...", end=" ", flush=True)
-
-    data = []
-    for year in YEARS:
-        df = load_country_year(ctr, year)
-
-        row = {
-            'year': int(year),
-            'country': ctr,
-            'wages_D11': get_aggregate(df, ctr, set_i='D11'),
-            'surplus_B2': get_aggregate(df, ctr, set_i='B2'),
-            'hh_consumption': get_aggregate(df, ctr, set_j='P3_S14'),
-            'gov_consumption': get_aggregate(df, ctr, set_j='P3_S13'),
-            'investment': get_aggregate(df, ctr, set_j='P51G'),
-        }
-
-        # Imports (products from foreign partners)
-        imports = df[
-            (df['Set_i'].str.startswith('CPA_')) &
-            (df['m'] != ctr)
-        ]['value'].sum()
-        row['imports'] = imports
-
-        data.append(row)
+def build_panel():
+    """Key aggregates of every country for YEARS, written as one parquet panel.
 
-    result = pd.DataFrame(data)
-    print(f"done ({len(result)} years)")
-    return result
+    Partitions fan out over worker processes (nam_parallel); the cube and
+    marginals sidecars answer the country-years they hold.
+    """
+    print(f"  Building panel on {nam_parallel.WORKERS} workers...", flush=True)
+    panel = nam_panel.build_panel(years=YEARS, data_path=DATA_PATH)
+    path = nam_panel.write_panel(panel, OUTPUT_PATH / 'time_series_panel.parquet', DATA_PATH)
+    regions = [name for name in REGIONS if name in set(panel['country'])]
+    print(f"  Panel: {panel['country'].nunique() - len(regions)} countries x {len(YEARS)} years "
+          f"-> {path}")
+    print(f"  Regions: {', '.join(regions) or 'none complete'}")
+    return panel
 
 
 def main():
@@ -83,10 +57,11 @@ def main():
     print(f"Years: {YEARS[0]}-{YEARS[-1]} ({len(YEARS)} years)")
     print(f"Output: {OUTPUT_PATH}/\n")
 
+    panel = build_panel()
     all_data = []
 
     for ctr in FOCUS_COUNTRIES:
-        ts = build_time_series(ctr)
+        ts = nam_panel.country_series(panel, ctr)
 
         # Save individual country file
         output_file = OUTPUT_PATH / f'{ctr}_time_series.csv'
@@ -126,7 +101,7 @@ def main():
 
     print("\n" + "=" * 60)
     print("TIME SERIES GENERATION COMPLETE")
-    print(f"Files created: {len(FOCUS_COUNTRIES) + 1}")
+    print(f"Files created: {len(FOCUS_COUNTRIES) + 2}")
     print("=" * 60)
 
 
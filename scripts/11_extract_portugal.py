@@ -1,8 +1,8 @@
 """
 11_extract_portugal.py - Extract Portugal time series data
 
-Reads Parquet data for Portugal (PT) and generates time series CSV
-matching the format of other country files.
+Slices the Portugal (PT) time series from the all-countries panel
+(nam_panel) and writes a CSV matching the format of other country files.
 
 Output: outputs/tables/PT_time_series.csv
 
@@ -10,12 +10,12 @@ Usage:
     python scripts/11_extract_portugal.py
 """
 
-import pyarrow.parquet as pq
-import pandas as pd
 from pathlib import Path
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_panel
+
 # Configuration
 DATA_PATH = Path('data/parquet/')
 OUTPUT_PATH = Path('outputs/tables/')
@@ -25,54 +25,22 @@ YEARS = list(range(2010, 2024))
 COUNTRY = 'PT'
 
 
-def load_country_year(ctr, year):
-    """Load data for specific country and year."""
-    return pq.read_table(
-        DATA_PATH,
-        filters=[('base', '=', int(year)), ('ctr', '=', ctr)]
-    ).to_pandas()
-
-
-def get_aggregate(df, ctr, set_i=None, set_j=None):
-    """Calculate aggregate for specific transaction type."""
-    mask = df['m'] == ctr
-    if set_i:
-        mask &= df['Set_i'] == set_i
-    if set_j:
-        mask &= df['Set_j'] == set_j
-    return df[mask]['value'].sum()
-
-
 def build_time_series(ctr):
-    """Build time series of key aggregates for a country."""
-    print(f"Processing {ctr}...", flush=True)
-
-    data = []
-    for year in YEARS:
-        print(f"  Year {year}...", end=" ", flush=True)
-        df = load_country_year(ctr, year)
-
-        row = {
-            'year': int(year),
-            'country': ctr,
-            'wages_D11': get_aggregate(df, ctr, set_i='D11'),
-            'surplus_B2': get_aggregate(df, ctr, set_i='B2'),
-            'hh_consumption': get_aggregate(df, ctr, set_j='P3_S14'),
-            'gov_consumption': get_aggregate(df, ctr, set_j='P3_S13'),
-            'investment': get_aggregate(df, ctr, set_j='P51G'),
-        }
-
-        # Imports (products from foreign partners)
-        imports = df[
-            (df['Set_i'].str.startswith('CPA_')) &
-            (df['m'] != ctr)
-        ]['value'].sum()
-        row['imports'] = imports
-
-        data.append(row)
-        print("done", flush=True)
-
-    return pd.DataFrame(data)
+    """Build time series of key aggregates for a country.
+
+    Sliced from the panel written by 10_generate_all_timeseries.py when it is
+    current; otherwise built for this country alone (nam_panel.build_panel).
+    """
+    panel = nam_panel.load_panel(OUTPUT_PATH / 'time_series_panel.parquet', DATA_PATH)
+    if (panel is None or ctr not in set(panel['country'])
+            or not set(YEARS) <= set(panel['year'])):
+        print(f"Processing {ctr}...", flush=True)
+        panel = nam_panel.build_panel(years=YEARS, countries=ctr, data_path=DATA_PATH)
+    else:
+        print(f"Reading {ctr} from the time-series panel...", flush=True)
+
+    ts = nam_panel.country_series(panel, ctr)
+    return ts[ts['year'].isin(YEARS)].reset_index(drop=True)
 
 
 def main():
@@ -14,6 +14,10 @@ Analyses:
 3. Real recovery index (H1b): HICP-adjusted
 4. Fiscal cushioning (H4): Gov consumption growth
 
+Input: the time-series panel (outputs/tables/time_series_panel.parquet from
+10_generate_all_timeseries.py), which also holds the SOUTH and NORTH totals
+(nam_regions); built for the countries below if missing or stale.
+
 Output:
 - outputs/tables/recovery_comparison.csv
 - outputs/tables/basis_effect_analysis.csv
@@ -34,15 +38,20 @@ from scipy import stats
 import warnings
 warnings.filterwarnings('ignore')
 
+import nam_panel
+from nam_regions import REGIONS, region_of
+
 # Configuration
+DATA_PATH = Path('data/parquet/')
 OUTPUT_TABLES = Path('outputs/tables/')
 OUTPUT_FIGURES = Path('outputs/figures/')
 OUTPUT_TABLES.mkdir(parents=True, exist_ok=True)
 OUTPUT_FIGURES.mkdir(parents=True, exist_ok=True)
 
-# Country groups
-SOUTH = ['ES', 'IT', 'GR', 'PT']
-NORTH = ['DE', 'AT', 'NL']
+# Country groups (defined in nam_regions.REGIONS) and their labels
+REGION_LABELS = {'SOUTH': 'South', 'NORTH': 'North'}
+SOUTH = REGIONS['SOUTH']
+NORTH = REGIONS['NORTH']
 ALL_COUNTRIES = SOUTH + NORTH + ['FR', 'PL']  # Include FR, PL for comparison
 
 # HICP Annual Average Indices (2015=100) - Eurostat data
@@ -68,24 +77,34 @@ HICP_YEARS = [2019, 2020, 2021, 2022, 2023]
 
 
 def load_all_timeseries():
-    """Load time series for all countries."""
+    """Time series of ALL_COUNTRIES and the SOUTH/NORTH totals, from the panel."""
     print("Loading time series data...")
 
-    data = []
-    for ctr in ALL_COUNTRIES:
-        file_path = OUTPUT_TABLES / f'{ctr}_time_series.csv'
-        if file_path.exists():
-            df = pd.read_csv(file_path)
-            data.append(df)
-            print(f"  {ctr}: {len(df)} years")
-        else:
-            print(f"  {ctr}: MISSING - {file_path}")
-
-    combined = pd.concat(data, ignore_index=True)
+    wanted = ALL_COUNTRIES + list(REGION_LABELS)
+    panel = nam_panel.load_panel(OUTPUT_TABLES / 'time_series_panel.parquet', DATA_PATH)
+    if panel is None or not set(wanted) <= set(panel['country']):
+        print("  Panel missing or stale, building it for the analysed countries...")
+        panel = nam_panel.build_panel(years=HICP_YEARS, countries=ALL_COUNTRIES,
+                                      data_path=DATA_PATH)
+
+    combined = panel[panel['country'].isin(wanted)].reset_index(drop=True)
+    for ctr in wanted:
+        print(f"  {ctr}: {(combined['country'] == ctr).sum()} years")
     print(f"\nTotal: {len(combined)} data points\n")
     return combined
 
 
+def region_label(ctr):
+    """'South', 'North' or 'Other'."""
+    return REGION_LABELS.get(region_of(ctr, REGION_LABELS), 'Other')
+
+
+def region_change(df, region, column, start, end):
+    """Percent change of a region's total between two years (a panel lookup)."""
+    series = nam_panel.country_series(df, region).set_index('year')[column]
+    return (series[end] - series[start]) / series[start] * 100
+
+
 def get_hicp_deflator(country, year):
     """Get HICP index for deflation (2019=100 base)."""
     if country not in HICP_DATA or year not in HICP_YEARS:
@@ -115,7 +134,7 @@ def analyze_basis_effect(df):
         recovery_rate = (hh_2022 - hh_2020) / hh_2020 * 100
         net_change_2019_2022 = (hh_2022 - hh_2019) / hh_2019 * 100
 
-        region = 'South' if ctr in SOUTH else ('North' if ctr in NORTH else 'Other')
+        region = region_label(ctr)
 
         results.append({
             'country': ctr,
@@ -161,6 +180,12 @@ def analyze_basis_effect(df):
         avg_net = reg_data['net_change_2019_2022_pct'].mean()
         print(f"  {region}: Drop {avg_drop:+.1f}%, Recovery {avg_recovery:+.1f}%, Net {avg_net:+.1f}%")
 
+    print("Regional totals (sum of members):")
+    for name, label in REGION_LABELS.items():
+        print(f"  {label}: Drop {region_change(df, name, 'hh_consumption', 2019, 2020):+.1f}%, "
+              f"Recovery {region_change(df, name, 'hh_consumption', 2020, 2022):+.1f}%, "
+              f"Net {region_change(df, name, 'hh_consumption', 2019, 2022):+.1f}%")
+
     # Save results
     result_df.to_csv(OUTPUT_TABLES / 'basis_effect_analysis.csv', index=False)
     print(f"\nSaved: {OUTPUT_TABLES / 'basis_effect_analysis.csv'}")
@@ -242,7 +267,7 @@ def analyze_recovery_indices(df):
         ctr_data = df[df['country'] == ctr]
         hh_2019 = ctr_data[ctr_data['year'] == 2019]['hh_consumption'].values[0]
 
-        region = 'South' if ctr in SOUTH else ('North' if ctr in NORTH else 'Other')
+        region = region_label(ctr)
 
         for year in [2019, 2020, 2021, 2022, 2023]:
             hh = ctr_data[ctr_data['year'] == year]['hh_consumption'].values[0]
@@ -418,7 +443,7 @@ def analyze_fiscal_cushion(df):
         # Net HH change 2019-2022
         hh_net_change = (hh_2022 - hh_2019) / hh_2019 * 100
 
-        region = 'South' if ctr in SOUTH else ('North' if ctr in NORTH else 'Other')
+        region = region_label(ctr)
 
         results.append({
             'country': ctr,
@@ -466,6 +491,12 @@ def analyze_fiscal_cushion(df):
         print(f"  {region}: Gov growth {avg_gov:+.1f}%, HH drop {avg_hh_drop:+.1f}%, "
               f"HH net {avg_hh_net:+.1f}%")
 
+    print("Regional totals (sum of members):")
+    for name, label in REGION_LABELS.items():
+        print(f"  {label}: Gov growth {region_change(df, name, 'gov_consumption', 2019, 2022):+.1f}%, "
+              f"HH drop {region_change(df, name, 'hh_consumption', 2019, 2020):+.1f}%, "
+              f"HH net {region_change(df, name, 'hh_consumption', 2019, 2022):+.1f}%")
+
     # Save
     result_df.to_csv(OUTPUT_TABLES / 'fiscal_response.csv', index=False)
     print(f"\nSaved: {OUTPUT_TABLES / 'fiscal_response.csv'}")
@@ -0,0 +1,122 @@
+"""Arrow-native filters and group-by aggregates (no pandas until the result).
+
+Loaded tables keep their code columns as Arrow dictionary arrays
+(`nam_loader.load_table(..., categorical=True)`). The functions here filter
+them with `pyarrow.compute`, group them with `Table.group_by` on the
+dictionary indices and sum in Arrow. Only the grouped result, a few hundred
+rows, is converted to pandas, so the value column is never copied and no
+object strings are built.
+
+Per-code tests the expression language cannot express (registry attributes,
+regexes) go through `dictionary_mask`, which evaluates them once per
+dictionary entry and gathers the result by index, like the categorical
+helpers in `nam_loader`.
+
+Usage:
+    import nam_arrow, nam_loader
+
+    table = nam_loader.load_table('DE', 2019, nam_loader.DATA_COLUMNS, categorical=True)
+    wages = nam_arrow.group_sum(table, 'Set_j', ctr='DE', set_i='D11', domestic=True)
+    imports = nam_arrow.total(table, ctr='DE', set_i_prefix='CPA_', domestic=False)
+"""
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+import nam_loader
+
+# Aggregations by pandas name: (Arrow hash function, options)
+AGGREGATES = {
+    'sum': ('sum', pc.ScalarAggregateOptions(min_count=0)),
+    'mean': ('mean', None),
+    'count': ('count', None),
+    'min': ('min', None),
+    'max': ('max', None),
+    'std': ('stddev', pc.VarianceOptions(ddof=1)),
+    'var': ('variance', pc.VarianceOptions(ddof=1)),
+}
+
+
+def row_filter(ctr=None, domestic=None, **predicates):
+    """Filter expression from loader-style predicates (see nam_loader.build_filter).
+
+    With ctr given, domestic compares m to that code, so the table needs no
+    ctr column.
+    """
+    if ctr is None:
+        return nam_loader.build_filter(domestic=domestic, **predicates)
+    expression = nam_loader.build_filter(**predicates)
+    if domestic is not None:
+        term = pc.field('m') == ctr if domestic else pc.field('m') != ctr
+        expression = term if expression is None else expression & term
+    return expression
+
+
+def filter_rows(table: pa.Table, ctr=None, **predicates) -> pa.Table:
+    """Rows of table matching the predicates."""
+    expression = row_filter(ctr, **predicates)
+    return table if expression is None else table.filter(expression)
+
+
+def dictionary_mask(column: pa.ChunkedArray, test) -> pa.ChunkedArray:
+    """Boolean mask of a code column from test(pd.Index of codes) -> bool array.
+
+    Dictionary chunks are tested once per entry and gathered by index;
+    plain string chunks are tested row by row.
+    """
+    chunks = []
+    for chunk in column.chunks:
+        if pa.types.is_dictionary(chunk.type):
+            per_code = pa.array(np.asarray(test(pd.Index(chunk.dictionary.to_pylist())), bool))
+            chunks.append(per_code.take(chunk.indices))
+        else:
+            chunks.append(pa.array(np.asarray(test(pd.Index(chunk.to_pylist())), bool)))
+    return pa.chunked_array(chunks, pa.bool_())
+
+
+def _values(table: pa.Table) -> pa.Table:
+    """Table with NaN values as nulls, which Arrow aggregates skip like pandas."""
+    values = table.column('value')
+    return table.set_column(table.schema.get_field_index('value'), 'value',
+                            pc.if_else(pc.is_nan(values), None, values))
+
+
+def _decoded(column: pa.ChunkedArray) -> pa.ChunkedArray:
+    """Dictionary column cast to its value type (others unchanged)."""
+    if pa.types.is_dictionary(column.type):
+        return column.cast(column.type.value_type)
+    return column
+
+
+def group_aggregate(table: pa.Table, keys, funcs=('sum',)) -> pd.DataFrame:
+    """Aggregates of value per group, sorted by key; one column per pandas-style name."""
+    keys = [keys] if isinstance(keys, str) else list(keys)
+    unknown = [func for func in funcs if func not in AGGREGATES]
+    if unknown:
+        raise ValueError(f"Unsupported aggregate(s): {', '.join(unknown)}")
+    # Partitions carry their own dictionaries; group_by needs one per column
+    table = table.select([*keys, 'value']).unify_dictionaries()
+    grouped = _values(table).group_by(keys).aggregate(
+        [('value', *AGGREGATES[func]) for func in funcs]
+    )
+    # Only the (small) result is converted; key dictionaries decode to plain labels
+    labels = pa.table({key: _decoded(grouped.column(key)) for key in keys}).to_pandas()
+    index = pd.MultiIndex.from_frame(labels) if len(keys) > 1 else pd.Index(labels[keys[0]])
+    result = pd.DataFrame({
+        func: grouped.column(f'value_{AGGREGATES[func][0]}').to_numpy() for func in funcs
+    }, index=index)
+    return result.sort_index()
+
+
+def group_sum(table: pa.Table, keys, ctr=None, **predicates) -> pd.Series:
+    """Sum of value per group of the rows matching the predicates (a pandas Series)."""
+    result = group_aggregate(filter_rows(table, ctr, **predicates), keys, ['sum'])
+    return result['sum'].rename('value')
+
+
+def total(table: pa.Table, ctr=None, **predicates) -> float:
+    """Sum of value over the rows matching the predicates."""
+    values = _values(filter_rows(table, ctr, **predicates).select(['value'])).column('value')
+    return float(pc.sum(values, min_count=0).as_py())
@@ -0,0 +1,404 @@
+"""Canonical registry of FIGARO-NAM codes with stable integer ids.
+
+Every Set_i/Set_j code (CPA products, NACE industries and the D/B/P/F/S/N
+account codes) and every partner code (m, ctr) gets a small integer id.
+Classification attributes that the scripts used to re-derive per row by
+string parsing are computed once per code at registration and stored as
+arrays indexed by id, so a filter over millions of rows is one gather.
+
+CPA products and NACE industries are spelled differently ('CPA_C10-12' vs
+'C10-C12', 'CPA_J62_63' vs 'J62_J63'). The concordance maps each product to
+its industry once per code (CONCORDANCE, the 'nace_industry' attribute), so
+relabelling rows or aligning product x industry matrices is a gather too.
+
+Usage:
+    from nam_codes import SET_CODES, align_products, sector_labels
+
+    df['Set_i_type'] = SET_CODES.lookup(df['Set_i'], 'code_type')
+    io_mask = SET_CODES.mask(df['Set_i'], 'is_product') & SET_CODES.mask(df['Set_j'], 'is_industry')
+    df['label'] = sector_labels(df['Set_i'])          # 'CPA_C29' -> 'Motor vehicles'
+    square = align_products(matrix)                  # products x industries -> industries x industries
+
+Codes not in the seed lists are appended (sorted) the first time they are
+seen, so seeded ids never change.
+"""
+
+import re
+
+import numpy as np
+import pandas as pd
+
+# NACE Rev. 2 industries (A*64 aggregation used by FIGARO)
+NACE_INDUSTRIES = [
+    'A01', 'A02', 'A03', 'B', 'C10-C12', 'C13-C15', 'C16', 'C17', 'C18', 'C19',
+    'C20', 'C21', 'C22', 'C23', 'C24', 'C25', 'C26', 'C27', 'C28', 'C29', 'C30',
+    'C31_C32', 'C33', 'D35', 'E36', 'E37-E39', 'F', 'G45', 'G46', 'G47', 'H49',
+    'H50', 'H51', 'H52', 'H53', 'I', 'J58', 'J59_J60', 'J61', 'J62_J63', 'K64',
+    'K65', 'K66', 'L', 'M69_M70', 'M71', 'M72', 'M73', 'M74_M75', 'N77', 'N78',
+    'N79', 'N80-N82', 'O84', 'P85', 'Q86', 'Q87_Q88', 'R90-R92', 'R93', 'S94',
+    'S95', 'S96', 'T',
+]
+
+
+def product_code(industry: str) -> str:
+    """CPA product code for a NACE industry ('C10-C12' -> 'CPA_C10-12')."""
+    return 'CPA_' + re.sub(r'([-_])[A-Z]', r'\1', industry)
+
+
+# CPA 2.1 products, one per industry
+CPA_PRODUCTS = [product_code(code) for code in NACE_INDUSTRIES]
+
+# ESA 2010 account codes by block
+ACCOUNT_CODES = [
+    'D11', 'D12', 'D21X31', 'D29X39', 'D4', 'D5', 'D61', 'D62', 'D7', 'D8', 'D9',
+    'B2', 'B3', 'B8_S11', 'B8_S12', 'B8_S13', 'B8_S14', 'B8_S15', 'B8_S2', 'B9FX9',
+    'P3_S13', 'P3_S14', 'P3_S15', 'P33', 'P51G', 'P6', 'P7',
+    'F1', 'F21', 'F22', 'F29', 'F31', 'F32', 'F41', 'F42', 'F51', 'F52', 'F6', 'F7', 'F8',
+    'S11', 'S12', 'S13', 'S14', 'S15', 'S2',
+    'N111G', 'N112G', 'N1131G', 'N1132G', 'N115G', 'N1171G', 'N1179G', 'N11OG', 'NP',
+]
+
+# Partner / reporting countries (m and ctr)
+PARTNER_CODES = [
+    'AT', 'BE', 'BG', 'CY', 'CZ', 'DE', 'DK', 'EE', 'ES', 'FI', 'FR', 'GR', 'HR', 'HU',
+    'IE', 'IT', 'LT', 'LU', 'LV', 'MT', 'NL', 'PL', 'PT', 'RO', 'SE', 'SI', 'SK',
+    'AL', 'CH', 'GB', 'ME', 'MK', 'NO', 'RS', 'RU', 'TR',
+    'AR', 'BR', 'CA', 'MX', 'US',
+    'AU', 'CN', 'ID', 'IN', 'JP', 'KR',
+    'SA', 'ZA',
+    'WRL_REST',
+]
+
+# English labels of the NACE industries (and of their CPA products)
+SECTOR_LABELS = {
+    'A01': 'Agriculture',
+    'A02': 'Forestry',
+    'A03': 'Fishing',
+    'B': 'Mining',
+    'C10-C12': 'Food products',
+    'C13-C15': 'Textiles',
+    'C16': 'Wood products',
+    'C17': 'Paper',
+    'C18': 'Printing',
+    'C19': 'Coke and petroleum',
+    'C20': 'Chemicals',
+    'C21': 'Pharmaceuticals',
+    'C22': 'Rubber and plastics',
+    'C23': 'Glass, ceramics, building materials',
+    'C24': 'Basic metals',
+    'C25': 'Fabricated metals',
+    'C26': 'Computer, electronics, optics',
+    'C27': 'Electrical equipment',
+    'C28': 'Machinery',
+    'C29': 'Motor vehicles',
+    'C30': 'Other transport equipment',
+    'C31_C32': 'Furniture, other manufacturing',
+    'C33': 'Repair of machinery',
+    'D35': 'Energy supply',
+    'E36': 'Water supply',
+    'E37-E39': 'Sewerage, waste, recycling',
+    'F': 'Construction',
+    'G45': 'Motor vehicle trade and repair',
+    'G46': 'Wholesale trade',
+    'G47': 'Retail trade',
+    'H49': 'Land transport',
+    'H50': 'Water transport',
+    'H51': 'Air transport',
+    'H52': 'Warehousing, transport services',
+    'H53': 'Postal and courier services',
+    'I': 'Accommodation and food services',
+    'J58': 'Publishing',
+    'J59_J60': 'Film, TV, broadcasting',
+    'J61': 'Telecommunications',
+    'J62_J63': 'IT services',
+    'K64': 'Financial services',
+    'K65': 'Insurance',
+    'K66': 'Financial and insurance auxiliaries',
+    'L': 'Real estate',
+    'M69_M70': 'Legal, accounting, consulting',
+    'M71': 'Architecture and engineering',
+    'M72': 'Research and development',
+    'M73': 'Advertising and market research',
+    'M74_M75': 'Other professional services',
+    'N77': 'Rental and leasing',
+    'N78': 'Employment services',
+    'N79': 'Travel agencies',
+    'N80-N82': 'Security, building services',
+    'O84': 'Public administration',
+    'P85': 'Education',
+    'Q86': 'Health care',
+    'Q87_Q88': 'Residential care, social work',
+    'R90-R92': 'Arts, entertainment',
+    'R93': 'Sports and recreation',
+    'S94': 'Membership organizations',
+    'S95': 'Repair of consumer goods',
+    'S96': 'Other personal services',
+    'T': 'Households as employers'
+}
+
+# English labels of ESA 2010 account codes
+ACCOUNT_LABELS = {
+    'D11': 'Wages and salaries',
+    'D12': 'Employer social contributions',
+    'D21X31': 'Taxes minus subsidies on products',
+    'D29X39': 'Other taxes minus subsidies on production',
+    'B2': 'Operating surplus',
+    'B3': 'Mixed income',
+    'P3_S13': 'Government consumption',
+    'P3_S14': 'Household consumption',
+    'P3_S15': 'NPISH consumption',
+    'P51G': 'Gross fixed capital formation',
+    'P6': 'Exports',
+    'P7': 'Imports'
+}
+
+
+# CPA <-> NACE concordance (one product per industry, in seed order)
+_INDUSTRIES = {**{code: code for code in NACE_INDUSTRIES}, **dict(zip(CPA_PRODUCTS, NACE_INDUSTRIES))}
+
+
+def nace_industry(code: str):
+    """NACE industry of a CPA product ('CPA_C10-12' -> 'C10-C12') or industry; None otherwise."""
+    return _INDUSTRIES.get(code)
+
+
+def sector_label(code: str) -> str:
+    """English label of an industry, CPA product or account code; the code itself if unknown."""
+    industry = nace_industry(code)
+    if industry is not None:
+        return SECTOR_LABELS[industry]
+    return ACCOUNT_LABELS.get(code, code)
+
+
+CONCORDANCE = pd.DataFrame({
+    'product': CPA_PRODUCTS,
+    'industry': NACE_INDUSTRIES,
+    'section': [code[0] for code in NACE_INDUSTRIES],
+    'label': [SECTOR_LABELS[code] for code in NACE_INDUSTRIES],
+})
+
+
+# Classification rules (one call per distinct code, never per row)
+
+# Labels returned by code_type, in the (sorted) order of the block matrices
+CODE_TYPES = [
+    'Assets (N)', 'Balancing (B)', 'Distributive (D)', 'Expenditure (P)', 'Financial (F)',
+    'Industries (NACE)', 'Products (CPA)', 'Sectors (S)', 'Unknown',
+]
+
+
+def code_type(code: str) -> str:
+    """Block type of a code, as reported in block_structure.csv."""
+    if pd.isna(code):
+        return 'Unknown'
+    if code.startswith('CPA_'):
+        return 'Products (CPA)'
+    elif code.startswith('D') and code[1:2].isdigit():
+        return 'Distributive (D)'
+    elif code.startswith('B'):
+        return 'Balancing (B)'
+    elif code.startswith('P') and (len(code) < 4 or code[1:2].isdigit()):
+        return 'Expenditure (P)'
+    elif code.startswith('F') and code[1:2].isdigit():
+        return 'Financial (F)'
+    elif code.startswith('S') and code[1:2].isdigit():
+        return 'Sectors (S)'
+    elif code.startswith('N') and code[1:2].isdigit():
+        return 'Assets (N)'
+    else:
+        return 'Industries (NACE)'
+
+
+# Category mappings for Set_i codes (negative values analysis)
+SET_I_CATEGORIES = {
+    'CPA_Products': lambda x: x.startswith('CPA_'),
+    'D_Transactions': lambda x: x.startswith('D'),
+    'B_Balances': lambda x: x.startswith('B'),
+    'P_Uses': lambda x: x.startswith('P'),
+    'Other': lambda x: True  # Catch-all
+}
+
+# Category mappings for Set_j codes (negative values analysis)
+SET_J_CATEGORIES = {
+    'Industries': lambda x: len(x) <= 4 and not x.startswith(('P', 'D', 'B', 'S', 'F', 'N')),
+    'Final_Demand': lambda x: x.startswith('P'),
+    'Sectors': lambda x: x.startswith('S'),
+    'Other': lambda x: True
+}
+
+
+def categorize_code(code: str, category_map: dict) -> str:
+    """Categorize a code based on mapping rules."""
+    for category, rule in category_map.items():
+        if rule(str(code)):
+            return category
+    return 'Other'
+
+
+def is_industry_code(code: str) -> bool:
+    """Check if a code is an industry code (not a transaction code)."""
+    if pd.isna(code):
+        return False
+    code = str(code)
+    # Exclude transaction codes (D, B, P, S, F, N prefixes for non-industries)
+    if code.startswith(('D1', 'D2', 'D3', 'D4', 'D5', 'D6', 'D7', 'D8', 'D9',
+                        'B1', 'B2', 'B3', 'B8', 'B9',
+                        'P1', 'P2', 'P3', 'P5', 'P6',
+                        'S1', 'S2', 'CPA_')):
+        return False
+    return len(code) <= 10 and any(c.isalpha() for c in code)
+
+
+def is_product_code(code: str) -> bool:
+    """Check if a code is a CPA product code."""
+    return str(code).startswith('CPA_')
+
+
+# Column codes treated as industries by the dashboard generator
+INDUSTRY_PATTERN = re.compile(r'^[A-Z][0-9]|^[A-Z]$|^C[0-9]')
+
+SET_CODE_CLASSIFIERS = {
+    'code_type': code_type,
+    'negative_row_category': lambda code: categorize_code(code, SET_I_CATEGORIES),
+    'negative_col_category': lambda code: categorize_code(code, SET_J_CATEGORIES),
+    'is_product': is_product_code,
+    'is_industry': is_industry_code,
+    'is_nace_column': lambda code: INDUSTRY_PATTERN.match(code) is not None,
+    'nace_industry': lambda code: nace_industry(code) or '',
+    'label': sector_label,
+}
+
+
+class CodeRegistry:
+    """Ordered code list with stable integer ids and per-code attributes."""
+
+    def __init__(self, codes, classifiers=None):
+        self.codes = []
+        self._ids = {}
+        self.classifiers = dict(classifiers or {})
+        self._values = {name: [] for name in self.classifiers}
+        self._arrays = {}
+        for code in codes:
+            self._register(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __contains__(self, code):
+        return code in self._ids
+
+    def _register(self, code: str):
+        """Append one code and classify it."""
+        self._ids[code] = len(self.codes)
+        self.codes.append(code)
+        for name, classify in self.classifiers.items():
+            self._values[name].append(classify(code))
+        self._arrays.clear()
+
+    def extend(self, codes) -> int:
+        """Register unseen codes in sorted order; return how many were new."""
+        new = sorted({str(c) for c in codes} - self._ids.keys())
+        for code in new:
+            self._register(code)
+        return len(new)
+
+    def id(self, code: str) -> int:
+        """Integer id of a single code (registering it if unseen)."""
+        self.extend([code])
+        return self._ids[code]
+
+    def _ids_for(self, codes) -> np.ndarray:
+        """Ids of distinct codes, registering unseen ones."""
+        self.extend(codes)
+        return np.fromiter((self._ids[str(c)] for c in codes), dtype=np.int32, count=len(codes))
+
+    def ids(self, values) -> np.ndarray:
+        """Integer ids for a column of codes.
+
+        Categoricals are translated per category; other arrays are factorized
+        first, so the Python-level work is proportional to the distinct codes.
+        """
+        if isinstance(getattr(values, 'dtype', None), pd.CategoricalDtype):
+            categorical = values.cat if isinstance(values, pd.Series) else values
+            codes = np.asarray(categorical.codes)
+            uniques = categorical.categories
+        else:
+            codes, uniques = pd.factorize(np.asarray(values, dtype=object))
+        if (codes < 0).any():
+            raise ValueError("Missing codes cannot be mapped to registry ids")
+        return self._ids_for(list(uniques))[codes]
+
+    def attribute(self, name: str):
+        """Per-id attribute array (bool ndarray for flags, Categorical for labels)."""
+        if name not in self._arrays:
+            values = self._values[name]
+            if all(isinstance(v, (bool, np.bool_)) for v in values):
+                self._arrays[name] = np.array(values, dtype=bool)
+            else:
+                self._arrays[name] = pd.Categorical(values)
+        return self._arrays[name]
+
+    def lookup(self, values, name: str):
+        """Attribute of every row in values (a gather by id).
+
+        Label attributes come back as a Categorical restricted to the labels
+        that occur, so grouping or cross-tabulating on them is compact.
+        """
+        ids = self.ids(values)
+        attr = self.attribute(name)
+        if isinstance(attr, np.ndarray):
+            return attr[ids]
+        label_codes = np.asarray(attr.codes)[ids]
+        used = np.bincount(label_codes, minlength=len(attr.categories)) > 0
+        remap = np.cumsum(used) - 1
+        return pd.Categorical.from_codes(remap[label_codes], attr.categories[used])
+
+    def mask(self, values, name: str, value=True) -> np.ndarray:
+        """Boolean mask of rows whose attribute equals value."""
+        ids = self.ids(values)
+        per_id = np.asarray(self.attribute(name) == value)
+        return per_id[ids]
+
+    def codes_where(self, name: str, value=True) -> list:
+        """Registered codes whose attribute equals value (e.g. for pushdown filters)."""
+        per_id = np.asarray(self.attribute(name) == value)
+        return [code for code, keep in zip(self.codes, per_id) if keep]
+
+
+SET_CODES = CodeRegistry(CPA_PRODUCTS + NACE_INDUSTRIES + ACCOUNT_CODES, SET_CODE_CLASSIFIERS)
+PARTNERS = CodeRegistry(PARTNER_CODES)
+
+
+def code_type_ids(values) -> np.ndarray:
+    """Position in CODE_TYPES of each code's block type (one classification per distinct code)."""
+    return np.asarray(SET_CODES.lookup(values, 'code_type').set_categories(CODE_TYPES).codes,
+                      dtype=np.int64)
+
+
+def industry_positions(values) -> np.ndarray:
+    """Position in NACE_INDUSTRIES of each code's industry (products via the concordance), else -1."""
+    ids = SET_CODES.ids(values)
+    industries = SET_CODES.attribute('nace_industry')
+    per_label = pd.Index(NACE_INDUSTRIES).get_indexer(industries.categories)
+    return per_label[np.asarray(industries.codes)][ids]
+
+
+def sector_labels(values) -> pd.Categorical:
+    """English label of every row's code (one gather; see sector_label)."""
+    return SET_CODES.lookup(values, 'label')
+
+
+def align_products(matrix: pd.DataFrame) -> pd.DataFrame:
+    """Square NACE_INDUSTRIES x NACE_INDUSTRIES frame of a product x industry matrix.
+
+    Product rows (and columns) are moved to their industries' positions, so
+    row k and column k are the same activity. Codes outside the concordance
+    are dropped, and industries without a row or column are 0.
+    """
+    rows, columns = industry_positions(matrix.index), industry_positions(matrix.columns)
+    keep_rows, keep_columns = rows >= 0, columns >= 0
+    values = np.nan_to_num(matrix.to_numpy(dtype=np.float64)[np.ix_(keep_rows, keep_columns)])
+    square = np.zeros((len(NACE_INDUSTRIES), len(NACE_INDUSTRIES)))
+    np.add.at(square, np.ix_(rows[keep_rows], columns[keep_columns]), values)
+    return pd.DataFrame(square, index=pd.Index(NACE_INDUSTRIES, name=matrix.index.name),
+                        columns=pd.Index(NACE_INDUSTRIES, name=matrix.columns.name))
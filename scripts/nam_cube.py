@@ -0,0 +1,271 @@
+"""Dense memory-mapped NAM cube (year x ctr x Set_i x m x Set_j).
+
+Each country-year of FIGARO-NAM is a fixed-shape matrix, so the whole
+dataset fits a dense array. The cube is stored as one `.npy` file per base
+year under `data/cube/`, shaped (ctr, Set_i, m, Set_j), and opened with
+`np.load(mmap_mode='r')`. Selecting with labels returns numpy views, so
+aggregates become array sums over slices instead of re-reading and
+re-pivoting parquet files.
+
+Usage:
+    python scripts/nam_cube.py            # build data/cube/ from data/parquet/
+
+    from nam_cube import open_cube
+    cube = open_cube()
+    wages_by_industry = cube[2019, 'DE', 'D11', 'DE', :]          # view over Set_j
+    hh = cube.aggregate(2019, 'DE', set_j='P3_S14', domestic=True)
+
+Axes are stored in `axes.json` together with the size and mtime of every
+source file; `open_cube()` returns None when the cube is missing or stale.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+import nam_loader
+from nam_codes import SET_CODES, PARTNERS
+from nam_metrics import TIME_SERIES_METRICS
+
+# Configuration
+PROJECT_ROOT = Path(__file__).parent.parent
+CUBE_PATH = PROJECT_ROOT / 'data' / 'cube'
+META_FILE = 'axes.json'
+AXES = ('year', 'ctr', 'Set_i', 'm', 'Set_j')
+
+
+def _dictionary_indices(column: pa.ChunkedArray, positions: dict) -> np.ndarray:
+    """Axis positions of a dictionary-encoded column (one dict lookup per distinct code)."""
+    parts = []
+    for chunk in column.chunks:
+        lookup = np.array([positions[code] for code in chunk.dictionary.to_pylist()], dtype=np.int64)
+        parts.append(lookup[chunk.indices.to_numpy(zero_copy_only=False)])
+    return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+
+def build_cube(data_path: Path = nam_loader.DATA_PATH, cube_path: Path = CUBE_PATH,
+               dtype: str = 'float64') -> 'NamCube':
+    """Build the memory-mapped cube from the parquet dataset."""
+    data_path, cube_path = Path(data_path), Path(cube_path)
+    cube_path.mkdir(parents=True, exist_ok=True)
+    partitions = nam_loader.list_partitions(data_path=data_path)
+    if not partitions:
+        raise FileNotFoundError(f"No parquet partitions under {data_path}")
+
+    # Pass 1: axis labels (distinct codes, ordered by registry id)
+    print(f"Collecting axes from {len(partitions)} partitions...")
+    seen = {'Set_i': set(), 'm': set(), 'Set_j': set()}
+    for year, ctr in partitions:
+        table = nam_loader.load_table(ctr, year, nam_loader.CODE_COLUMNS, data_path,
+                                      categorical=True)
+        for column in seen:
+            for chunk in table.column(column).chunks:
+                seen[column].update(chunk.dictionary.to_pylist())
+    axes = {
+        'year': sorted({y for y, _ in partitions}),
+        'ctr': sorted({c for _, c in partitions}, key=PARTNERS.id),
+        'Set_i': sorted(seen['Set_i'], key=SET_CODES.id),
+        'm': sorted(seen['m'], key=PARTNERS.id),
+        'Set_j': sorted(seen['Set_j'], key=SET_CODES.id),
+    }
+    positions = {axis: {code: k for k, code in enumerate(axes[axis])} for axis in axes}
+    block_shape = (len(axes['Set_i']), len(axes['m']), len(axes['Set_j']))
+
+    # Pass 2: one dense (ctr, Set_i, m, Set_j) memmap per year
+    for year in axes['year']:
+        print(f"  Writing base={year}...")
+        cube = np.lib.format.open_memmap(
+            cube_path / f'base={year}.npy', mode='w+', dtype=dtype,
+            shape=(len(axes['ctr']),) + block_shape
+        )
+        for ctr in axes['ctr']:
+            if (year, ctr) not in partitions:
+                continue
+            table = nam_loader.load_table(ctr, year, nam_loader.DATA_COLUMNS, data_path,
+                                          categorical=True)
+            flat = np.ravel_multi_index((
+                _dictionary_indices(table.column('Set_i'), positions['Set_i']),
+                _dictionary_indices(table.column('m'), positions['m']),
+                _dictionary_indices(table.column('Set_j'), positions['Set_j']),
+            ), block_shape)
+            values = table.column('value').to_numpy()
+            cube[positions['ctr'][ctr]] = np.bincount(
+                flat, weights=values, minlength=int(np.prod(block_shape))
+            ).reshape(block_shape)
+        cube.flush()
+        del cube
+
+    meta = {
+        'axes': axes,
+        'dtype': dtype,
+        'partitions': [[y, c] for y, c in partitions],
+        'source': nam_loader.source_signature(partitions, data_path),
+    }
+    with open(cube_path / META_FILE, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return NamCube(cube_path)
+
+
+class NamCube:
+    """Label-addressable view over the per-year cube files."""
+
+    def __init__(self, cube_path: Path = CUBE_PATH):
+        self.path = Path(cube_path)
+        with open(self.path / META_FILE, encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.axes = self.meta['axes']
+        self.positions = {
+            axis: {label: k for k, label in enumerate(labels)}
+            for axis, labels in self.axes.items()
+        }
+        self.partitions = {(y, c) for y, c in self.meta['partitions']}
+        self._years = {}
+
+    def is_stale(self, data_path: Path = nam_loader.DATA_PATH) -> bool:
+        """True if the source partitions changed since the cube was built."""
+        current = nam_loader.list_partitions(data_path=data_path)
+        if set(current) != self.partitions:
+            return True
+        return nam_loader.source_signature(current, data_path) != self.meta['source']
+
+    def has(self, year: int, ctr: str) -> bool:
+        """Whether the cube holds data for this country-year."""
+        return (int(year), ctr) in self.partitions
+
+    def year(self, year: int) -> np.ndarray:
+        """Memory-mapped (ctr, Set_i, m, Set_j) array for one base year."""
+        year = int(year)
+        if year not in self._years:
+            self._years[year] = np.load(self.path / f'base={year}.npy', mmap_mode='r')
+        return self._years[year]
+
+    def index(self, axis: str, labels):
+        """Positions of labels on an axis (scalar, list, or slice(None))."""
+        if isinstance(labels, slice):
+            if labels != slice(None):
+                raise ValueError("Only ':' slices are supported; pass a list of labels instead")
+            return labels
+        if isinstance(labels, (str, int, np.integer)):
+            return self.positions[axis][labels]
+        return np.array([self.positions[axis][label] for label in labels], dtype=np.int64)
+
+    def __getitem__(self, key):
+        """Select cube[year, ctr, Set_i, m, Set_j] by labels.
+
+        Scalar labels and ':' give zero-copy views of the memmap; label lists
+        are gathered axis by axis (outer selection) and return copies.
+        """
+        if not isinstance(key, tuple):
+            key = (key,)
+        key = key + (slice(None),) * (len(AXES) - len(key))
+        year, selectors = key[0], key[1:]
+        if isinstance(year, slice) or not isinstance(year, (int, np.integer)):
+            years = self.axes['year'] if isinstance(year, slice) else list(year)
+            return np.stack([self[(y,) + selectors] for y in years])
+
+        positions = [self.index(axis, sel) for axis, sel in zip(AXES[1:], selectors)]
+        basic = tuple(p if not isinstance(p, np.ndarray) else slice(None) for p in positions)
+        result = self.year(year)[basic]
+        # Apply list selections on the axes that survived basic indexing
+        axis = 0
+        for p in positions:
+            if isinstance(p, np.ndarray):
+                result = np.take(result, p, axis=axis)
+            if not isinstance(p, (int, np.integer)):
+                axis += 1
+        return result
+
+    def labels(self, axis: str) -> list:
+        """Labels along an axis."""
+        return self.axes[axis]
+
+    def select(self, axis: str, name: str, value=True) -> list:
+        """Axis labels whose registry attribute equals value (e.g. 'is_product')."""
+        labels = self.axes[axis]
+        registry = PARTNERS if axis in ('ctr', 'm') else SET_CODES
+        return [label for label, keep in zip(labels, registry.mask(labels, name, value)) if keep]
+
+    def aggregate(self, year: int, ctr: str, set_i=None, set_j=None, m=None,
+                  set_i_prefix=None, set_j_prefix=None, domestic=None) -> float:
+        """Sum of one country-year block over the selected codes.
+
+        set_i, set_j, m: a code or list of codes (None = all).
+        set_i_prefix, set_j_prefix: keep only codes starting with the prefix.
+        domestic: True restricts m to ctr, False to all other partners.
+        """
+        if not self.has(year, ctr):
+            return np.nan
+        if set_i_prefix is not None:
+            set_i = self._prefixed('Set_i', set_i, set_i_prefix)
+        if set_j_prefix is not None:
+            set_j = self._prefixed('Set_j', set_j, set_j_prefix)
+        if domestic is True:
+            m = ctr
+        elif domestic is False:
+            m = [p for p in self.axes['m'] if p != ctr]
+        block = self[int(year), ctr,
+                     self._known('Set_i', set_i),
+                     self._known('m', m),
+                     self._known('Set_j', set_j)]
+        return float(np.sum(block))
+
+    def _prefixed(self, axis: str, labels, prefix) -> list:
+        """Axis labels starting with prefix (within labels, if given)."""
+        allowed = set(nam_loader._as_list(labels)) if labels is not None else None
+        return [label for label in self.axes[axis]
+                if label.startswith(prefix) and (allowed is None or label in allowed)]
+
+    def _known(self, axis: str, labels):
+        """Selector for aggregate(): ':' for None, labels absent from the axis dropped."""
+        if labels is None:
+            return slice(None)
+        if isinstance(labels, str):
+            return labels if labels in self.positions[axis] else []
+        return [label for label in labels if label in self.positions[axis]]
+
+    def frame(self, year: int, ctr: str, set_i=None, m=None, set_j=None) -> pd.DataFrame:
+        """Labelled Set_i x Set_j matrix for one country-year, summed over m."""
+        set_i = self.axes['Set_i'] if set_i is None else list(set_i)
+        set_j = self.axes['Set_j'] if set_j is None else list(set_j)
+        block = self[int(year), ctr, set_i, slice(None) if m is None else m, set_j]
+        if block.ndim == 3:
+            block = block.sum(axis=1)
+        return pd.DataFrame(block, index=pd.Index(set_i, name='Set_i'),
+                            columns=pd.Index(set_j, name='Set_j'))
+
+
+def time_series_row(cube: NamCube, year: int, ctr: str,
+                    metrics: dict = TIME_SERIES_METRICS) -> dict:
+    """One row of the country time series, computed from cube slices."""
+    row = {'year': int(year), 'country': ctr}
+    for name, spec in metrics.items():
+        row[name] = cube.aggregate(year, ctr, **spec)
+    return row
+
+
+def open_cube(cube_path: Path = CUBE_PATH, data_path: Path = nam_loader.DATA_PATH):
+    """Open the cube if it exists and matches the parquet source, else None."""
+    if not (Path(cube_path) / META_FILE).exists():
+        return None
+    cube = NamCube(cube_path)
+    if cube.is_stale(data_path):
+        print(f"Cube at {cube_path} is stale; rebuild with: python scripts/nam_cube.py")
+        return None
+    return cube
+
+
+def main():
+    """Build the cube from data/parquet/."""
+    print("FIGARO-NAM Cube Builder")
+    print("=" * 60)
+    cube = build_cube()
+    shape = (len(cube.axes['year']),) + cube.year(cube.axes['year'][0]).shape
+    print(f"\nCube shape (year, ctr, Set_i, m, Set_j): {shape}")
+    print(f"Saved: {cube.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+"""Pluggable dataframe engines for the loader and the aggregation layer.
+
+Two backends return the same results for the same calls:
+
+    pandas   per-partition Arrow reads (nam_loader), the fused metric kernel
+             (nam_metrics) and Arrow group-bys (nam_arrow), fanned out over
+             the nam_parallel process pool; current marginals sidecars
+             answer the metrics without reading the partition (default)
+    polars   one lazy Polars scan of the Hive tree with predicate and
+             projection pushdown; filters and group-bys run on Polars'
+             thread pool (POLARS_MAX_THREADS caps it)
+
+Polars is optional. Select it with NAM_ENGINE=polars or with `--engine polars`
+on the command line of any script; without Polars installed the pandas
+engine is used instead.
+
+The cube and the lattice are answered by their callers before an engine is
+asked, so both engines only see the partitions that need a scan.
+
+Usage:
+    from nam_engine import get_engine
+
+    engine = get_engine()                 # from --engine / NAM_ENGINE, else pandas
+    rows = engine.metric_rows([(2019, 'DE'), (2020, 'DE')])
+    wages = engine.group_sum('Set_j', ctr='DE', years=2019, set_i='D11', domestic=True)
+"""
+
+import os
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+import nam_arrow
+import nam_loader
+import nam_marginals
+import nam_parallel
+from nam_metrics import TIME_SERIES_METRICS, compute_metrics
+
+try:
+    import polars as pl
+except ImportError:
+    pl = None
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+ENGINE_VAR = 'NAM_ENGINE'
+ENGINE_FLAG = '--engine'
+ENGINES = ('pandas', 'polars')
+
+
+def partition_metrics(year: int, ctr: str, data_path: Path = DATA_PATH,
+                      metrics: dict = TIME_SERIES_METRICS) -> dict:
+    """Metric row of one country-year: sidecar if current, else one parquet read (worker task)."""
+    try:
+        row = nam_marginals.time_series_row(year, ctr, data_path, metrics)
+    except ValueError:
+        row = None  # a metric restricts two axes, which the sidecar cannot answer
+    if row is not None:
+        return row
+    df = nam_loader.load_country_year(ctr, year, nam_loader.DATA_COLUMNS, data_path,
+                                      categorical=True)
+    return {'year': int(year), 'country': ctr, **compute_metrics(df, ctr, metrics)}
+
+
+class PandasEngine:
+    """Partition-at-a-time reads into Arrow/pandas on the process pool."""
+
+    name = 'pandas'
+
+    def load(self, ctr=None, years=None, columns=None, data_path: Path = DATA_PATH,
+             **predicates) -> pd.DataFrame:
+        """Rows of the selected partitions matching the predicates (plain string codes)."""
+        return nam_loader.load(ctr, years, columns, data_path, **predicates)
+
+    def group_sum(self, keys, ctr=None, years=None, data_path: Path = DATA_PATH,
+                  **predicates) -> pd.Series:
+        """Sum of value per group, sorted by key (a Series named 'value')."""
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        table = nam_loader.load_table(ctr, years, [*keys, 'value'], data_path,
+                                      categorical=True, **predicates)
+        return nam_arrow.group_sum(table, keys)
+
+    def metric_rows(self, partitions, data_path: Path = DATA_PATH,
+                    metrics: dict = TIME_SERIES_METRICS, workers: int = None) -> list:
+        """{'year', 'country', <metrics>} for each (year, ctr), in input order."""
+        return nam_parallel.map_partitions(partition_metrics, partitions, workers,
+                                           data_path=data_path, metrics=metrics)
+
+
+class PolarsEngine:
+    """One lazy Polars scan per call, executed multi-threaded."""
+
+    name = 'polars'
+
+    def scan(self, data_path: Path = DATA_PATH):
+        """Lazy frame over every partition file, with base and ctr from the Hive paths."""
+        pattern = Path(data_path) / 'base=*' / 'ctr=*' / nam_loader.FILE_NAME
+        # base typed as in nam_loader.SCHEMA (int32), so results match the pandas engine
+        return pl.scan_parquet(str(pattern), hive_partitioning=True,
+                               hive_schema={'base': pl.Int32, 'ctr': pl.String})
+
+    def predicate(self, ctr=None, years=None, **predicates):
+        """Polars expression for the partitions and loader-style row predicates, or None."""
+        if predicates.get('filter') is not None:
+            raise ValueError("The polars engine does not take pyarrow 'filter' expressions")
+        terms = []
+        for column, codes in (('ctr', ctr), ('base', years), ('Set_i', predicates.get('set_i')),
+                              ('Set_j', predicates.get('set_j')), ('m', predicates.get('m'))):
+            codes = nam_loader._as_list(codes)
+            if codes is not None:
+                terms.append(pl.col(column).is_in([int(c) for c in codes] if column == 'base'
+                                                  else codes))
+        for column, prefix in (('Set_i', predicates.get('set_i_prefix')),
+                               ('Set_j', predicates.get('set_j_prefix'))):
+            if prefix:
+                terms.append(pl.col(column).str.starts_with(prefix))
+        if predicates.get('domestic') is not None:
+            terms.append(pl.col('m') == pl.col('ctr') if predicates['domestic']
+                         else pl.col('m') != pl.col('ctr'))
+        if not terms:
+            return None
+        expression = terms[0]
+        for term in terms[1:]:
+            expression = expression & term
+        return expression
+
+    def _filtered(self, data_path, ctr=None, years=None, **predicates):
+        frame = self.scan(data_path)
+        expression = self.predicate(ctr, years, **predicates)
+        return frame if expression is None else frame.filter(expression)
+
+    def load(self, ctr=None, years=None, columns=None, data_path: Path = DATA_PATH,
+             **predicates) -> pd.DataFrame:
+        """Rows of the selected partitions matching the predicates (plain string codes)."""
+        columns = list(columns or nam_loader.ALL_COLUMNS)
+        frame = self._filtered(data_path, ctr, years, **predicates)
+        return frame.select(columns).collect().to_pandas()
+
+    def group_sum(self, keys, ctr=None, years=None, data_path: Path = DATA_PATH,
+                  **predicates) -> pd.Series:
+        """Sum of value per group, sorted by key (a Series named 'value')."""
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        # NaN as null, so the sum skips it like pandas does
+        sums = (self._filtered(data_path, ctr, years, **predicates)
+                .group_by(keys).agg(pl.col('value').fill_nan(None).sum())
+                .sort(keys).collect().to_pandas())
+        return sums.set_index(keys if len(keys) > 1 else keys[0])['value']
+
+    def metric_rows(self, partitions, data_path: Path = DATA_PATH,
+                    metrics: dict = TIME_SERIES_METRICS, workers: int = None) -> list:
+        """{'year', 'country', <metrics>} for each (year, ctr), in input order.
+
+        All partitions are summed by one group-by over (base, ctr); workers is
+        ignored (Polars sizes its own thread pool).
+        """
+        partitions = list(partitions)
+        if not partitions:
+            return []
+        years = sorted({year for year, _ in partitions})
+        countries = sorted({ctr for _, ctr in partitions})
+        value = pl.col('value').fill_nan(None)
+        sums = []
+        for name, spec in metrics.items():
+            keep = self.predicate(**spec)
+            sums.append((value if keep is None else value.filter(keep)).sum().alias(name))
+        sums = (self._filtered(data_path, countries, years)
+                .group_by(['base', 'ctr']).agg(sums).collect())
+        found = {(row['base'], row['ctr']): row for row in sums.iter_rows(named=True)}
+        empty = dict.fromkeys(metrics, 0.0)
+        return [
+            {'year': int(year), 'country': ctr,
+             **{name: float(found.get((int(year), ctr), empty)[name]) for name in metrics}}
+            for year, ctr in partitions
+        ]
+
+
+def engine_name(argv=None) -> str:
+    """Engine requested by `--engine NAME` / `--engine=NAME` in argv, else NAM_ENGINE, else pandas."""
+    argv = sys.argv[1:] if argv is None else list(argv)
+    for i, arg in enumerate(argv):
+        if arg == ENGINE_FLAG and i + 1 < len(argv):
+            return argv[i + 1]
+        if arg.startswith(ENGINE_FLAG + '='):
+            return arg.split('=', 1)[1]
+    return os.environ.get(ENGINE_VAR) or 'pandas'
+
+
+def get_engine(name: str = None):
+    """The requested engine (see `engine_name`); pandas when Polars is not installed."""
+    name = (name or engine_name()).lower()
+    if name not in ENGINES:
+        raise ValueError(f"Unknown engine {name!r}; choose one of {', '.join(ENGINES)}")
+    if name == 'polars':
+        if pl is not None:
+            return PolarsEngine()
+        print("Polars is not installed; using the pandas engine")
+    return PandasEngine()
@@ -0,0 +1,298 @@
+"""Materialised lattice of group-by aggregates with automatic view selection.
+
+Every view groups the dataset by (base, ctr) plus a subset of the code
+columns, with m either kept, rolled up to its origin (domestic if m == ctr,
+else imported) or summed out:
+
+    Set_i+Set_j+origin   Set_i+m   Set_j+m   Set_i+origin   Set_j+origin   m   origin   total ...
+
+A view answers a query when it keeps every column the query filters or
+groups on (`domestic` needs origin or m); the full (Set_i, m, Set_j) grain is
+the raw parquet data itself. `build_lattice` estimates the size of each view
+from one partition and greedily materialises the views with the best benefit
+per row (Harinarayan, Rajaraman & Ullman) until the storage budget is used
+up. The views are written under `data/lattice/` as one parquet file each,
+with `lattice.json` recording their grain, row counts and the source
+signature; `open_lattice` returns None once the parquet data has changed.
+
+`nam_query` answers sums from the smallest view that covers them, so
+
+    nam.query(set_i='D11', domestic=True).group_by('ctr', 'Set_j').sum()
+
+(wages by industry for every country and year) reads a few thousand view
+rows instead of scanning every partition.
+
+Usage:
+    python scripts/nam_lattice.py         # build data/lattice/ from data/parquet/
+
+    from nam_lattice import open_lattice
+    lattice = open_lattice()              # None if missing or stale
+    lattice.choose(['Set_j'], {'domestic': True})            # 'Set_j+origin'
+    lattice.answer(years=2019, keys=['ctr'], set_j='P6')
+"""
+
+import itertools
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import nam_loader
+import nam_parallel
+
+# Configuration
+PROJECT_ROOT = nam_loader.PROJECT_ROOT
+LATTICE_PATH = PROJECT_ROOT / 'data' / 'lattice'
+META_FILE = 'lattice.json'
+BUDGET_FRACTION = 0.1  # default storage budget: rows as a share of the raw dataset
+ORIGINS = ['domestic', 'imported']
+
+# Candidate views: Set_i and Set_j kept or summed out, m kept, rolled up to
+# origin or summed out (the full Set_i x m x Set_j grain is the raw data)
+VIEWS = [
+    tuple(dim for dim in (set_i, set_j, m_level) if dim)
+    for set_i, set_j, m_level in itertools.product(('Set_i', None), ('Set_j', None),
+                                                   ('m', 'origin', None))
+][1:]
+# Column each predicate needs in a view
+PREDICATE_DIMS = {
+    'set_i': 'Set_i', 'set_i_prefix': 'Set_i',
+    'set_j': 'Set_j', 'set_j_prefix': 'Set_j',
+    'm': 'm', 'domestic': 'origin',
+}
+GROUP_DIMS = ('Set_i', 'Set_j', 'm', 'origin')
+
+
+def view_name(dims) -> str:
+    """File stem of a view, e.g. 'Set_i+origin' ('total' for no dims)."""
+    return '+'.join(dims) or 'total'
+
+
+def covers(dims, needed) -> bool:
+    """Whether a view with these dims can answer a query needing these columns."""
+    return all(dim in dims or (dim == 'origin' and 'm' in dims) for dim in needed)
+
+
+def needed_dims(keys=(), predicates=None):
+    """Columns a query filters or groups on, or None if no view can answer it."""
+    predicates = {k: v for k, v in (predicates or {}).items() if v is not None}
+    if 'filter' in predicates or any(key not in GROUP_DIMS + ('base', 'ctr') for key in keys):
+        return None
+    return {PREDICATE_DIMS[k] for k in predicates} | {key for key in keys if key in GROUP_DIMS}
+
+
+def partition_views(year: int, ctr: str, data_path: Path = nam_loader.DATA_PATH,
+                    views=VIEWS) -> dict:
+    """Every requested view of one partition, {name: frame} (worker task)."""
+    df = nam_loader.load_country_year(ctr, year, nam_loader.DATA_COLUMNS, data_path,
+                                      categorical=True)
+    df['origin'] = pd.Categorical(np.where(df['m'] == ctr, 'domestic', 'imported'),
+                                  categories=ORIGINS)
+    frames = {}
+    for dims in views:
+        if dims:
+            sums = df.groupby(list(dims), observed=True)['value'].sum().reset_index()
+        else:
+            sums = pd.DataFrame({'value': [df['value'].sum()]})
+        for dim in dims:
+            sums[dim] = sums[dim].astype(str)
+        sums.insert(0, 'ctr', ctr)
+        sums.insert(0, 'base', int(year))
+        frames[view_name(dims)] = sums
+    return frames
+
+
+def estimate_sizes(data_path: Path = nam_loader.DATA_PATH, partitions=None) -> tuple:
+    """(raw rows, {view name: rows}) extrapolated from the first partition."""
+    partitions = partitions or nam_loader.list_partitions(data_path=data_path)
+    year, ctr = partitions[0]
+    sample = partition_views(year, ctr, data_path)
+    raw = len(nam_loader.load_country_year(ctr, year, ['value'], data_path))
+    return raw * len(partitions), {name: len(frame) * len(partitions)
+                                   for name, frame in sample.items()}
+
+
+def select_views(sizes: dict, raw_rows: int, budget_rows: int) -> list:
+    """Greedy view selection: best benefit per stored row until the budget is spent.
+
+    The benefit of a view is the number of rows saved over all queries of
+    the lattice (one per view) that it answers more cheaply than the views
+    already chosen or the raw data.
+    """
+    dims_of = {view_name(dims): dims for dims in VIEWS}
+    chosen, used = [], 0
+
+    def cost(query):
+        answering = [sizes[name] for name in chosen if covers(dims_of[name], dims_of[query])]
+        return min(answering + [raw_rows])
+
+    while True:
+        best, best_ratio = None, 0.0
+        for name, size in sizes.items():
+            if name in chosen or used + size > budget_rows:
+                continue
+            benefit = sum(max(0, cost(query) - size) for query in sizes
+                          if covers(dims_of[name], dims_of[query]))
+            if benefit / max(size, 1) > best_ratio:
+                best, best_ratio = name, benefit / max(size, 1)
+        if best is None:
+            return chosen
+        chosen.append(best)
+        used += sizes[best]
+
+
+def build_lattice(data_path: Path = nam_loader.DATA_PATH, lattice_path: Path = LATTICE_PATH,
+                  budget_rows: int = None, workers: int = None) -> 'Lattice':
+    """Select views under the storage budget and materialise them from the parquet data.
+
+    budget_rows defaults to BUDGET_FRACTION of the raw row count.
+    """
+    data_path, lattice_path = Path(data_path), Path(lattice_path)
+    partitions = nam_loader.list_partitions(data_path=data_path)
+    if not partitions:
+        raise FileNotFoundError(f"No parquet partitions under {data_path}")
+    raw_rows, sizes = estimate_sizes(data_path, partitions)
+    if budget_rows is None:
+        budget_rows = int(raw_rows * BUDGET_FRACTION)
+    chosen = select_views(sizes, raw_rows, budget_rows)
+    dims_of = {view_name(dims): dims for dims in VIEWS}
+
+    results = nam_parallel.map_partitions(partition_views, partitions, workers,
+                                          data_path=data_path,
+                                          views=[dims_of[name] for name in chosen])
+    lattice_path.mkdir(parents=True, exist_ok=True)
+    for stale in lattice_path.glob('*.parquet'):
+        stale.unlink()
+    views = {}
+    for name in chosen:
+        frame = pd.concat([result[name] for result in results], ignore_index=True)
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False),
+                       lattice_path / f'{name}.parquet')
+        views[name] = {'dims': list(dims_of[name]), 'rows': len(frame)}
+    meta = {
+        'views': views,
+        'raw_rows': raw_rows,
+        'budget_rows': budget_rows,
+        'partitions': [[y, c] for y, c in partitions],
+        'source': nam_loader.source_signature(partitions, data_path),
+    }
+    with open(lattice_path / META_FILE, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return Lattice(lattice_path)
+
+
+class Lattice:
+    """The materialised views under one directory; views are loaded on first use."""
+
+    def __init__(self, lattice_path: Path = LATTICE_PATH):
+        self.path = Path(lattice_path)
+        with open(self.path / META_FILE, encoding='utf-8') as f:
+            self.meta = json.load(f)
+        self.views = self.meta['views']
+        self._frames = {}
+
+    def is_stale(self, data_path: Path = nam_loader.DATA_PATH) -> bool:
+        """True if the source partitions changed since the views were built."""
+        current = nam_loader.list_partitions(data_path=data_path)
+        if set(current) != {(y, c) for y, c in self.meta['partitions']}:
+            return True
+        return nam_loader.source_signature(current, data_path) != self.meta['source']
+
+    def choose(self, keys=(), predicates=None):
+        """Name of the smallest view that answers the query, or None."""
+        needed = needed_dims(keys, predicates)
+        if needed is None:
+            return None
+        answering = [name for name, view in self.views.items() if covers(view['dims'], needed)]
+        return min(answering, key=lambda name: self.views[name]['rows'], default=None)
+
+    def frame(self, name: str) -> pd.DataFrame:
+        """One view as a DataFrame (code columns as sorted categoricals)."""
+        if name not in self._frames:
+            dims = self.views[name]['dims']
+            table = pq.read_table(self.path / f'{name}.parquet', read_dictionary=['ctr', *dims])
+            self._frames[name] = nam_loader.to_pandas(table, categorical=True)
+        return self._frames[name]
+
+    def answer(self, years=None, ctr=None, keys=(), **predicates):
+        """Sum of value, per keys if given, from the smallest covering view; None if none covers."""
+        name = self.choose(keys, predicates)
+        if name is None:
+            return None
+        df = self.frame(name)
+        keep = np.ones(len(df), dtype=bool)
+        if years is not None:
+            keep &= df['base'].isin([int(y) for y in nam_loader._as_list(years)]).to_numpy()
+        if ctr is not None:
+            keep &= df['ctr'].isin(nam_loader._as_list(ctr)).to_numpy()
+        for column, codes_key, prefix_key in (('Set_i', 'set_i', 'set_i_prefix'),
+                                              ('Set_j', 'set_j', 'set_j_prefix')):
+            if predicates.get(codes_key) is not None:
+                keep &= df[column].isin(nam_loader._as_list(predicates[codes_key])).to_numpy()
+            if predicates.get(prefix_key) is not None:
+                keep &= nam_loader.code_startswith(
+                    df[column], tuple(nam_loader._as_list(predicates[prefix_key]))).to_numpy()
+        if predicates.get('m') is not None:
+            keep &= df['m'].isin(nam_loader._as_list(predicates['m'])).to_numpy()
+        if predicates.get('domestic') is not None:
+            if 'origin' in df:
+                domestic = (df['origin'] == 'domestic').to_numpy()
+            else:
+                domestic = nam_loader.codes_equal(df['m'], df['ctr']).to_numpy()
+            keep &= domestic if predicates['domestic'] else ~domestic
+        rows = df[keep]
+        if not keys:
+            return float(rows['value'].sum())
+        keys = list(keys)
+        if 'origin' in keys and 'origin' not in rows:
+            rows = rows.assign(origin=pd.Categorical(
+                np.where(nam_loader.codes_equal(rows['m'], rows['ctr']), 'domestic', 'imported'),
+                categories=ORIGINS))
+        result = rows.groupby(keys, observed=True)['value'].sum()
+        # Plain labels, as a scan answers (nam_arrow.group_sum)
+        if isinstance(result.index, pd.MultiIndex):
+            result.index = result.index.set_levels(
+                [_plain(level) for level in result.index.levels])
+        else:
+            result.index = _plain(result.index)
+        return result
+
+
+def _plain(index: pd.Index) -> pd.Index:
+    """An index level typed as in a scan: categoricals as plain labels, base as the schema's int."""
+    if isinstance(index, pd.CategoricalIndex):
+        return pd.Index(index.astype(index.categories.dtype), name=index.name)
+    if index.name == 'base':
+        return index.astype(nam_loader.SCHEMA.field('base').type.to_pandas_dtype())
+    return index
+
+
+def open_lattice(lattice_path: Path = LATTICE_PATH, data_path: Path = nam_loader.DATA_PATH):
+    """Open the lattice if it exists and matches the parquet source, else None."""
+    if not (Path(lattice_path) / META_FILE).exists():
+        return None
+    lattice = Lattice(lattice_path)
+    if lattice.is_stale(data_path):
+        print(f"Lattice at {lattice_path} is stale; rebuild with: python scripts/nam_lattice.py")
+        return None
+    return lattice
+
+
+def main():
+    """Build the lattice from data/parquet/."""
+    print("FIGARO-NAM Aggregate Lattice")
+    print("=" * 60)
+    lattice = build_lattice()
+    meta = lattice.meta
+    print(f"\nBudget: {meta['budget_rows']:,} rows "
+          f"({meta['budget_rows'] / meta['raw_rows']:.1%} of {meta['raw_rows']:,} raw rows)")
+    for name, view in sorted(lattice.views.items(), key=lambda item: item[1]['rows']):
+        print(f"  {name:<22} {view['rows']:>12,} rows")
+    print(f"Saved: {lattice.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,210 @@
+"""Leontief inverses of every country-year, solved in one batch and cached.
+
+For each (base, ctr) the domestic intermediate block Z (CPA products x NACE
+industries, m == ctr) is aligned onto the industries with the concordance
+(`nam_codes.align_products`). Dividing by industry output x gives the
+technical coefficients A = Z / x. Here x is the column total of the
+industry: all inputs, domestic and imported, plus value added. All
+partitions are stacked into one (partitions, n, n) array, and (I - A)^-1 is
+one batched `numpy.linalg.solve`. The arrays are written as .npy files under
+`data/leontief/` and memory-mapped on open:
+
+    coefficients.npy   A        (partitions, n, n)
+    inverse.npy        L        (partitions, n, n)
+    output.npy         x        (partitions, n)
+    meta.json          partitions, industries, source sizes/mtimes
+
+Blocks come from the cube when it holds the country-year, otherwise from one
+read per partition (industry columns only) on the process pool. Industries
+without output have a zero column in A. A country-year whose I - A is
+singular gets NaN in L.
+
+Usage:
+    python scripts/nam_leontief.py        # build data/leontief/ for all country-years
+
+    from nam_leontief import load_leontief
+    leontief = load_leontief()                       # cache if current, else built and cached
+    de = leontief.inverse(2019, 'DE')                # industries x industries DataFrame
+    multipliers = leontief.multipliers()             # year, country, industry, output multiplier
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import nam_cube
+import nam_loader
+import nam_parallel
+from nam_codes import NACE_INDUSTRIES, SET_CODES, align_products, industry_positions
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+CACHE_PATH = nam_loader.PROJECT_ROOT / 'data' / 'leontief'
+OUTPUT_PATH = Path('outputs/tables/')
+META_FILE = 'meta.json'
+ARRAYS = ('coefficients', 'inverse', 'output')
+
+
+def partition_block(year: int, ctr: str, data_path: Path = DATA_PATH):
+    """(domestic flows Z (n x n), output x (n)) of one country-year from parquet (worker task)."""
+    n = len(NACE_INDUSTRIES)
+    df = nam_loader.load_country_year(ctr, year, nam_loader.DATA_COLUMNS, data_path,
+                                      categorical=True, set_j=NACE_INDUSTRIES)
+    columns = industry_positions(df['Set_j'])
+    values = np.nan_to_num(df['value'].to_numpy(dtype=np.float64))
+    output = np.bincount(columns, weights=values, minlength=n)
+    rows = industry_positions(df['Set_i'])
+    keep = SET_CODES.mask(df['Set_i'], 'is_product') & (df['m'] == ctr).to_numpy() & (rows >= 0)
+    flows = np.bincount(rows[keep] * n + columns[keep], weights=values[keep], minlength=n * n)
+    return flows.reshape(n, n), output
+
+
+def cube_block(cube: nam_cube.NamCube, year: int, ctr: str):
+    """partition_block from cube slices."""
+    industries = [code for code in NACE_INDUSTRIES if code in cube.positions['Set_j']]
+    products = cube.select('Set_i', 'is_product')
+    flows = align_products(cube.frame(year, ctr, set_i=products, m=ctr, set_j=industries))
+    output = pd.Series(cube[int(year), ctr, :, :, industries].sum(axis=(0, 1)), index=industries)
+    return flows.to_numpy(), output.reindex(NACE_INDUSTRIES, fill_value=0.0).to_numpy()
+
+
+def technical_coefficients(flows: np.ndarray, output: np.ndarray) -> np.ndarray:
+    """A = Z / x column-wise for stacked (..., n, n) flows; zero columns where x <= 0."""
+    safe = np.where(output > 0, output, 1.0)
+    return np.where((output > 0)[..., None, :], flows / safe[..., None, :], 0.0)
+
+
+def leontief_inverse(coefficients: np.ndarray) -> np.ndarray:
+    """(I - A)^-1 of stacked (..., n, n) coefficient matrices in one batched solve."""
+    n = coefficients.shape[-1]
+    system = np.eye(n) - coefficients
+    identity = np.broadcast_to(np.eye(n), system.shape)
+    try:
+        return np.linalg.solve(system, identity)
+    except np.linalg.LinAlgError:
+        # One singular matrix fails the whole batch: solve one by one, NaN for singular ones
+        inverse = np.full(system.shape, np.nan)
+        for k in np.ndindex(system.shape[:-2]):
+            try:
+                inverse[k] = np.linalg.solve(system[k], np.eye(n))
+            except np.linalg.LinAlgError:
+                pass
+        return inverse
+
+
+class LeontiefPanel:
+    """Coefficients, inverses and outputs of a list of country-years."""
+
+    def __init__(self, partitions, coefficients, inverses, output, meta=None):
+        self.partitions = [(int(year), ctr) for year, ctr in partitions]
+        self.industries = list(NACE_INDUSTRIES)
+        self.coefficients = coefficients
+        self.inverses = inverses
+        self.output = output
+        self.meta = meta or {}
+        self._positions = {partition: k for k, partition in enumerate(self.partitions)}
+
+    def has(self, year: int, ctr: str) -> bool:
+        """Whether the panel holds this country-year."""
+        return (int(year), ctr) in self._positions
+
+    def _frame(self, array: np.ndarray, year: int, ctr: str) -> pd.DataFrame:
+        return pd.DataFrame(array[self._positions[(int(year), ctr)]],
+                            index=pd.Index(self.industries, name='Set_i'),
+                            columns=pd.Index(self.industries, name='Set_j'))
+
+    def technical(self, year: int, ctr: str) -> pd.DataFrame:
+        """Technical-coefficient matrix A of one country-year."""
+        return self._frame(self.coefficients, year, ctr)
+
+    def inverse(self, year: int, ctr: str) -> pd.DataFrame:
+        """Leontief inverse L = (I - A)^-1 of one country-year."""
+        return self._frame(self.inverses, year, ctr)
+
+    def multipliers(self) -> pd.DataFrame:
+        """Output multipliers (column sums of L) of every industry and country-year, long format."""
+        sums = np.asarray(self.inverses).sum(axis=1)
+        years, countries = zip(*self.partitions) if self.partitions else ((), ())
+        n = len(self.industries)
+        return pd.DataFrame({
+            'year': np.repeat(np.array(years, dtype=np.int64), n),
+            'country': np.repeat(np.array(countries, dtype=object), n),
+            'industry': np.tile(self.industries, len(self.partitions)),
+            'output': np.asarray(self.output).ravel(),
+            'multiplier': sums.ravel(),
+        })
+
+
+def build_leontief(years=None, countries=None, data_path: Path = DATA_PATH,
+                   cache_path: Path = CACHE_PATH, workers: int = None) -> LeontiefPanel:
+    """Solve every selected country-year in one batch; write the cache unless cache_path is None."""
+    partitions = nam_loader.list_partitions(countries, years, data_path)
+    cube = nam_cube.open_cube(data_path=data_path)
+    pending = [(year, ctr) for year, ctr in partitions if cube is None or not cube.has(year, ctr)]
+    blocks = dict(zip(pending, nam_parallel.map_partitions(partition_block, pending, workers,
+                                                           data_path=data_path)))
+    blocks = [blocks[p] if p in blocks else cube_block(cube, *p) for p in partitions]
+    n = len(NACE_INDUSTRIES)
+    flows = np.array([z for z, _ in blocks]).reshape(len(partitions), n, n)
+    output = np.array([x for _, x in blocks]).reshape(len(partitions), n)
+
+    coefficients = technical_coefficients(flows, output)
+    inverse = leontief_inverse(coefficients)
+    meta = {
+        'partitions': [[year, ctr] for year, ctr in partitions],
+        'industries': list(NACE_INDUSTRIES),
+        'source': nam_loader.source_signature(partitions, data_path),
+    }
+    if cache_path is not None:
+        cache_path = Path(cache_path)
+        cache_path.mkdir(parents=True, exist_ok=True)
+        for name, array in zip(ARRAYS, (coefficients, inverse, output)):
+            np.save(cache_path / f'{name}.npy', array)
+        with open(cache_path / META_FILE, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+    return LeontiefPanel(partitions, coefficients, inverse, output, meta)
+
+
+def open_leontief(cache_path: Path = CACHE_PATH, data_path: Path = DATA_PATH):
+    """The cached panel (memory-mapped) if it covers the current dataset, else None."""
+    cache_path = Path(cache_path)
+    if not (cache_path / META_FILE).exists():
+        return None
+    with open(cache_path / META_FILE, encoding='utf-8') as f:
+        meta = json.load(f)
+    partitions = nam_loader.list_partitions(data_path=data_path)
+    if (meta.get('industries') != list(NACE_INDUSTRIES)
+            or {(y, c) for y, c in meta['partitions']} != set(partitions)
+            or meta.get('source') != nam_loader.source_signature(partitions, data_path)):
+        return None
+    arrays = [np.load(cache_path / f'{name}.npy', mmap_mode='r') for name in ARRAYS]
+    return LeontiefPanel(meta['partitions'], *arrays, meta=meta)
+
+
+def load_leontief(data_path: Path = DATA_PATH, cache_path: Path = CACHE_PATH,
+                  workers: int = None) -> LeontiefPanel:
+    """The cache when current, otherwise all country-years solved and cached."""
+    return (open_leontief(cache_path, data_path)
+            or build_leontief(data_path=data_path, cache_path=cache_path, workers=workers))
+
+
+def main():
+    """Build the cache for all country-years and write their output multipliers."""
+    print("FIGARO-NAM Leontief Inverses")
+    print("=" * 60)
+    leontief = build_leontief()
+    n = len(leontief.industries)
+    print(f"\nSolved {len(leontief.partitions)} country-years x ({n} x {n}) in one batch")
+    singular = int(np.isnan(leontief.inverses).any(axis=(1, 2)).sum())
+    if singular:
+        print(f"  {singular} country-years with a singular I - A (NaN)")
+    print(f"Saved: {CACHE_PATH}")
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    leontief.multipliers().to_csv(OUTPUT_PATH / 'output_multipliers_panel.csv', index=False)
+    print(f"Saved: {OUTPUT_PATH / 'output_multipliers_panel.csv'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,544 @@
+"""Shared partition-aware loader for the FIGARO-NAM parquet dataset.
+
+All scripts read `data/parquet/base=YYYY/ctr=XX/part-0.parquet` files. This
+module resolves the requested country-year partitions from the known Hive
+layout (no directory walk when both are given), pushes Set_i/Set_j/m
+predicates down to the Arrow scanner and projects only the requested
+columns before converting to pandas.
+
+With `categorical=True` the code columns (Set_i, m, Set_j) and the partition
+columns are read as Arrow dictionary arrays and arrive in pandas as
+categoricals with sorted categories, so ~84M rows cost small integer codes
+instead of Python strings. The `code_*` helpers evaluate string predicates
+once per category and broadcast them over the integer codes.
+
+Queries that fix the partner `m` (export-side: "what does X deliver") are
+served from the partner-clustered mirror `data/parquet_by_m/base=YYYY/m=XX/`
+(built by nam_mirror.py) when it is current and needs fewer files.
+
+Usage:
+    from nam_loader import load, load_country_year
+
+    df = load_country_year('DE', 2019, columns=['Set_j', 'value'], set_i='D11', domestic=True)
+    imports = load(ctr='DE', years=range(2010, 2024), set_i_prefix='CPA_', domestic=False)
+"""
+
+import json
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.fs as pafs
+
+# Configuration
+PROJECT_ROOT = Path(__file__).parent.parent
+DATA_PATH = PROJECT_ROOT / 'data' / 'parquet'
+
+FILE_NAME = 'part-0.parquet'
+DATA_COLUMNS = ['Set_i', 'm', 'Set_j', 'value']
+CODE_COLUMNS = ['Set_i', 'm', 'Set_j']
+PARTITION_COLUMNS = ['base', 'ctr']
+ALL_COLUMNS = DATA_COLUMNS + PARTITION_COLUMNS
+
+SCHEMA = pa.schema([
+    ('Set_i', pa.string()),
+    ('m', pa.string()),
+    ('Set_j', pa.string()),
+    ('value', pa.float64()),
+    ('base', pa.int32()),
+    ('ctr', pa.string()),
+])
+PARTITIONING = ds.partitioning(
+    pa.schema([SCHEMA.field('base'), SCHEMA.field('ctr')]),
+    flavor='hive'
+)
+DICTIONARY_FORMAT = ds.ParquetFileFormat(
+    read_options=ds.ParquetReadOptions(dictionary_columns=CODE_COLUMNS)
+)
+PARQUET_FORMAT = ds.ParquetFileFormat()
+FILESYSTEM = pafs.LocalFileSystem()
+
+# Dataset manifest (written by nam_manifest.py)
+MANIFEST_FILE = '_manifest.json'
+METADATA_FILE = '_metadata'
+COMMON_METADATA_FILE = '_common_metadata'
+_MANIFESTS = {}
+
+# Partner-clustered mirror (written by nam_mirror.py), a sibling of the data path
+MIRROR_SUFFIX = '_by_m'
+MIRROR_META_FILE = '_mirror.json'
+MIRROR_FILE_COLUMNS = ['ctr', 'Set_i', 'Set_j', 'value']
+MIRROR_DICTIONARY_FORMAT = ds.ParquetFileFormat(
+    read_options=ds.ParquetReadOptions(dictionary_columns=['ctr', 'Set_i', 'Set_j'])
+)
+
+# Partitions fetched ahead of the consumer by iter_partitions
+READ_AHEAD = 4
+
+# Predicates that parquet min/max statistics can evaluate per row group
+STATISTICS_PREDICATES = ('set_i', 'set_j', 'm', 'set_i_prefix', 'set_j_prefix')
+
+
+def _as_list(value):
+    """Normalise a scalar or iterable predicate value to a list (None stays None)."""
+    if value is None:
+        return None
+    if isinstance(value, (str, int)):
+        return [value]
+    return list(value)
+
+
+def partition_path(ctr: str, year: int, data_path: Path = DATA_PATH) -> Path:
+    """Path of the parquet file holding one country-year partition."""
+    return Path(data_path) / f'base={int(year)}' / f'ctr={ctr}' / FILE_NAME
+
+
+def source_signature(partitions, data_path: Path = DATA_PATH) -> dict:
+    """Size and mtime of each partition file, keyed 'year/ctr' (for staleness checks)."""
+    signature = {}
+    for year, ctr in partitions:
+        stat = partition_path(ctr, year, data_path).stat()
+        signature[f'{year}/{ctr}'] = [stat.st_size, stat.st_mtime_ns]
+    return signature
+
+
+def read_manifest(data_path: Path = DATA_PATH):
+    """Dataset manifest written by nam_manifest.py, or None if missing or stale.
+
+    The JSON is parsed once per process. It is trusted while the set of
+    base=YYYY directories and their mtimes (which change when a ctr=XX
+    partition is added or removed) match what was recorded.
+    """
+    data_path = Path(data_path)
+    path = data_path / MANIFEST_FILE
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+    key = str(data_path.resolve())
+    if key not in _MANIFESTS or _MANIFESTS[key][0] != mtime:
+        with open(path, encoding='utf-8') as f:
+            _MANIFESTS[key] = (mtime, json.load(f))
+    manifest = _MANIFESTS[key][1]
+
+    directories = manifest['directories']
+    if {p.name for p in data_path.glob('base=*')} != set(directories):
+        return None
+    for name, recorded in directories.items():
+        if (data_path / name).stat().st_mtime_ns != recorded:
+            return None
+    return manifest
+
+
+def list_partitions(ctr=None, years=None, data_path: Path = DATA_PATH,
+                    use_manifest: bool = True) -> list:
+    """List existing (year, ctr) partitions, optionally restricted.
+
+    A current manifest answers without touching the partition files. Without
+    one, the paths are built directly when both countries and years are
+    given; otherwise the Hive tree is globbed once.
+    """
+    data_path = Path(data_path)
+    countries = _as_list(ctr)
+    year_list = [int(y) for y in _as_list(years)] if years is not None else None
+
+    manifest = read_manifest(data_path) if use_manifest else None
+    if manifest is not None:
+        known = [(p['base'], p['ctr']) for p in manifest['partitions']]
+        if countries is not None and year_list is not None:
+            known = set(known)
+            return [(y, c) for y in year_list for c in countries if (y, c) in known]
+        return sorted(
+            (y, c) for y, c in known
+            if (countries is None or c in countries) and (year_list is None or y in year_list)
+        )
+
+    if countries is not None and year_list is not None:
+        candidates = [(y, c) for y in year_list for c in countries]
+    else:
+        candidates = []
+        for file_path in data_path.glob(f'base=*/ctr=*/{FILE_NAME}'):
+            year = int(file_path.parent.parent.name.split('=', 1)[1])
+            country = file_path.parent.name.split('=', 1)[1]
+            if countries is not None and country not in countries:
+                continue
+            if year_list is not None and year not in year_list:
+                continue
+            candidates.append((year, country))
+        candidates.sort()
+
+    return [(y, c) for y, c in candidates if partition_path(c, y, data_path).exists()]
+
+
+def build_filter(set_i=None, set_j=None, m=None, set_i_prefix=None,
+                 set_j_prefix=None, domestic=None, filter=None):
+    """Build an Arrow filter expression from row predicates.
+
+    set_i, set_j, m: a code or an iterable of codes (equality / membership).
+    set_i_prefix, set_j_prefix: keep codes starting with this prefix.
+    domestic: True keeps m == ctr, False keeps m != ctr, None keeps both.
+    filter: additional pyarrow expression, AND-ed with the rest.
+    """
+    terms = []
+    for column, codes in (('Set_i', set_i), ('Set_j', set_j), ('m', m)):
+        codes = _as_list(codes)
+        if codes is None:
+            continue
+        if len(codes) == 1:
+            terms.append(pc.field(column) == codes[0])
+        else:
+            terms.append(pc.field(column).isin(codes))
+    # Prefixes as half-open ranges [prefix, next prefix) so row-group min/max
+    # statistics can prune them (starts_with is opaque to the pruner)
+    for column, prefix in (('Set_i', set_i_prefix), ('Set_j', set_j_prefix)):
+        if prefix:
+            upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+            terms.append((pc.field(column) >= prefix) & (pc.field(column) < upper))
+    # String kernels have no dictionary overloads, so cast (a no-op on plain strings)
+    if domestic is not None:
+        m_field = pc.field('m').cast(pa.string())
+        ctr_field = pc.field('ctr').cast(pa.string())
+        terms.append(m_field == ctr_field if domestic else m_field != ctr_field)
+    if filter is not None:
+        terms.append(filter)
+
+    if not terms:
+        return None
+    expression = terms[0]
+    for term in terms[1:]:
+        expression = expression & term
+    return expression
+
+
+def statistics_filter(**predicates):
+    """The part of a row filter that row-group statistics can evaluate."""
+    return build_filter(**{k: v for k, v in predicates.items() if k in STATISTICS_PREDICATES})
+
+
+def row_groups(path, expression=None) -> list:
+    """Ids of the row groups in one parquet file that statistics cannot rule out."""
+    fragment = PARQUET_FORMAT.make_fragment(str(path), FILESYSTEM)
+    if expression is None:
+        return list(range(fragment.metadata.num_row_groups))
+    return [
+        row_group.id
+        for piece in fragment.split_by_row_group(expression, schema=SCHEMA)
+        for row_group in piece.row_groups
+    ]
+
+
+def dataset_schema(categorical: bool = False) -> pa.Schema:
+    """Dataset schema, with dictionary-encoded code columns if requested."""
+    if not categorical:
+        return SCHEMA
+    return pa.schema([
+        pa.field(f.name, pa.dictionary(pa.int32(), f.type))
+        if f.name in CODE_COLUMNS + PARTITION_COLUMNS else f
+        for f in SCHEMA
+    ])
+
+
+def _dictionary_partitioning(partitions):
+    """Hive partitioning whose base/ctr fields are dictionaries over the selected values."""
+    years = sorted({y for y, _ in partitions})
+    countries = sorted({c for _, c in partitions})
+    schema = dataset_schema(categorical=True)
+    return ds.HivePartitioning(
+        pa.schema([schema.field('base'), schema.field('ctr')]),
+        dictionaries={
+            'base': pa.array(years, pa.int32()),
+            'ctr': pa.array(countries, pa.string()),
+        }
+    )
+
+
+def _partition_expression(year: int, ctr: str):
+    """Partition expression of one country-year file."""
+    return (pc.field('base') == pa.scalar(int(year), pa.int32())) & (pc.field('ctr') == ctr)
+
+
+def _summary_fragments(partitions, data_path: Path, file_format):
+    """Fragments of the selected partitions built from the `_metadata` summary.
+
+    Footers come from the one summary file instead of one read per partition.
+    Returns None unless the manifest is current and every selected file still
+    has the size and mtime recorded for it.
+    """
+    data_path = Path(data_path)
+    manifest = read_manifest(data_path)
+    if manifest is None or not (data_path / METADATA_FILE).exists():
+        return None
+    recorded = {(p['base'], p['ctr']): (p['bytes'], p['mtime_ns']) for p in manifest['partitions']}
+    for year, ctr in partitions:
+        try:
+            stat = partition_path(ctr, year, data_path).stat()
+        except FileNotFoundError:
+            return None
+        if recorded.get((year, ctr)) != (stat.st_size, stat.st_mtime_ns):
+            return None
+
+    summary = ds.parquet_dataset(str(data_path / METADATA_FILE), format=file_format,
+                                 filesystem=FILESYSTEM, partitioning=PARTITIONING)
+    wanted = {partition_path(c, y, data_path) for y, c in partitions}
+    return [f for f in summary.get_fragments() if Path(f.path) in wanted]
+
+
+def _prune_fragments(fragments, expression) -> list:
+    """Restrict fragments to the row groups statistics cannot rule out.
+
+    Arrow only prunes row groups when the dataset field type matches the file
+    statistics (plain strings), so dictionary scans select row groups up front.
+    """
+    pruned = []
+    for fragment in fragments:
+        kept = [
+            row_group.id
+            for piece in fragment.split_by_row_group(expression, schema=SCHEMA)
+            for row_group in piece.row_groups
+        ]
+        if kept:
+            pruned.append(fragment.subset(row_group_ids=kept))
+    return pruned
+
+
+def open_dataset(ctr=None, years=None, data_path: Path = DATA_PATH,
+                 categorical: bool = False, prune=None):
+    """Open the selected partitions as an Arrow dataset (None if none exist).
+
+    prune: statistics expression (see `statistics_filter`) used to skip row
+    groups in categorical mode; plain scans are pruned by Arrow itself.
+    """
+    partitions = list_partitions(ctr, years, data_path)
+    if not partitions:
+        return None
+    file_format = DICTIONARY_FORMAT if categorical else PARQUET_FORMAT
+    prune = prune if categorical else None
+
+    # Whole-dimension scans take their footers from the `_metadata` summary
+    fragments = None
+    if ctr is None or years is None:
+        fragments = _summary_fragments(partitions, data_path, file_format)
+    if fragments is not None or prune is not None:
+        if fragments is None:
+            fragments = [
+                file_format.make_fragment(str(partition_path(c, y, data_path)), FILESYSTEM,
+                                          partition_expression=_partition_expression(y, c))
+                for y, c in partitions
+            ]
+        if prune is not None:
+            fragments = _prune_fragments(fragments, prune)
+        return ds.FileSystemDataset(fragments, dataset_schema(categorical), file_format, FILESYSTEM)
+
+    files = [str(partition_path(c, y, data_path)) for y, c in partitions]
+    if categorical:
+        return ds.dataset(
+            files,
+            format=DICTIONARY_FORMAT,
+            partitioning=_dictionary_partitioning(partitions),
+            partition_base_dir=str(data_path)
+        )
+    return ds.dataset(
+        files,
+        format='parquet',
+        partitioning=PARTITIONING,
+        partition_base_dir=str(data_path)
+    )
+
+
+def mirror_path(data_path: Path = DATA_PATH) -> Path:
+    """Root of the partner-clustered mirror next to a dataset ('parquet' -> 'parquet_by_m')."""
+    data_path = Path(data_path)
+    return data_path.with_name(data_path.name + MIRROR_SUFFIX)
+
+
+def mirror_partition_path(partner: str, year: int, data_path: Path = DATA_PATH) -> Path:
+    """Path of the mirror file holding everything delivered by one partner in one year."""
+    return mirror_path(data_path) / f'base={int(year)}' / f'm={partner}' / FILE_NAME
+
+
+def _mirror_scan(ctr, years, data_path: Path, categorical: bool, predicates: dict):
+    """(dataset, filter) over the partner mirror for an m-restricted query, or None.
+
+    The mirror is used only when it holds fewer files to open than the primary
+    layout and every selected source partition is unchanged since it was built.
+    """
+    partners = _as_list(predicates.get('m'))
+    meta_path = mirror_path(data_path) / MIRROR_META_FILE
+    if partners is None or not meta_path.exists():
+        return None
+    partitions = list_partitions(ctr, years, data_path)
+    year_list = sorted({y for y, _ in partitions})
+    if len(partners) * len(year_list) >= len(partitions):
+        return None
+
+    with open(meta_path, encoding='utf-8') as f:
+        built_from = json.load(f)['source']
+    try:
+        current = source_signature(partitions, data_path)
+    except FileNotFoundError:
+        return None
+    if any(built_from.get(key) != value for key, value in current.items()):
+        return None
+
+    file_format = MIRROR_DICTIONARY_FORMAT if categorical else PARQUET_FORMAT
+    fragments = [
+        file_format.make_fragment(
+            str(mirror_partition_path(p, y, data_path)), FILESYSTEM,
+            partition_expression=(pc.field('base') == pa.scalar(y, pa.int32())) & (pc.field('m') == p)
+        )
+        for y in year_list for p in partners
+        if mirror_partition_path(p, y, data_path).exists()
+    ]
+    countries = sorted({c for _, c in partitions})
+    expression = build_filter(**predicates) & pc.field('ctr').isin(countries)
+    if categorical:
+        fragments = _prune_fragments(
+            fragments, statistics_filter(**predicates) & pc.field('ctr').isin(countries)
+        )
+    return ds.FileSystemDataset(fragments, dataset_schema(categorical), file_format,
+                                FILESYSTEM), expression
+
+
+def plan_scan(ctr=None, years=None, data_path: Path = DATA_PATH,
+              categorical: bool = False, **predicates):
+    """(dataset, filter, layout) for a query; layout is 'mirror' or 'primary'.
+
+    Queries restricted by `m` go to the partner mirror when it is cheaper
+    (see `_mirror_scan`). dataset is None when no partition matches.
+    """
+    scan = _mirror_scan(ctr, years, data_path, categorical, predicates)
+    if scan is not None:
+        return scan + ('mirror',)
+    dataset = open_dataset(ctr, years, data_path, categorical, statistics_filter(**predicates))
+    return dataset, build_filter(**predicates), 'primary'
+
+
+def load_table(ctr=None, years=None, columns=None, data_path: Path = DATA_PATH,
+               categorical: bool = False, **predicates) -> pa.Table:
+    """Load the selected partitions as an Arrow table.
+
+    Predicates are passed to `build_filter`; the scan is planned by `plan_scan`.
+    Returns an empty table with the requested columns when no partition matches.
+    """
+    columns = list(columns) if columns is not None else ALL_COLUMNS
+    dataset, expression, _ = plan_scan(ctr, years, data_path, categorical, **predicates)
+    if dataset is None:
+        schema = dataset_schema(categorical)
+        return pa.schema([schema.field(c) for c in columns]).empty_table()
+    return dataset.to_table(columns=columns, filter=expression)
+
+
+def to_pandas(table: pa.Table, categorical: bool = False) -> pd.DataFrame:
+    """Convert a loaded table to pandas (compact, sorted categoricals if requested)."""
+    df = table.to_pandas()
+    if categorical:
+        # Filtered dictionaries keep unused entries and follow file order;
+        # drop the former and sort so groupby output matches plain strings
+        for column in df.columns:
+            if isinstance(df[column].dtype, pd.CategoricalDtype):
+                codes = df[column].cat.remove_unused_categories()
+                df[column] = codes.cat.reorder_categories(codes.cat.categories.sort_values())
+    return df
+
+
+def load(ctr=None, years=None, columns=None, data_path: Path = DATA_PATH,
+         categorical: bool = False, **predicates) -> pd.DataFrame:
+    """Load the selected partitions into pandas (see `load_table`)."""
+    return to_pandas(load_table(ctr, years, columns, data_path, categorical, **predicates),
+                     categorical)
+
+
+def load_country_year(ctr: str, year: int, columns=None, data_path: Path = DATA_PATH,
+                      categorical: bool = False, **predicates) -> pd.DataFrame:
+    """Load one country-year partition (data columns only by default)."""
+    columns = columns if columns is not None else DATA_COLUMNS
+    return load(ctr, year, columns, data_path, categorical, **predicates)
+
+
+def iter_partitions(partitions, columns=None, data_path: Path = DATA_PATH,
+                    categorical: bool = False, read_ahead: int = READ_AHEAD, **predicates):
+    """Yield ((year, ctr), DataFrame) for each partition, in order, reading ahead.
+
+    Up to `read_ahead` partitions are loaded on a thread pool (Arrow releases
+    the GIL while decoding) while the caller works on the current one, so I/O
+    and compute overlap; at most `read_ahead` frames wait in memory. Missing
+    partitions yield empty frames, like `load_country_year`.
+    """
+    partitions = iter(partitions)
+    pending = deque()
+    executor = ThreadPoolExecutor(max_workers=max(1, read_ahead))
+
+    def submit():
+        key = next(partitions, None)
+        if key is not None:
+            year, ctr = key
+            pending.append((key, executor.submit(
+                load_country_year, ctr, year, columns, data_path, categorical, **predicates
+            )))
+
+    try:
+        for _ in range(max(1, read_ahead)):
+            submit()
+        while pending:
+            key, future = pending.popleft()
+            df = future.result()
+            submit()
+            yield key, df
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def code_startswith(series: pd.Series, prefix) -> pd.Series:
+    """Boolean mask of codes starting with prefix, computed per category."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.str.startswith(prefix)
+    per_category = np.append(np.asarray(series.cat.categories.str.startswith(prefix), bool), False)
+    return pd.Series(per_category[series.cat.codes.to_numpy()], index=series.index)
+
+
+def code_match(series: pd.Series, pattern: str) -> pd.Series:
+    """Boolean mask of codes matching a regex (re.match), computed per category."""
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.str.match(pattern)
+    per_category = np.append(np.asarray(series.cat.categories.str.match(pattern), bool), False)
+    return pd.Series(per_category[series.cat.codes.to_numpy()], index=series.index)
+
+
+def codes_equal(left: pd.Series, right: pd.Series) -> pd.Series:
+    """Row-wise equality of two code columns (e.g. m == ctr).
+
+    Categoricals with different category sets cannot be compared directly;
+    the right-hand codes are translated into the left-hand category space.
+    """
+    if not (isinstance(left.dtype, pd.CategoricalDtype)
+            and isinstance(right.dtype, pd.CategoricalDtype)):
+        return pd.Series(
+            np.asarray(left, dtype=object) == np.asarray(right, dtype=object),
+            index=left.index
+        )
+    translate = left.cat.categories.get_indexer(right.cat.categories)
+    translate[translate < 0] = -2
+    right_codes = np.append(translate, -2)[right.cat.codes.to_numpy()]
+    return pd.Series(left.cat.codes.to_numpy() == right_codes, index=left.index)
+
+
+def map_codes(series: pd.Series, func) -> pd.Series:
+    """Apply a per-code function once per category and broadcast the result.
+
+    Returns a categorical Series whose categories are the sorted distinct
+    results, so it can be grouped on without materialising strings.
+    """
+    if not isinstance(series.dtype, pd.CategoricalDtype):
+        return series.apply(func)
+    mapped = pd.Index([func(code) for code in series.cat.categories])
+    categories = mapped.unique().sort_values()
+    recode = np.append(categories.get_indexer(mapped), -1)
+    return pd.Series(
+        pd.Categorical.from_codes(recode[series.cat.codes.to_numpy()], categories),
+        index=series.index
+    )
@@ -0,0 +1,125 @@
+"""Dataset manifest for instant partition discovery.
+
+Writes three files into `data/parquet/`:
+- `_common_metadata`: the parquet schema of the partition files
+- `_metadata`: every file's footer (row groups, statistics) in one summary
+- `_manifest.json`: index of partitions with row counts, row groups, sizes,
+  mtimes and SHA-256 checksums
+
+`nam_loader` reads the manifest once per process and uses it instead of
+globbing the Hive tree. Scans over a whole dimension (all countries or all
+years) also take their footers from `_metadata` rather than opening ~700 files.
+A manifest goes stale when a partition is added, removed or rewritten, and the
+loader then falls back to the directory walk, so re-run after changing
+`data/parquet/`.
+
+Usage:
+    python scripts/nam_manifest.py
+"""
+
+import hashlib
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import pyarrow.parquet as pq
+
+import nam_loader
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+MANIFEST_VERSION = 1
+
+
+def file_checksum(path: Path, chunk_size: int = 1 << 20) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def build_manifest(data_path: Path = DATA_PATH, checksums: bool = True) -> dict:
+    """Write `_metadata`, `_common_metadata` and `_manifest.json`; return the manifest."""
+    data_path = Path(data_path)
+    partitions = nam_loader.list_partitions(data_path=data_path, use_manifest=False)
+    if not partitions:
+        raise FileNotFoundError(f"No parquet partitions under {data_path}")
+
+    entries = []
+    summary = None
+    schema = None
+    for year, ctr in partitions:
+        path = nam_loader.partition_path(ctr, year, data_path)
+        stat = path.stat()
+        metadata = pq.ParquetFile(path).metadata
+        entries.append({
+            'base': year,
+            'ctr': ctr,
+            'path': path.relative_to(data_path).as_posix(),
+            'rows': metadata.num_rows,
+            'row_groups': metadata.num_row_groups,
+            'bytes': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'sha256': file_checksum(path) if checksums else None,
+        })
+        metadata.set_file_path(path.relative_to(data_path).as_posix())
+        if summary is None:
+            summary, schema = metadata, metadata.schema.to_arrow_schema()
+        else:
+            summary.append_row_groups(metadata)
+
+    pq.write_metadata(schema, data_path / nam_loader.COMMON_METADATA_FILE)
+    summary.write_metadata_file(str(data_path / nam_loader.METADATA_FILE))
+
+    manifest = {
+        'version': MANIFEST_VERSION,
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'file_name': nam_loader.FILE_NAME,
+        'directories': {
+            p.name: p.stat().st_mtime_ns for p in sorted(data_path.glob('base=*'))
+        },
+        'rows': sum(e['rows'] for e in entries),
+        'bytes': sum(e['bytes'] for e in entries),
+        'partitions': entries,
+    }
+    tmp_path = data_path / (nam_loader.MANIFEST_FILE + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp_path, data_path / nam_loader.MANIFEST_FILE)
+    return manifest
+
+
+def verify_manifest(data_path: Path = DATA_PATH) -> list:
+    """Partitions whose file no longer matches the recorded size or checksum."""
+    data_path = Path(data_path)
+    with open(data_path / nam_loader.MANIFEST_FILE, encoding='utf-8') as f:
+        manifest = json.load(f)
+    mismatched = []
+    for entry in manifest['partitions']:
+        path = data_path / entry['path']
+        if (not path.exists() or path.stat().st_size != entry['bytes']
+                or (entry['sha256'] and file_checksum(path) != entry['sha256'])):
+            mismatched.append((entry['base'], entry['ctr']))
+    return mismatched
+
+
+def main():
+    """Build the manifest for data/parquet/."""
+    print("FIGARO-NAM Dataset Manifest")
+    print("=" * 60)
+    manifest = build_manifest()
+    years = sorted({e['base'] for e in manifest['partitions']})
+    countries = sorted({e['ctr'] for e in manifest['partitions']})
+    print(f"Partitions: {len(manifest['partitions'])} "
+          f"({len(countries)} countries x {len(years)} years, {years[0]}-{years[-1]})")
+    print(f"Rows: {manifest['rows']:,}")
+    print(f"Size: {manifest['bytes'] / 1e6:,.1f} MB")
+    print(f"\nSaved: {DATA_PATH / nam_loader.MANIFEST_FILE}, "
+          f"{nam_loader.METADATA_FILE}, {nam_loader.COMMON_METADATA_FILE}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+"""Per-partition sidecar of one-dimensional marginal totals.
+
+Most aggregates in the scripts are marginals of a country-year matrix: sums
+by Set_i or Set_j split into domestic (m == ctr) and imported (m != ctr)
+flows, or sums by partner m. Next to every partition file the sidecar
+
+    data/parquet/base=YYYY/ctr=XX/_marginals.parquet   (columns axis, origin, code, value)
+
+holds these totals (a few hundred rows), so an aggregate is answered in
+O(codes) without reading the 120k-row partition. The file name starts with
+an underscore, so Arrow dataset discovery ignores it.
+
+The size and mtime of the source file are stored in the sidecar's schema
+metadata; a sidecar whose source was rewritten since is stale and
+`read_marginals` returns None, so callers fall back to the parquet data.
+
+Usage:
+    python scripts/nam_marginals.py       # build sidecars for all partitions
+
+    from nam_marginals import read_marginals, aggregate
+    marginals = read_marginals('DE', 2019)        # None if missing or stale
+    wages = aggregate(marginals, set_i='D11', domestic=True)
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import nam_loader
+import nam_parallel
+from nam_metrics import TIME_SERIES_METRICS
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+SIDECAR_FILE = '_marginals.parquet'
+SIGNATURE_KEY = b'nam.source'
+AXES = ['Set_i', 'Set_j', 'm']
+ORIGINS = ['domestic', 'imported']
+
+
+def sidecar_path(ctr: str, year: int, data_path: Path = DATA_PATH) -> Path:
+    """Path of the marginals sidecar next to a partition file."""
+    return nam_loader.partition_path(ctr, year, data_path).with_name(SIDECAR_FILE)
+
+
+def compute_marginals(df: pd.DataFrame, ctr: str) -> pd.DataFrame:
+    """Marginal totals of one partition in long form (axis, origin, code, value)."""
+    df = df[nam_loader.DATA_COLUMNS].assign(
+        origin=pd.Categorical(np.where(df['m'] == ctr, 'domestic', 'imported'), categories=ORIGINS)
+    )
+    frames = []
+    for axis in AXES:
+        sums = df.groupby([axis, 'origin'], observed=True)['value'].sum().reset_index()
+        frames.append(pd.DataFrame({
+            'axis': axis,
+            'origin': sums['origin'].astype(str),
+            'code': sums[axis].astype(str),
+            'value': sums['value'].astype(np.float64),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def _signature(ctr: str, year: int, data_path: Path) -> list:
+    return nam_loader.source_signature([(year, ctr)], data_path)[f'{year}/{ctr}']
+
+
+def build_sidecar(year: int, ctr: str, data_path: Path = DATA_PATH) -> int:
+    """Write the sidecar for one partition (worker task); return its row count."""
+    signature = _signature(ctr, year, data_path)
+    df = nam_loader.load_country_year(ctr, year, nam_loader.DATA_COLUMNS, data_path,
+                                      categorical=True)
+    table = pa.Table.from_pandas(compute_marginals(df, ctr), preserve_index=False)
+    table = table.replace_schema_metadata({SIGNATURE_KEY: json.dumps(signature)})
+    pq.write_table(table, sidecar_path(ctr, year, data_path))
+    return table.num_rows
+
+
+def build_sidecars(data_path: Path = DATA_PATH, years=None, workers: int = None) -> list:
+    """Build sidecars for all (or the given years') partitions on the process pool."""
+    partitions = nam_loader.list_partitions(years=years, data_path=data_path)
+    nam_parallel.map_partitions(build_sidecar, partitions, workers, data_path=data_path)
+    return partitions
+
+
+def is_stale(ctr: str, year: int, data_path: Path = DATA_PATH) -> bool:
+    """True if the sidecar is missing or its source file changed since the build."""
+    path = sidecar_path(ctr, year, data_path)
+    if not path.exists():
+        return True
+    metadata = pq.read_schema(path).metadata or {}
+    recorded = json.loads(metadata.get(SIGNATURE_KEY, b'null'))
+    try:
+        return recorded != _signature(ctr, year, data_path)
+    except FileNotFoundError:
+        return True
+
+
+def read_marginals(ctr: str, year: int, data_path: Path = DATA_PATH):
+    """Marginal totals of one partition, or None if the sidecar is missing or stale."""
+    if is_stale(ctr, year, data_path):
+        return None
+    return pq.read_table(sidecar_path(ctr, year, data_path)).to_pandas()
+
+
+def marginal(marginals: pd.DataFrame, axis: str, domestic=None) -> pd.Series:
+    """Totals by code along one axis; domestic=True/False keeps one origin."""
+    rows = marginals[marginals['axis'] == axis]
+    if domestic is not None:
+        rows = rows[rows['origin'] == ('domestic' if domestic else 'imported')]
+    return rows.groupby('code', sort=False)['value'].sum()
+
+
+def aggregate(marginals: pd.DataFrame, set_i=None, set_j=None, m=None,
+              set_i_prefix=None, set_j_prefix=None, domestic=None) -> float:
+    """Sum of value under predicates on at most one axis (same names as nam_loader).
+
+    Raises ValueError for predicates on two axes, which are not a marginal.
+    """
+    restricted = {
+        'Set_i': (set_i, set_i_prefix),
+        'Set_j': (set_j, set_j_prefix),
+        'm': (m, None),
+    }
+    axes = [axis for axis, (codes, prefix) in restricted.items()
+            if codes is not None or prefix is not None]
+    if len(axes) > 1:
+        raise ValueError(f"Predicates on {', '.join(axes)} span more than one marginal")
+    axis = axes[0] if axes else 'Set_i'
+    codes, prefix = restricted[axis]
+
+    totals = marginal(marginals, axis, domestic)
+    keep = np.ones(len(totals), dtype=bool)
+    if codes is not None:
+        keep &= totals.index.isin(nam_loader._as_list(codes))
+    if prefix is not None:
+        keep &= totals.index.str.startswith(prefix)
+    return float(totals[keep].sum())
+
+
+def time_series_row(year: int, ctr: str, data_path: Path = DATA_PATH,
+                    metrics: dict = TIME_SERIES_METRICS):
+    """One row of the country time series from the sidecar, or None if unavailable.
+
+    Every metric must restrict at most one axis (see `aggregate`).
+    """
+    marginals = read_marginals(ctr, year, data_path)
+    if marginals is None:
+        return None
+    row = {'year': int(year), 'country': ctr}
+    for name, spec in metrics.items():
+        row[name] = aggregate(marginals, **spec)
+    return row
+
+
+def main():
+    """Build marginals sidecars for data/parquet/."""
+    print("FIGARO-NAM Marginals Sidecars")
+    print("=" * 60)
+    partitions = build_sidecars()
+    print(f"\nWrote {len(partitions)} sidecars ({SIDECAR_FILE}) under {DATA_PATH}")
+
+
+if __name__ == '__main__':
+    main()
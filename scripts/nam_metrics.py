@@ -0,0 +1,92 @@
+"""Declarative metrics and a fused single-scan aggregation kernel.
+
+A metric is a dict of loader-style predicates (`set_i`, `set_j`, `m`,
+`set_i_prefix`, `set_j_prefix`, `domestic`), e.g.
+
+    'wages_D11': {'set_i': 'D11', 'domestic': True}
+
+`compute_metrics` sums every metric of a partition in one pass. Predicates are
+evaluated once per distinct code, and each metric becomes one bit of a
+per-code mask. A row's mask is the AND of one gather per code column. The
+values are then summed per distinct mask (a single bincount) and each metric
+adds up the masks with its bit set. Adding a metric adds a bit, not a scan.
+
+Usage:
+    from nam_metrics import compute_metrics
+    row = compute_metrics(df, 'DE')                           # TIME_SERIES_METRICS
+    row = compute_metrics(df, 'DE', {'exports': {'set_j': 'P6'}})
+"""
+
+import numpy as np
+import pandas as pd
+
+import nam_loader
+
+# Key aggregates of the country time series (03, 10, 11, cube and sidecars)
+TIME_SERIES_METRICS = {
+    'wages_D11': {'set_i': 'D11', 'domestic': True},
+    'surplus_B2': {'set_i': 'B2', 'domestic': True},
+    'hh_consumption': {'set_j': 'P3_S14', 'domestic': True},
+    'gov_consumption': {'set_j': 'P3_S13', 'domestic': True},
+    'investment': {'set_j': 'P51G', 'domestic': True},
+    # Imports: products from foreign partners
+    'imports': {'set_i_prefix': 'CPA_', 'domestic': False},
+}
+
+# Predicate keys by the column they test
+COLUMN_PREDICATES = {
+    'Set_i': ('set_i', 'set_i_prefix'),
+    'Set_j': ('set_j', 'set_j_prefix'),
+    'm': ('m', 'domestic'),
+}
+MAX_METRICS = 64
+
+
+def _column_codes(series: pd.Series):
+    """Integer codes and distinct labels of a code column (free for categoricals)."""
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return series.cat.codes.to_numpy(), series.cat.categories.astype(str)
+    codes, labels = pd.factorize(series)
+    return codes, pd.Index(labels).astype(str)
+
+
+def _label_bits(labels: pd.Index, column: str, metrics: dict, ctr: str) -> np.ndarray:
+    """Bit k set for every label that metric k accepts; one trailing 0 for nulls."""
+    codes_key, second_key = COLUMN_PREDICATES[column]
+    bits = np.zeros(len(labels) + 1, dtype=np.uint64)
+    for k, spec in enumerate(metrics.values()):
+        keep = np.ones(len(labels), dtype=bool)
+        if spec.get(codes_key) is not None:
+            keep &= labels.isin(nam_loader._as_list(spec[codes_key]))
+        second = spec.get(second_key)
+        if second is not None and column == 'm':
+            keep &= (labels == ctr) if second else (labels != ctr)
+        elif second is not None:
+            keep &= labels.str.startswith(tuple(nam_loader._as_list(second)))
+        bits[:-1] |= keep.astype(np.uint64) << np.uint64(k)
+    return bits
+
+
+def row_bits(df: pd.DataFrame, ctr: str, metrics: dict = TIME_SERIES_METRICS) -> np.ndarray:
+    """Per-row bitmask of the metrics each row contributes to."""
+    if len(metrics) > MAX_METRICS:
+        raise ValueError(f"At most {MAX_METRICS} metrics per scan, got {len(metrics)}")
+    mask = np.full(len(df), (1 << len(metrics)) - 1, dtype=np.uint64)
+    for column, keys in COLUMN_PREDICATES.items():
+        if not any(spec.get(key) is not None for spec in metrics.values() for key in keys):
+            continue
+        codes, labels = _column_codes(df[column])
+        mask &= _label_bits(labels, column, metrics, ctr)[codes]
+    return mask
+
+
+def compute_metrics(df: pd.DataFrame, ctr: str, metrics: dict = TIME_SERIES_METRICS) -> dict:
+    """Sum of value for every metric of one country-year, in one pass over the rows."""
+    values = df['value'].to_numpy(dtype=np.float64)
+    values = np.where(np.isnan(values), 0.0, values)
+    patterns, inverse = np.unique(row_bits(df, ctr, metrics), return_inverse=True)
+    sums = np.bincount(inverse, weights=values, minlength=len(patterns))
+    return {
+        name: float(sums[(patterns >> np.uint64(k)) & np.uint64(1) == 1].sum())
+        for k, name in enumerate(metrics)
+    }
@@ -0,0 +1,94 @@
+"""Partner-clustered mirror of the dataset for export-side queries.
+
+The primary layout is partitioned by reporting country (`ctr`), so "everything
+country X delivers in year Y" (m == X) touches every country file. The mirror
+re-partitions the same rows by partner:
+
+    data/parquet_by_m/base=YYYY/m=XX/part-0.parquet   (columns ctr, Set_i, Set_j, value)
+
+Each file is sorted by (ctr, Set_i, Set_j) in small row groups, so a
+single-exporter query is one contiguous read. `nam_loader` picks the mirror
+automatically for `m`-restricted queries when it needs fewer files and the
+source partitions are unchanged since the build (size and mtime recorded in
+`_mirror.json`).
+
+Usage:
+    python scripts/nam_mirror.py
+"""
+
+import json
+import shutil
+from pathlib import Path
+
+import numpy as np
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+import nam_loader
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+SORT_COLUMNS = ['m', 'ctr', 'Set_i', 'Set_j']
+ROW_GROUP_SIZE = 4096
+
+
+def build_mirror(data_path: Path = DATA_PATH, years=None) -> dict:
+    """Write the partner mirror for all (or the given) years; return its metadata."""
+    data_path = Path(data_path)
+    root = nam_loader.mirror_path(data_path)
+    partitions = nam_loader.list_partitions(years=years, data_path=data_path)
+    if not partitions:
+        raise FileNotFoundError(f"No parquet partitions under {data_path}")
+
+    meta_path = root / nam_loader.MIRROR_META_FILE
+    meta = {'source': {}, 'partners': {}}
+    if meta_path.exists():
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+
+    for year in sorted({y for y, _ in partitions}):
+        print(f"  Mirroring base={year}...")
+        table = nam_loader.load_table(
+            years=year, columns=['m'] + nam_loader.MIRROR_FILE_COLUMNS, data_path=data_path
+        ).sort_by([(column, 'ascending') for column in SORT_COLUMNS])
+
+        # Sorted by m, so each partner is one contiguous slice
+        counts = pc.value_counts(table.column('m')).to_pylist()
+        counts.sort(key=lambda item: item['values'])
+        offsets = np.cumsum([0] + [item['counts'] for item in counts])
+
+        year_dir = root / f'base={year}'
+        if year_dir.exists():
+            shutil.rmtree(year_dir)
+        for item, start in zip(counts, offsets[:-1]):
+            path = nam_loader.mirror_partition_path(item['values'], year, data_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            part = table.slice(int(start), item['counts']).select(nam_loader.MIRROR_FILE_COLUMNS)
+            pq.write_table(
+                part, path,
+                row_group_size=ROW_GROUP_SIZE,
+                write_statistics=True,
+                sorting_columns=pq.SortingColumn.from_ordering(
+                    part.schema, [(column, 'ascending') for column in SORT_COLUMNS[1:]]
+                ),
+            )
+        meta['partners'][str(year)] = [item['values'] for item in counts]
+
+    meta['source'].update(nam_loader.source_signature(partitions, data_path))
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+def main():
+    """Build data/parquet_by_m/ from data/parquet/."""
+    print("FIGARO-NAM Partner Mirror")
+    print("=" * 60)
+    meta = build_mirror()
+    files = sum(len(partners) for partners in meta['partners'].values())
+    print(f"\nMirrored {len(meta['source'])} source partitions into {files} partner files")
+    print(f"Saved: {nam_loader.mirror_path(DATA_PATH)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+"""Country x year panel of the key time-series aggregates.
+
+One job computes `nam_metrics.TIME_SERIES_METRICS` for every country and
+base year found under `data/parquet/` (new base years are picked up
+automatically) and writes them as one columnar file:
+
+    outputs/tables/time_series_panel.parquet   (year, country, <metrics>)
+
+Partitions in the cube are answered from it; the rest go to the dataframe
+engine (`nam_engine`): with pandas each partition is read once on the
+`nam_parallel` process pool and summed with the fused kernel, or taken from
+its current marginals sidecar; with Polars they are summed by one lazy,
+multi-threaded scan. Per-country
+CSVs are slices of the panel (`country_series`).
+
+Country groups from `nam_regions.REGIONS` (EU27, euro area, the H_int
+regions) are summed from the country rows in the same job and stored as
+extra rows whose country is the region name. A group's series is then
+`country_series(panel, 'EU27')`, like any country's.
+
+The panel records the size and mtime of its source partitions and the metric
+and region definitions; `load_panel` returns None once any of them has changed.
+
+Usage:
+    python scripts/nam_panel.py [--engine polars]
+
+    from nam_panel import load_panel, country_series
+    panel = load_panel()                         # None if missing or stale
+    pt = country_series(panel, 'PT')
+    eu = country_series(panel, 'EU27')
+"""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import nam_cube
+import nam_engine
+import nam_loader
+import nam_regions
+from nam_metrics import TIME_SERIES_METRICS
+from nam_regions import REGIONS
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+PANEL_PATH = nam_loader.PROJECT_ROOT / 'outputs' / 'tables' / 'time_series_panel.parquet'
+METADATA_KEY = b'nam.panel'
+
+
+def build_panel(years=None, countries=None, data_path: Path = DATA_PATH,
+                metrics: dict = TIME_SERIES_METRICS, workers: int = None,
+                engine=None, regions: dict = REGIONS) -> pd.DataFrame:
+    """Metrics for every (country, year) of the grid, one row each, sorted by country then year.
+
+    years/countries default to all base years and countries on disk. Cells
+    of the grid without a partition get the values of an empty partition.
+    engine: a nam_engine engine or its name (default: --engine / NAM_ENGINE).
+    The totals of the regions whose members are all in the grid follow the
+    country rows (nam_regions.region_rows).
+    """
+    partitions = nam_loader.list_partitions(countries, years, data_path)
+    years = (sorted({y for y, _ in partitions}) if years is None
+             else [int(y) for y in nam_loader._as_list(years)])
+    countries = (sorted({c for _, c in partitions}) if countries is None
+                 else nam_loader._as_list(countries))
+    grid = [(year, ctr) for ctr in countries for year in years]
+
+    cube = nam_cube.open_cube(data_path=data_path)
+    pending = [(year, ctr) for year, ctr in grid if cube is None or not cube.has(year, ctr)]
+    if engine is None or isinstance(engine, str):
+        engine = nam_engine.get_engine(engine)
+    rows = dict(zip(pending, engine.metric_rows(pending, data_path, metrics, workers)))
+    panel = pd.DataFrame([
+        rows[(year, ctr)] if (year, ctr) in rows
+        else nam_cube.time_series_row(cube, year, ctr, metrics)
+        for year, ctr in grid
+    ], columns=['year', 'country', *metrics])
+    if not regions or not nam_regions.complete_regions(countries, regions):
+        return panel
+    return pd.concat([panel, nam_regions.region_rows(panel, regions)], ignore_index=True)
+
+
+def country_series(panel: pd.DataFrame, ctr: str) -> pd.DataFrame:
+    """Time series of one country or region, as written to {CTR}_time_series.csv."""
+    return panel[panel['country'] == ctr].sort_values('year').reset_index(drop=True)
+
+
+def _provenance(panel: pd.DataFrame, data_path: Path, metrics: dict, regions: dict) -> dict:
+    partitions = nam_loader.list_partitions(data_path=data_path)
+    return {
+        'source': nam_loader.source_signature(partitions, data_path),
+        'metrics': json.loads(json.dumps(metrics)),
+        'regions': json.loads(json.dumps(regions or {})),
+        'years': sorted(int(y) for y in panel['year'].unique()),
+        'countries': sorted(set(panel['country']) - set(regions or {})),
+    }
+
+
+def write_panel(panel: pd.DataFrame, path: Path = PANEL_PATH, data_path: Path = DATA_PATH,
+                metrics: dict = TIME_SERIES_METRICS, regions: dict = REGIONS) -> Path:
+    """Write the panel as one parquet file with its provenance in the schema metadata."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(panel, preserve_index=False)
+    table = table.replace_schema_metadata({
+        **(table.schema.metadata or {}),
+        METADATA_KEY: json.dumps(_provenance(panel, data_path, metrics, regions)),
+    })
+    pq.write_table(table, path)
+    return path
+
+
+def load_panel(path: Path = PANEL_PATH, data_path: Path = DATA_PATH,
+               metrics: dict = TIME_SERIES_METRICS, regions: dict = REGIONS):
+    """The written panel, or None if missing or built from other data, metrics or regions."""
+    path = Path(path)
+    if not path.exists():
+        return None
+    table = pq.read_table(path)
+    recorded = json.loads((table.schema.metadata or {}).get(METADATA_KEY, b'{}'))
+    partitions = nam_loader.list_partitions(data_path=data_path)
+    if (recorded.get('source') != nam_loader.source_signature(partitions, data_path)
+            or recorded.get('metrics') != json.loads(json.dumps(metrics))
+            or recorded.get('regions') != json.loads(json.dumps(regions or {}))):
+        return None
+    return table.to_pandas()
+
+
+def main():
+    """Build the panel for all countries and years under data/parquet/."""
+    print("FIGARO-NAM Time-Series Panel")
+    print("=" * 60)
+    panel = build_panel()
+    path = write_panel(panel)
+    regions = [name for name in REGIONS if name in set(panel['country'])]
+    countries = panel['country'].nunique() - len(regions)
+    print(f"\n{countries} countries x {panel['year'].nunique()} years "
+          f"({panel['year'].min()}-{panel['year'].max()}), {len(panel.columns) - 2} metrics")
+    print(f"Regions: {', '.join(regions) or 'none complete'}")
+    print(f"Saved: {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""Process-pool map-reduce over (year, ctr) partitions.
+
+The per-partition pandas work in the analysis scripts (filters, group-bys,
+aggregates) holds the GIL, so it is fanned out over worker processes rather
+than threads. Each worker reads its own partitions, so I/O is parallel too.
+
+Usage:
+    from nam_parallel import imap_partitions, map_partitions, map_reduce, concat_frames
+
+    rows = map_partitions(partition_metrics, [(2019, 'DE'), (2020, 'DE')])
+    negatives = map_reduce(load_negatives, partitions, concat_frames)
+    for partial in imap_partitions(partition_top, partitions):   # streamed, in input order
+        top.merge(partial)
+
+`func(year, ctr, **kwargs)` must be a module-level function so it can be
+pickled; scripts keep their `if __name__ == '__main__':` guard so workers can
+import them. Set NAM_WORKERS to cap the pool (NAM_WORKERS=1 runs serially).
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+import pandas as pd
+
+# Configuration
+WORKERS = int(os.environ.get('NAM_WORKERS', 0)) or os.cpu_count() or 1
+
+
+def imap_partitions(func, partitions, workers: int = None, **kwargs):
+    """Yield func(year, ctr, **kwargs) for each partition, in input order.
+
+    Results stream out without collecting the full list first. A result
+    waits for all earlier partitions, including the slowest of them.
+    """
+    partitions = list(partitions)
+    workers = min(workers or WORKERS, len(partitions))
+    if workers <= 1:
+        for year, ctr in partitions:
+            yield func(year, ctr, **kwargs)
+        return
+    years, countries = zip(*partitions)
+    chunksize = max(1, len(partitions) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(partial(func, **kwargs), years, countries, chunksize=chunksize)
+
+
+def map_partitions(func, partitions, workers: int = None, **kwargs) -> list:
+    """Results of func(year, ctr, **kwargs) for each partition, in input order."""
+    return list(imap_partitions(func, partitions, workers, **kwargs))
+
+
+def map_reduce(func, partitions, reduce, workers: int = None, **kwargs):
+    """Map func over partitions in worker processes and merge the partial results."""
+    return reduce(map_partitions(func, partitions, workers, **kwargs))
+
+
+def concat_frames(frames) -> pd.DataFrame:
+    """Reducer: concatenate partial DataFrames, skipping empty ones."""
+    frames = [df for df in frames if df is not None and not df.empty]
+    if not frames:
+        return pd.DataFrame()
+    return pd.concat(frames, ignore_index=True)
@@ -0,0 +1,234 @@
+"""Programmatic query API over the FIGARO-NAM parquet dataset.
+
+A query names partitions (years, ctr) and row predicates with the loader's
+names (`set_i`, `set_j`, `m`, `set_i_prefix`, `set_j_prefix`, `domestic`)
+and compiles to one Arrow scan: partition selection, row-group pruning by
+statistics, the partner mirror for `m` queries, and the row filter pushed
+into the reader (see `nam_loader.plan_scan`). Nothing is read until a verb
+(`to_pandas`, `sum`, `group_by(...).sum()`, ...) is called. Aggregating verbs
+group and sum in Arrow (`nam_arrow`) and convert only the result to pandas.
+
+Usage:
+    from nam_query import FigaroDataset
+
+    nam = FigaroDataset()
+    wages = nam.query(years=2019, ctr='DE', set_i='D11', domestic=True).group_by('Set_j').sum()
+    imports = nam.query(years=2019, ctr='DE', set_i_prefix='CPA_', domestic=False).sum()
+    exports = nam.query(years=2019, m='DE', domestic=False).group_by('ctr').sum()
+    print(nam.query(years=range(2010, 2024), set_j='P3_S14').explain())
+
+`explain()` lists the files and row groups the scan will touch, with their
+estimated compressed bytes, without reading any data. Sums are answered from
+the smallest materialised view of `nam_lattice` that covers the query, when
+the lattice is built and current.
+"""
+
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+import nam_arrow
+import nam_lattice
+import nam_loader
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+PREDICATES = ('set_i', 'set_j', 'm', 'set_i_prefix', 'set_j_prefix', 'domestic', 'filter')
+PREDICATE_COLUMNS = {
+    'set_i': ['Set_i'], 'set_i_prefix': ['Set_i'],
+    'set_j': ['Set_j'], 'set_j_prefix': ['Set_j'],
+    'm': ['m'], 'domestic': ['m', 'ctr'],
+}
+EXPLAIN_FILES = 20
+
+
+class FigaroDataset:
+    """Entry point: the parquet dataset under one root."""
+
+    def __init__(self, data_path: Path = DATA_PATH, categorical: bool = True,
+                 lattice_path: Path = nam_lattice.LATTICE_PATH):
+        self.data_path = Path(data_path)
+        self.categorical = categorical
+        self.lattice_path = lattice_path
+        self._lattice = None
+
+    @property
+    def lattice(self):
+        """Materialised views (nam_lattice), or None if disabled, not built or stale."""
+        if self._lattice is None:
+            opened = self.lattice_path and nam_lattice.open_lattice(self.lattice_path, self.data_path)
+            self._lattice = opened or False
+        return self._lattice or None
+
+    def partitions(self, years=None, ctr=None) -> list:
+        """Existing (year, ctr) partitions, optionally restricted."""
+        return nam_loader.list_partitions(ctr, years, self.data_path)
+
+    def query(self, years=None, ctr=None, **predicates) -> 'Query':
+        """A lazy query over the selected partitions and row predicates."""
+        return Query(self, years, ctr, {}).where(**predicates)
+
+
+class Query:
+    """Lazy scan description; verbs execute it."""
+
+    def __init__(self, dataset: FigaroDataset, years, ctr, predicates: dict, columns=None):
+        self.dataset = dataset
+        self.years = years
+        self.ctr = ctr
+        self.predicates = predicates
+        self.columns = columns
+
+    def where(self, **predicates) -> 'Query':
+        """Add (or replace) row predicates."""
+        unknown = set(predicates) - set(PREDICATES)
+        if unknown:
+            raise TypeError(f"Unknown predicate(s): {', '.join(sorted(unknown))}")
+        merged = {**self.predicates, **{k: v for k, v in predicates.items() if v is not None}}
+        return Query(self.dataset, self.years, self.ctr, merged, self.columns)
+
+    def select(self, *columns) -> 'Query':
+        """Project the result onto these columns."""
+        return Query(self.dataset, self.years, self.ctr, self.predicates, list(columns))
+
+    def _plan(self, categorical: bool):
+        return nam_loader.plan_scan(self.ctr, self.years, self.dataset.data_path,
+                                    categorical, **self.predicates)
+
+    def to_table(self) -> pa.Table:
+        """Execute the scan as an Arrow table."""
+        return nam_loader.load_table(self.ctr, self.years, self.columns, self.dataset.data_path,
+                                     self.dataset.categorical, **self.predicates)
+
+    def to_pandas(self) -> pd.DataFrame:
+        """Execute the scan into pandas."""
+        return nam_loader.to_pandas(self.to_table(), self.dataset.categorical)
+
+    def view(self, keys=()):
+        """Name of the materialised view that answers this query's sums, or None."""
+        lattice = self.dataset.lattice
+        return lattice.choose(keys, self.predicates) if lattice is not None else None
+
+    def sum(self) -> float:
+        """Total value of the matching rows (from a materialised view when one covers it)."""
+        if self.view() is not None:
+            return self.dataset.lattice.answer(self.years, self.ctr, **self.predicates)
+        return nam_arrow.total(self.select('value').to_table())
+
+    def count(self) -> int:
+        """Number of matching rows."""
+        return self.select('value').to_table().num_rows
+
+    def group_by(self, *keys) -> 'GroupedQuery':
+        """Group the matching rows by columns (e.g. 'Set_j', 'm', 'base', 'ctr')."""
+        return GroupedQuery(self, list(keys))
+
+    def plan(self) -> pd.DataFrame:
+        """Files and row groups the scan will read, with estimated compressed bytes.
+
+        One row per candidate file. Row groups are counted as read unless
+        their min/max statistics rule the predicates out; bytes count only
+        the columns the scan needs.
+        """
+        dataset, _, layout = self._plan(categorical=False)
+        if dataset is None:
+            return pd.DataFrame(columns=['layout', 'file', 'row_groups', 'row_groups_read',
+                                         'rows_read', 'bytes', 'bytes_read'])
+        expression = nam_loader.statistics_filter(**self.predicates)
+        needed = set(self.columns or nam_loader.ALL_COLUMNS)
+        for key in self.predicates:
+            needed.update(PREDICATE_COLUMNS.get(key, nam_loader.DATA_COLUMNS))
+        root = nam_loader.mirror_path(self.dataset.data_path) if layout == 'mirror' \
+            else self.dataset.data_path
+
+        records = []
+        for fragment in dataset.get_fragments():
+            metadata = fragment.metadata
+            kept = set(nam_loader.row_groups(fragment.path, expression))
+            sizes, rows_read, bytes_read = [], 0, 0
+            for i in range(metadata.num_row_groups):
+                row_group = metadata.row_group(i)
+                size = sum(row_group.column(j).total_compressed_size
+                           for j in range(row_group.num_columns)
+                           if row_group.column(j).path_in_schema in needed)
+                sizes.append(size)
+                if i in kept:
+                    rows_read += row_group.num_rows
+                    bytes_read += size
+            records.append({
+                'layout': layout,
+                'file': Path(fragment.path).parent.relative_to(root).as_posix(),
+                'row_groups': metadata.num_row_groups,
+                'row_groups_read': len(kept),
+                'rows_read': rows_read,
+                'bytes': sum(sizes),
+                'bytes_read': bytes_read,
+            })
+        return pd.DataFrame(records)
+
+    def explain(self) -> str:
+        """Human-readable scan plan (see `plan`)."""
+        plan = self.plan()
+        scope = ', '.join(f'{k}={v!r}' for k, v in
+                          [('years', self.years), ('ctr', self.ctr), *self.predicates.items()]
+                          if v is not None)
+        _, expression, layout = self._plan(categorical=False)
+        lines = [f"Query: {scope or 'all rows'}", f"Filter: {expression}"]
+        view = self.view()
+        if view is not None:
+            lines.append(f"Sums: answered from view {view} "
+                         f"({self.dataset.lattice.views[view]['rows']:,} rows); other verbs scan")
+        if plan.empty:
+            return '\n'.join(lines + ["No partitions match"])
+        files_read = int((plan['row_groups_read'] > 0).sum())
+        lines += [
+            f"Layout: {layout} ({files_read} of {len(plan)} files read, "
+            f"{len(self.dataset.partitions())} partitions in dataset)",
+            f"Row groups: {plan['row_groups_read'].sum():,} of {plan['row_groups'].sum():,}",
+            f"Rows read: ~{plan['rows_read'].sum():,}",
+            f"Bytes read: ~{plan['bytes_read'].sum() / 1e6:,.2f} MB "
+            f"of {plan['bytes'].sum() / 1e6:,.2f} MB (compressed, needed columns)",
+        ]
+        for _, row in plan[plan['row_groups_read'] > 0].head(EXPLAIN_FILES).iterrows():
+            lines.append(f"  {row['file']:<24} row groups {row['row_groups_read']}/{row['row_groups']}"
+                         f"  rows {row['rows_read']:,}  {row['bytes_read'] / 1e6:,.2f} MB")
+        if files_read > EXPLAIN_FILES:
+            lines.append(f"  ... {files_read - EXPLAIN_FILES} more files")
+        return '\n'.join(lines)
+
+
+class GroupedQuery:
+    """Group-by verbs over a query, aggregated in Arrow (see nam_arrow)."""
+
+    def __init__(self, query: Query, keys: list):
+        self.query = query
+        self.keys = keys
+
+    def _table(self) -> pa.Table:
+        return self.query.select(*self.keys, 'value').to_table()
+
+    def agg(self, *funcs) -> pd.DataFrame:
+        """Aggregates of value per group, e.g. agg('sum', 'mean', 'count').
+
+        Aggregates in `nam_arrow.AGGREGATES` run in Arrow. Any other pandas
+        aggregate ('median', 'nunique', 'first', ...) falls back to a pandas
+        group-by over the same rows, with codes decoded to plain labels.
+        """
+        table = self._table()
+        if all(func in nam_arrow.AGGREGATES for func in funcs):
+            return nam_arrow.group_aggregate(table, self.keys, funcs)
+        schema = nam_loader.dataset_schema()
+        df = table.cast(pa.schema([schema.field(c) for c in table.column_names])).to_pandas()
+        return df.groupby(self.keys)['value'].agg(list(funcs))
+
+    def sum(self) -> pd.Series:
+        """Total value per group (from a materialised view when one covers it)."""
+        query = self.query
+        if query.view(self.keys) is not None:
+            return query.dataset.lattice.answer(query.years, query.ctr, self.keys, **query.predicates)
+        return nam_arrow.group_sum(self._table(), self.keys)
+
+    def count(self) -> pd.Series:
+        """Number of rows per group."""
+        return self.agg('count')['count'].rename('value')
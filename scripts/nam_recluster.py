@@ -0,0 +1,158 @@
+"""Re-cluster the parquet dataset for statistics-driven row-group skipping.
+
+Rewrites every `data/parquet/base=*/ctr=*/part-0.parquet` sorted by
+(Set_i, Set_j, m) with small row groups, min/max statistics and a page index.
+Filters on a single Set_i/Set_j code or a Set_i prefix (e.g. `CPA_`) then
+touch only the row groups whose code range can contain a match; the loader
+(`nam_loader`) skips the rest.
+
+For a set of probe filters the tool reports, before and after rewriting, how
+many row groups and compressed bytes statistics allow a reader to skip.
+
+Output: outputs/tables/recluster_report.csv
+
+Usage:
+    python scripts/nam_recluster.py
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+import pyarrow.parquet as pq
+
+import nam_loader
+import nam_manifest
+import nam_marginals
+
+# Configuration
+DATA_PATH = Path('data/parquet/')
+OUTPUT_PATH = Path('outputs/tables/')
+
+SORT_COLUMNS = ['Set_i', 'Set_j', 'm']
+ROW_GROUP_SIZE = 4096
+
+# Probe filters for the skip report (loader predicates)
+PROBES = {
+    "Set_i == 'D11'": {'set_i': 'D11'},
+    "Set_j == 'P3_S14'": {'set_j': 'P3_S14'},
+    "Set_i starts with 'CPA_'": {'set_i_prefix': 'CPA_'},
+}
+
+
+def is_clustered(path: Path, row_group_size: int = ROW_GROUP_SIZE) -> bool:
+    """Whether a file already has the target sort order and row-group size."""
+    metadata = pq.ParquetFile(path).metadata
+    if metadata.num_row_groups == 0:
+        return True
+    sorting = metadata.row_group(0).sorting_columns or ()
+    names = [metadata.schema.column(c.column_index).name for c in sorting]
+    largest = max(metadata.row_group(i).num_rows for i in range(metadata.num_row_groups))
+    return names == SORT_COLUMNS and largest <= row_group_size
+
+
+def recluster_file(path: Path, row_group_size: int = ROW_GROUP_SIZE):
+    """Rewrite one partition file sorted by SORT_COLUMNS (atomic replace)."""
+    path = Path(path)
+    source = pq.ParquetFile(path)
+    compression = (source.metadata.row_group(0).column(0).compression
+                   if source.metadata.num_row_groups else 'snappy')
+    table = source.read().sort_by([(column, 'ascending') for column in SORT_COLUMNS])
+
+    tmp_path = path.with_suffix('.parquet.tmp')
+    pq.write_table(
+        table, tmp_path,
+        row_group_size=row_group_size,
+        compression=compression.lower(),
+        write_statistics=True,
+        write_page_index=True,
+        sorting_columns=pq.SortingColumn.from_ordering(
+            table.schema, [(column, 'ascending') for column in SORT_COLUMNS]
+        ),
+    )
+    os.replace(tmp_path, path)
+
+
+def skip_stats(path: Path, probes: dict = PROBES) -> list:
+    """Row groups and compressed bytes that statistics skip for each probe."""
+    metadata = pq.ParquetFile(path).metadata
+    sizes = [
+        sum(metadata.row_group(i).column(j).total_compressed_size
+            for j in range(metadata.num_columns))
+        for i in range(metadata.num_row_groups)
+    ]
+    rows = []
+    for name, predicates in probes.items():
+        kept = nam_loader.row_groups(path, nam_loader.statistics_filter(**predicates))
+        rows.append({
+            'probe': name,
+            'row_groups': len(sizes),
+            'row_groups_skipped': len(sizes) - len(kept),
+            'bytes': sum(sizes),
+            'bytes_skipped': sum(sizes) - sum(sizes[i] for i in kept),
+        })
+    return rows
+
+
+def recluster(data_path: Path = DATA_PATH, row_group_size: int = ROW_GROUP_SIZE,
+              probes: dict = PROBES) -> pd.DataFrame:
+    """Re-cluster all partitions and return the before/after skip report.
+
+    An existing dataset manifest is rebuilt afterwards, since rewritten files
+    invalidate its sizes, checksums and `_metadata` footers; existing
+    marginals sidecars are refreshed for the same reason.
+    """
+    had_manifest = (Path(data_path) / nam_loader.MANIFEST_FILE).exists()
+    partitions = nam_loader.list_partitions(data_path=data_path)
+    records = []
+    for year, ctr in partitions:
+        path = nam_loader.partition_path(ctr, year, data_path)
+        for stage in ('before', 'after'):
+            if stage == 'after' and not is_clustered(path, row_group_size):
+                recluster_file(path, row_group_size)
+                if nam_marginals.sidecar_path(ctr, year, data_path).exists():
+                    nam_marginals.build_sidecar(year, ctr, data_path)
+            for row in skip_stats(path, probes):
+                records.append({'year': year, 'country': ctr, 'stage': stage, **row})
+    if had_manifest:
+        nam_manifest.build_manifest(data_path)
+    return pd.DataFrame(records)
+
+
+def summarize(report: pd.DataFrame) -> pd.DataFrame:
+    """Totals per probe and stage with skipped shares in percent."""
+    summary = report.groupby(['probe', 'stage'], sort=False)[
+        ['row_groups', 'row_groups_skipped', 'bytes', 'bytes_skipped']
+    ].sum()
+    summary['row_groups_skipped_pct'] = 100 * summary['row_groups_skipped'] / summary['row_groups']
+    summary['bytes_skipped_pct'] = 100 * summary['bytes_skipped'] / summary['bytes']
+    return summary.reset_index()
+
+
+def main():
+    """Re-cluster data/parquet/ and report skipped row groups and bytes."""
+    print("FIGARO-NAM Parquet Re-clustering")
+    print("=" * 60)
+    print(f"Sort order: {', '.join(SORT_COLUMNS)}; row groups of {ROW_GROUP_SIZE:,} rows")
+
+    report = recluster()
+    if report.empty:
+        print(f"No partitions found under {DATA_PATH}")
+        return
+
+    print(f"\nRe-clustered {report[['year', 'country']].drop_duplicates().shape[0]} partitions")
+    print("\nSkippable by row-group statistics:")
+    for _, row in summarize(report).iterrows():
+        print(f"  {row['probe']:<28} {row['stage']:<7}"
+              f"{row['row_groups_skipped']:>8,} / {row['row_groups']:,} row groups "
+              f"({row['row_groups_skipped_pct']:.1f}%), "
+              f"{row['bytes_skipped'] / 1e6:,.1f} / {row['bytes'] / 1e6:,.1f} MB "
+              f"({row['bytes_skipped_pct']:.1f}%)")
+
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    report.to_csv(OUTPUT_PATH / 'recluster_report.csv', index=False)
+    print(f"\nSaved: {OUTPUT_PATH / 'recluster_report.csv'}")
+
+
+if __name__ == '__main__':
+    main()
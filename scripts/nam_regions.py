@@ -0,0 +1,73 @@
+"""Country groups (EU27, euro area, analysis regions) and their rollups.
+
+A region is a named list of FIGARO country codes in REGIONS. Its value for a
+metric and year is the sum over its members. Flows between members are
+included, so imports of 'EU27' include intra-EU imports. Regions are summed
+with one (regions x countries) 0/1 matrix product over the country rows of a
+panel. All years and metrics are done at once, so no loop runs over countries.
+
+A region is only rolled up when every member is present. A partial EU27 from
+a country subset is left out rather than reported as the EU27.
+
+Usage:
+    from nam_regions import REGIONS, region_rows, region_of
+
+    regions = region_rows(panel)                   # year, country=<region>, <metrics>
+    region_of('PT', ['SOUTH', 'NORTH'])            # 'SOUTH'
+"""
+
+import numpy as np
+import pandas as pd
+
+# Configuration
+EU27 = ['AT', 'BE', 'BG', 'CY', 'CZ', 'DE', 'DK', 'EE', 'ES', 'FI', 'FR', 'GR', 'HR', 'HU',
+        'IE', 'IT', 'LT', 'LU', 'LV', 'MT', 'NL', 'PL', 'PT', 'RO', 'SE', 'SI', 'SK']
+# Euro area in its 2023 composition, fixed for all years (as Eurostat's EA20)
+EA20 = ['AT', 'BE', 'CY', 'DE', 'EE', 'ES', 'FI', 'FR', 'GR', 'HR', 'IE', 'IT', 'LT', 'LU',
+        'LV', 'MT', 'NL', 'PT', 'SI', 'SK']
+REGIONS = {
+    'EU27': EU27,
+    'EA20': EA20,
+    # Hypothesis H_int (12_hypothesis_h_int.py)
+    'SOUTH': ['ES', 'IT', 'GR', 'PT'],
+    'NORTH': ['DE', 'AT', 'NL'],
+}
+
+
+def region_of(ctr: str, names=None, regions: dict = REGIONS):
+    """First of the named regions (default: all) that contains the country, else None."""
+    names = list(regions) if names is None else names
+    return next((name for name in names if ctr in regions[name]), None)
+
+
+def complete_regions(countries, regions: dict = REGIONS) -> dict:
+    """The regions whose members are all among the countries."""
+    present = set(countries)
+    return {name: list(members) for name, members in regions.items()
+            if set(members) <= present}
+
+
+def membership(countries, regions: dict = REGIONS):
+    """((regions x countries) 0/1 matrix, region names) for the complete regions."""
+    countries = list(countries)
+    regions = complete_regions(countries, regions)
+    position = {ctr: i for i, ctr in enumerate(countries)}
+    matrix = np.zeros((len(regions), len(countries)))
+    for row, members in enumerate(regions.values()):
+        matrix[row, [position[ctr] for ctr in members]] = 1.0
+    return matrix, list(regions)
+
+
+def region_rows(panel: pd.DataFrame, regions: dict = REGIONS) -> pd.DataFrame:
+    """Region totals of a (year, country, <metrics>) panel, in the same layout.
+
+    Rows are sorted by region (in REGIONS order) then year; country holds the
+    region name. Regions with a member missing from the panel are left out.
+    """
+    metrics = [column for column in panel.columns if column not in ('year', 'country')]
+    wide = panel.pivot(index='country', columns='year', values=metrics).fillna(0.0)
+    matrix, names = membership(wide.index, regions)
+    totals = pd.DataFrame(matrix @ wide.to_numpy(), index=pd.Index(names, name='country'),
+                          columns=wide.columns)
+    rows = totals.stack('year', future_stack=True).reset_index()
+    return rows[['year', 'country', *metrics]]
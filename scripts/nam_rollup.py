@@ -0,0 +1,149 @@
+"""Hierarchical rollups of product/industry codes via sparse aggregation operators.
+
+A grouping assigns each Set_i/Set_j code to at most one group: NACE sections
+(A-T), broad activity buckets (Services, Manufacturing, ...) or any custom
+mapping in GROUPINGS. For a list of code labels it compiles to a sparse
+(groups x codes) 0/1 matrix. The grouping is evaluated once per distinct
+code, never per row. Rolling a dimension up is then one sparse matrix
+product:
+
+    Series indexed by codes      matrix @ values
+    DataFrame (rows or columns)  matrix @ frame, or frame @ matrix.T
+    cube / ndarray axis          matrix @ array reshaped to (codes, -1)
+
+Codes outside the grouping (e.g. D/B/P account codes under 'nace_section')
+are left out of the result. NaN values count as 0, as in pandas sums.
+
+A grouping is a function code -> group (None to drop), or a dict of
+group -> code prefixes where the first matching group wins and '' matches
+everything. Both can be added to GROUPINGS or passed directly.
+
+Usage:
+    from nam_rollup import rollup, rollup_array
+
+    wages_by_section = rollup(wages_by_industry, 'nace_section')
+    sections = rollup(rollup(matrix, 'nace_section', axis=0), 'nace_section', axis=1)
+    broad, groups = rollup_array(cube.year(2019), cube.labels('Set_j'), 'broad_sector', axis=3)
+"""
+
+from functools import lru_cache
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+from nam_codes import nace_industry
+
+# Configuration
+# Broad activity buckets by NACE section letter (industries and their CPA products)
+BROAD_SECTORS = {
+    'Agriculture': 'A',
+    'Industry (excl. manufacturing)': 'BDE',
+    'Manufacturing': 'C',
+    'Construction': 'F',
+    'Services': 'GHIJKLMNOPQRST',
+}
+
+
+def nace_section(code: str):
+    """NACE section letter of an industry ('C29') or CPA product ('CPA_C29'); None otherwise."""
+    industry = nace_industry(code)
+    return None if industry is None else industry[0]
+
+
+def broad_sector(code: str):
+    """BROAD_SECTORS bucket of an industry or CPA product; None otherwise."""
+    section = nace_section(code)
+    return next((group for group, sections in BROAD_SECTORS.items()
+                 if section is not None and section in sections), None)
+
+
+GROUPINGS = {
+    'nace_section': nace_section,
+    'broad_sector': broad_sector,
+}
+
+
+def _definition(grouping):
+    """The definition of a grouping given by name or directly; KeyError if not configured."""
+    if isinstance(grouping, str):
+        if grouping not in GROUPINGS:
+            raise KeyError(f"Unknown grouping {grouping!r}; configured: {', '.join(GROUPINGS)}")
+        return GROUPINGS[grouping]
+    return grouping
+
+
+def _frozen(definition):
+    """Hashable form of a definition: the function itself, or its prefix rules as tuples."""
+    if callable(definition):
+        return definition
+    return tuple((group, tuple(prefixes)) for group, prefixes in definition.items())
+
+
+def _resolve(definition):
+    """The code -> group function and the group order (None = sorted) of a definition."""
+    if callable(definition):
+        return definition, None
+    rules = {group: tuple(prefixes) for group, prefixes in dict(definition).items()}
+
+    def assign(code):
+        return next((group for group, prefixes in rules.items()
+                     if any(code.startswith(prefix) for prefix in prefixes)), None)
+    return assign, list(rules)
+
+
+def _build_operator(codes: tuple, definition, name=None):
+    assign, order = _resolve(definition)
+    assigned = [assign(code) for code in codes]
+    used = {group for group in assigned if group is not None}
+    groups = [g for g in order if g in used] if order is not None else sorted(used)
+    position = {group: i for i, group in enumerate(groups)}
+    columns = [i for i, group in enumerate(assigned) if group is not None]
+    rows = [position[assigned[i]] for i in columns]
+    matrix = sp.csr_matrix((np.ones(len(columns)), (rows, columns)),
+                           shape=(len(groups), len(codes)))
+    return matrix, pd.Index(groups, name=name)
+
+
+_cached_operator = lru_cache(maxsize=256)(_build_operator)
+
+
+def aggregation_operator(codes, grouping):
+    """(sparse groups x codes matrix, group labels) rolling these codes up to the grouping.
+
+    Operators of configured groupings are cached per code list and current
+    definition, so redefining a GROUPINGS entry takes effect on the next call.
+    """
+    codes = tuple(str(code) for code in codes)
+    definition = _definition(grouping)
+    if isinstance(grouping, str):
+        return _cached_operator(codes, _frozen(definition), grouping)
+    return _build_operator(codes, definition)
+
+
+def _dense(values) -> np.ndarray:
+    values = np.asarray(values, dtype=np.float64)
+    return np.where(np.isnan(values), 0.0, values)
+
+
+def rollup(data, grouping, axis: int = 0):
+    """Sum a Series, or a DataFrame along axis, from code labels up to the grouping's groups."""
+    if isinstance(data, pd.Series):
+        matrix, groups = aggregation_operator(data.index, grouping)
+        return pd.Series(matrix @ _dense(data), index=groups, name=data.name)
+    if axis == 0:
+        matrix, groups = aggregation_operator(data.index, grouping)
+        return pd.DataFrame(matrix @ _dense(data), index=groups, columns=data.columns)
+    matrix, groups = aggregation_operator(data.columns, grouping)
+    return pd.DataFrame((matrix @ _dense(data).T).T, index=data.index, columns=groups)
+
+
+def rollup_array(array, codes, grouping, axis: int):
+    """Sum one axis of an ndarray (e.g. a cube year) from codes up to groups.
+
+    Returns (rolled array, group labels); the other axes keep their order.
+    """
+    matrix, groups = aggregation_operator(codes, grouping)
+    moved = np.moveaxis(_dense(array), axis, 0)
+    rolled = matrix @ moved.reshape(moved.shape[0], -1)
+    return np.moveaxis(rolled.reshape((len(groups),) + moved.shape[1:]), 0, axis), groups
@@ -0,0 +1,144 @@
+"""Shared-scan framework: read each partition once for many analyses.
+
+An analysis registers a `Consumer` with the partitions and columns it needs,
+an `on_partition(df, ctr, year)` step that reduces one country-year to a
+small partial result, and a `merge` step over the partials. `run` reads the
+union of the requested partitions exactly once each, on the `nam_parallel`
+process pool, and hands every frame to all consumers that asked for it;
+only partials leave the workers.
+
+The exploratory scripts (01, 02, 03, 05, 07, 08) each expose their consumers
+through `consumers()` and accept the merged results in `main(shared)`, so
+running them together costs one dataset scan instead of one per script:
+
+    python scripts/nam_scan.py
+
+Run on their own, the scripts keep their direct read paths (pushdown
+filters, cube, sidecars, lattice).
+
+Usage:
+    from nam_scan import Consumer, run
+
+    class Negatives(Consumer):
+        name = 'negatives'
+
+        def on_partition(self, df, ctr, year):
+            return df[df['value'] < 0]
+
+        def merge(self, partials):
+            return nam_parallel.concat_frames(partials.values())
+
+    results = run([Negatives()])          # {'negatives': DataFrame}
+"""
+
+import importlib
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+
+import nam_loader
+import nam_parallel
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+EXPLORATION_SCRIPTS = [
+    '01_data_quality', '02_top_flows', '03_temporal_analysis',
+    '05_baseline_trend', '07_negative_values', '08_io_linkages',
+]
+
+
+class Consumer:
+    """Per-partition analysis run by `run`; subclasses override the steps they need.
+
+    Consumers are pickled to the worker processes, so define them at module
+    level and keep their attributes small. `on_partition` must not modify
+    the frame, which is shared with the other consumers.
+    """
+
+    name = 'consumer'
+    columns = None  # columns needed; None = all (data and partition columns)
+
+    def partitions(self, available: list) -> list:
+        """(year, ctr) partitions to visit, chosen from those on disk (default: all)."""
+        return available
+
+    def on_partition(self, df, ctr: str, year: int):
+        """Partial result of one partition (runs in a worker)."""
+        raise NotImplementedError
+
+    def merge(self, partials: dict):
+        """Result from the partials, keyed (year, ctr) in partition order."""
+        return partials
+
+    def fill(self, partials: dict) -> dict:
+        """Partials of every partition asked for, in that order.
+
+        Partitions not on disk are reduced from an empty frame, as a direct
+        read of a missing partition returns one, so merged grids match the
+        scripts' standalone paths.
+        """
+        asked = self.partitions(list(partials))
+        return {
+            (year, ctr): partials[(year, ctr)] if (year, ctr) in partials
+            else self.on_partition(empty_partition(self.columns), ctr, year)
+            for year, ctr in asked
+        }
+
+
+def empty_partition(columns=None) -> pd.DataFrame:
+    """Frame of a partition that is not on disk: no rows, dictionary-encoded codes."""
+    schema = nam_loader.dataset_schema(categorical=True)
+    columns = nam_loader.ALL_COLUMNS if columns is None else columns
+    table = pa.schema([schema.field(c) for c in columns]).empty_table()
+    return nam_loader.to_pandas(table, categorical=True)
+
+
+def visit_partition(year: int, ctr: str, consumers=(), wanted=(), columns=None,
+                    data_path: Path = DATA_PATH) -> dict:
+    """Read one partition and call every consumer that wants it (worker task)."""
+    df = nam_loader.load_country_year(ctr, year, columns, data_path, categorical=True)
+    return {
+        k: consumer.on_partition(df, ctr, year)
+        for k, consumer in enumerate(consumers) if (year, ctr) in wanted[k]
+    }
+
+
+def run(consumers, data_path: Path = DATA_PATH, workers: int = None) -> dict:
+    """Run consumers over one shared scan; returns {consumer.name: merged result}."""
+    consumers = list(consumers)
+    names = [consumer.name for consumer in consumers]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Consumer names must be unique, got {names}")
+    available = nam_loader.list_partitions(data_path=data_path)
+    wanted = [set(consumer.partitions(available)) & set(available) for consumer in consumers]
+    partitions = [p for p in available if any(p in w for w in wanted)]
+    if any(consumer.columns is None for consumer in consumers):
+        columns = nam_loader.ALL_COLUMNS
+    else:
+        columns = [c for c in nam_loader.ALL_COLUMNS
+                   if any(c in consumer.columns for consumer in consumers)]
+
+    print(f"Shared scan: {len(partitions)} partitions for {len(consumers)} analyses")
+    visits = nam_parallel.map_partitions(visit_partition, partitions, workers,
+                                         consumers=consumers, wanted=wanted,
+                                         columns=columns, data_path=data_path)
+    return {
+        consumer.name: consumer.merge({
+            partition: visit[k] for partition, visit in zip(partitions, visits) if k in visit
+        })
+        for k, consumer in enumerate(consumers)
+    }
+
+
+def main():
+    """Run the exploratory scripts on one shared scan of data/parquet/."""
+    modules = [importlib.import_module(name) for name in EXPLORATION_SCRIPTS]
+    results = run([consumer for module in modules for consumer in module.consumers()])
+    for module in modules:
+        print(f"\n{'#' * 60}\n# {module.__name__}\n{'#' * 60}\n")
+        module.main(results)
+
+
+if __name__ == '__main__':
+    main()
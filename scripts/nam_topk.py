@@ -0,0 +1,143 @@
+"""Top-k flows over any slice of the dataset without a global sort.
+
+Each partition selects its k largest candidates with `np.argpartition`
+(linear time, no sort of the partition). The candidates go into a bounded
+min-heap of size k, one heap per group. Heaps from worker processes merge
+into the driver's heaps one partition at a time, in input order. Memory
+stays at k rows per group, whether one country-year is scanned or all 700.
+
+Flows are ranked by absolute value by default (`absolute=False` ranks the
+signed values), and ties keep the order the rows were seen in. Predicates
+take the loader's names and are pushed into the parquet scan.
+
+Usage:
+    python scripts/nam_topk.py            # top 100 flows across the dataset
+
+    from nam_topk import top_flows
+    top = top_flows(100)                                   # all country-years
+    per_partition = top_flows(5, by=['base', 'ctr'])       # top 5 per country per year
+    exports = top_flows(20, years=2019, set_j='P6', domestic=False)
+"""
+
+import heapq
+import itertools
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+import nam_loader
+import nam_parallel
+
+# Configuration
+DATA_PATH = nam_loader.DATA_PATH
+OUTPUT_PATH = Path('outputs/tables/')
+FLOW_COLUMNS = ['base', 'ctr', 'Set_i', 'm', 'Set_j', 'value']
+TOP_K = 100
+
+
+def select_top(scores, k: int) -> np.ndarray:
+    """Positions of the k largest scores, largest first (NaN ranks last, ties by position)."""
+    scores = np.asarray(scores, dtype=np.float64)
+    scores = np.where(np.isnan(scores), -np.inf, scores)
+    if k <= 0:
+        return np.array([], dtype=np.int64)
+    if k < len(scores):
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(len(scores))
+    return candidates[np.lexsort((candidates, -scores[candidates]))]
+
+
+class TopK:
+    """Bounded heaps of the k highest-scoring rows per group, mergeable across partitions."""
+
+    def __init__(self, k: int = TOP_K, by=None, absolute: bool = True):
+        self.k = k
+        self.by = [by] if isinstance(by, str) else list(by or [])
+        self.absolute = absolute
+        self.columns = None
+        self.heaps = {}
+        self._seen = itertools.count()
+
+    def _push(self, group, score: float, record: tuple):
+        # (score, -arrival) orders the heap; its root is the row to evict next
+        entry = (score, -next(self._seen), record)
+        heap = self.heaps.setdefault(group, [])
+        if len(heap) < self.k:
+            heapq.heappush(heap, entry)
+        elif entry[:2] > heap[0][:2]:
+            heapq.heapreplace(heap, entry)
+
+    def update(self, df: pd.DataFrame) -> 'TopK':
+        """Add a frame of flows (with a value column and the group columns)."""
+        if self.columns is None:
+            self.columns = list(df.columns)
+        groups = df.groupby(self.by, observed=True, sort=False) if self.by else [((), df)]
+        for group, rows in groups:
+            values = rows['value'].to_numpy(dtype=np.float64)
+            scores = np.abs(values) if self.absolute else values
+            top = select_top(scores, self.k)
+            records = rows[self.columns].iloc[top].itertuples(index=False, name=None)
+            group = group if isinstance(group, tuple) else (group,)
+            for score, record in zip(scores[top], records):
+                self._push(group, -np.inf if np.isnan(score) else float(score), record)
+        return self
+
+    def merge(self, other: 'TopK') -> 'TopK':
+        """Combine with another accumulator of the same k and grouping."""
+        if self.columns is None:
+            self.columns = other.columns
+        for group, heap in other.heaps.items():
+            for score, _, record in sorted(heap, reverse=True):
+                self._push(group, score, record)
+        return self
+
+    def result(self) -> pd.DataFrame:
+        """The top rows, by group and then by descending score."""
+        rows = [
+            record
+            for group in sorted(self.heaps)
+            for _, _, record in sorted(self.heaps[group], reverse=True)
+        ]
+        return pd.DataFrame(rows, columns=self.columns or FLOW_COLUMNS)
+
+
+def partition_top(year: int, ctr: str, k: int = TOP_K, by=None, absolute: bool = True,
+                  data_path: Path = DATA_PATH, predicates: dict = None) -> TopK:
+    """Top-k candidates of one partition (worker task)."""
+    df = nam_loader.load_country_year(ctr, year, nam_loader.DATA_COLUMNS, data_path,
+                                      categorical=True, **(predicates or {}))
+    df.insert(0, 'ctr', ctr)
+    df.insert(0, 'base', int(year))
+    return TopK(k, by, absolute).update(df[FLOW_COLUMNS])
+
+
+def top_flows(k: int = TOP_K, years=None, ctr=None, by=None, absolute: bool = True,
+              data_path: Path = DATA_PATH, workers: int = None, **predicates) -> pd.DataFrame:
+    """The k largest flows (per group of `by`, e.g. ['base', 'ctr']) over the selected partitions."""
+    result = TopK(k, by, absolute)
+    partitions = nam_loader.list_partitions(ctr, years, data_path)
+    for partial in nam_parallel.imap_partitions(partition_top, partitions, workers, k=k, by=by,
+                                                absolute=absolute, data_path=data_path,
+                                                predicates=predicates):
+        result.merge(partial)
+    top = result.result()
+    for column in nam_loader.CODE_COLUMNS:
+        top[column] = top[column].astype(str)
+    return top
+
+
+def main():
+    """Print and save the top flows across every partition under data/parquet/."""
+    print("FIGARO-NAM Top Flows (all country-years)")
+    print("=" * 60)
+    top = top_flows(TOP_K)
+    print(top.to_string(index=False))
+    OUTPUT_PATH.mkdir(parents=True, exist_ok=True)
+    top.to_csv(OUTPUT_PATH / 'top_flows_all.csv', index=False)
+    print(f"\nSaved: {OUTPUT_PATH / 'top_flows_all.csv'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+"""Shared fixtures: a small synthetic FIGARO-NAM dataset in the Hive layout."""
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+import pytest
+
+# Shared modules live next to the numbered scripts
+sys.path.insert(0, str(Path(__file__).parent.parent / 'scripts'))
+
+YEARS = [2018, 2019, 2020]
+COUNTRIES = ['AT', 'DE', 'FR']
+ROW_CODES = ['CPA_A01', 'CPA_C10-12', 'CPA_J62_63', 'D11', 'B2', 'D21X31']
+COL_CODES = ['A01', 'C10-C12', 'J62_J63', 'P3_S14', 'P3_S13', 'P51G', 'P6']
+
+
+def make_partition(year, ctr):
+    """Deterministic dense country-year block with a few negative values."""
+    rng = np.random.default_rng(year * 100 + COUNTRIES.index(ctr))
+    rows = [(i, m, j) for i in ROW_CODES for m in COUNTRIES for j in COL_CODES]
+    values = rng.uniform(0, 100, len(rows)).round(3)
+    values[::17] *= -1
+    return pd.DataFrame({
+        'Set_i': [r[0] for r in rows],
+        'm': [r[1] for r in rows],
+        'Set_j': [r[2] for r in rows],
+        'value': values,
+    })
+
+
+@pytest.fixture(scope='session')
+def nam_data(tmp_path_factory):
+    """Write the synthetic dataset once and return its root path."""
+    root = tmp_path_factory.mktemp('parquet')
+    for year in YEARS:
+        for ctr in COUNTRIES:
+            part = root / f'base={year}' / f'ctr={ctr}'
+            part.mkdir(parents=True)
+            table = pa.Table.from_pandas(make_partition(year, ctr), preserve_index=False)
+            pq.write_table(table, part / 'part-0.parquet')
+    return root
@@ -0,0 +1,72 @@
+"""Tests for the code registry."""
+import numpy as np
+import pandas as pd
+
+from nam_codes import (CODE_TYPES, CONCORDANCE, NACE_INDUSTRIES, SET_CODES, PARTNERS, CodeRegistry,
+                       align_products, code_type, code_type_ids, industry_positions,
+                       is_industry_code, sector_label, sector_labels)
+
+
+class TestRegistry:
+    """Test ids and attribute lookups."""
+
+    def test_seed_sizes(self):
+        assert len(SET_CODES) >= 181
+        assert len(PARTNERS) >= 50
+        assert SET_CODES.codes[0] == 'CPA_A01'
+
+    def test_ids_stable_after_extend(self):
+        registry = CodeRegistry(['B', 'A'])
+        assert registry.id('B') == 0
+        registry.extend(['Z', 'C', 'A'])
+        assert registry.codes == ['B', 'A', 'C', 'Z']
+        assert registry.id('A') == 1
+
+    def test_categorical_and_object_ids_agree(self):
+        values = pd.Series(['D11', 'CPA_C29', 'C29', 'D11'])
+        ids = SET_CODES.ids(values)
+        assert np.array_equal(ids, SET_CODES.ids(values.astype('category')))
+        assert ids[0] == ids[3] == SET_CODES.id('D11')
+
+    def test_lookup_matches_rule(self):
+        values = pd.Series(['CPA_A01', 'D11', 'B2', 'P3_S14', 'S14', 'N111G', 'C29'])
+        labels = SET_CODES.lookup(values, 'code_type')
+        assert list(labels) == [code_type(c) for c in values]
+        assert set(labels.categories) == set(labels)
+
+    def test_code_type_ids(self):
+        values = pd.Series(['CPA_A01', 'D11', 'B2', 'P3_S14', 'C29', 'D11']).astype('category')
+        ids = code_type_ids(values)
+        assert [CODE_TYPES[i] for i in ids] == [code_type(c) for c in values]
+
+    def test_mask_matches_rule(self):
+        values = pd.Series(['C10-C12', 'D35', 'D11', 'CPA_C29', 'P3_S14'])
+        mask = SET_CODES.mask(values, 'is_industry')
+        assert list(mask) == [is_industry_code(c) for c in values]
+
+    def test_unknown_code_classified(self):
+        registry = CodeRegistry([], {'is_industry': is_industry_code})
+        assert registry.mask(pd.Series(['Z99']), 'is_industry')[0]
+
+
+class TestConcordance:
+    """Test the CPA <-> NACE concordance and label gathers."""
+
+    def test_every_product_maps_to_its_industry(self):
+        positions = industry_positions(CONCORDANCE['product'])
+        assert positions.tolist() == list(range(len(NACE_INDUSTRIES)))
+        assert industry_positions(pd.Series(['CPA_C10-12', 'C10-C12', 'D11'])).tolist() == [4, 4, -1]
+
+    def test_labels_match_scalar(self):
+        values = pd.Series(['CPA_C10-12', 'J62_J63', 'D11', 'CPA_J62_63', 'ZZZ']).astype('category')
+        assert list(sector_labels(values)) == [sector_label(c) for c in values]
+        assert sector_label('ZZZ') == 'ZZZ'
+
+    def test_align_products(self):
+        matrix = pd.DataFrame([[1.0, 2.0, 5.0], [3.0, np.nan, 6.0], [7.0, 8.0, 9.0]],
+                              index=['CPA_C29', 'CPA_A01', 'D11'], columns=['A01', 'C29', 'P3_S14'])
+        square = align_products(matrix)
+        assert square.shape == (len(NACE_INDUSTRIES), len(NACE_INDUSTRIES))
+        assert list(square.index) == list(square.columns) == NACE_INDUSTRIES
+        assert square.loc[['A01', 'C29'], ['A01', 'C29']].to_numpy().tolist() == [[3.0, 0.0], [1.0, 2.0]]
+        assert square.to_numpy().sum() == 6.0
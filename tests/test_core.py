@@ -2,14 +2,10 @@
 import pytest
 import pandas as pd
 
+from nam_codes import SECTOR_LABELS as SECTOR_NAMES, sector_label as get_sector_name
 
-# Inline reimplementation of key functions for testing (avoids import issues)
-SECTOR_NAMES = {
-    'C29': 'Motor vehicles',
-    'C20': 'Chemicals',
-    'I': 'Accommodation and food services',
-}
 
+# Inline reimplementation of key functions for testing (avoids import issues)
 HICP_DATA = {
     'DE': [107.4, 107.9, 111.3, 120.3, 127.5],
     'AT': [108.4, 109.9, 113.0, 122.5, 131.8],
@@ -17,16 +13,6 @@ HICP_DATA = {
 HICP_YEARS = [2019, 2020, 2021, 2022, 2023]
 
 
-def get_sector_name(code):
-    """Get English label for sector code."""
-    if code in SECTOR_NAMES:
-        return SECTOR_NAMES[code]
-    clean_code = code.replace('CPA_', '').replace('_', '-')
-    if clean_code in SECTOR_NAMES:
-        return SECTOR_NAMES[clean_code]
-    return code
-
-
 def get_hicp_deflator(country, year):
     """Get HICP index for deflation (2019=100 base)."""
     if country not in HICP_DATA or year not in HICP_YEARS:
@@ -45,6 +31,13 @@ class TestSectorNames:
     def test_cpa_prefix(self):
         assert get_sector_name('CPA_C29') == 'Motor vehicles'
 
+    def test_grouped_product_spellings(self):
+        assert get_sector_name('CPA_C10-12') == get_sector_name('C10-C12') == 'Food products'
+        assert get_sector_name('CPA_J62_63') == get_sector_name('J62_J63') == 'IT services'
+
+    def test_account_code(self):
+        assert get_sector_name('P3_S14') == 'Household consumption'
+
     def test_unknown_code(self):
         assert get_sector_name('UNKNOWN') == 'UNKNOWN'
 
@@ -0,0 +1,61 @@
+"""Tests for the memory-mapped NAM cube."""
+import os
+
+import numpy as np
+import pytest
+
+import nam_cube
+from tests.conftest import make_partition
+
+
+@pytest.fixture(scope='module')
+def cube(nam_data, tmp_path_factory):
+    return nam_cube.build_cube(nam_data, tmp_path_factory.mktemp('cube'))
+
+
+class TestCube:
+    """Test cube construction and label selection."""
+
+    def test_axes_and_shape(self, cube):
+        assert cube.axes['year'] == [2018, 2019, 2020]
+        assert cube.axes['ctr'] == ['AT', 'DE', 'FR']
+        assert cube.axes['Set_i'][:3] == ['CPA_A01', 'CPA_C10-12', 'CPA_J62_63']
+        assert cube.year(2019).shape == (3, 6, 3, 7)
+
+    def test_scalar_selection_is_view(self, cube):
+        row = cube[2019, 'DE', 'D11', 'DE', :]
+        assert isinstance(row, np.memmap) or row.base is not None
+        ref = make_partition(2019, 'DE')
+        ref = ref[(ref['Set_i'] == 'D11') & (ref['m'] == 'DE')].set_index('Set_j')['value']
+        assert np.allclose(row, ref[cube.axes['Set_j']].to_numpy())
+
+    def test_aggregate_matches_pandas(self, cube):
+        ref = make_partition(2020, 'AT')
+        foreign = ref[ref['Set_i'].str.startswith('CPA_') & (ref['m'] != 'AT')]['value'].sum()
+        products = cube.select('Set_i', 'is_product')
+        assert cube.aggregate(2020, 'AT', set_i=products, domestic=False) == pytest.approx(foreign)
+        hh = ref[(ref['Set_j'] == 'P3_S14') & (ref['m'] == 'AT')]['value'].sum()
+        assert cube.aggregate(2020, 'AT', set_j='P3_S14', domestic=True) == pytest.approx(hh)
+        assert cube.aggregate(2020, 'AT', set_i='D12', domestic=True) == 0.0
+
+    def test_list_selection_is_outer(self, cube):
+        block = cube[2018, 'FR', ['D11', 'B2'], :, ['P6', 'A01']]
+        assert block.shape == (2, 3, 2)
+
+    def test_time_series_row(self, cube):
+        row = nam_cube.time_series_row(cube, 2019, 'FR')
+        ref = make_partition(2019, 'FR')
+        wages = ref[(ref['Set_i'] == 'D11') & (ref['m'] == 'FR')]['value'].sum()
+        assert list(row)[:2] == ['year', 'country']
+        assert row['wages_D11'] == pytest.approx(wages)
+
+    def test_staleness(self, nam_data, cube):
+        assert nam_cube.open_cube(cube.path, nam_data) is not None
+        path = nam_data / 'base=2018' / 'ctr=AT' / 'part-0.parquet'
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        try:
+            assert cube.is_stale(nam_data)
+            assert nam_cube.open_cube(cube.path, nam_data) is None
+        finally:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
@@ -0,0 +1,66 @@
+"""Tests for the pluggable dataframe engines."""
+import pandas as pd
+import pytest
+
+import nam_engine
+import nam_loader
+from nam_metrics import compute_metrics
+
+PARTITIONS = [(2018, 'AT'), (2019, 'DE'), (2020, 'FR'), (2019, 'XX')]
+
+
+def engines():
+    """The pandas engine, plus Polars when it is installed."""
+    return [nam_engine.PandasEngine()] + ([nam_engine.PolarsEngine()] if nam_engine.pl else [])
+
+
+class TestEngines:
+    """Test both engines against direct pandas computations."""
+
+    @pytest.mark.parametrize('engine', engines(), ids=lambda engine: engine.name)
+    def test_metric_rows(self, nam_data, engine):
+        rows = engine.metric_rows(PARTITIONS, nam_data)
+        assert [(row['year'], row['country']) for row in rows] == PARTITIONS
+        for (year, ctr), row in zip(PARTITIONS, rows):
+            df = nam_loader.load_country_year(ctr, year, data_path=nam_data)
+            for name, value in compute_metrics(df, ctr).items():
+                assert row[name] == pytest.approx(value)
+
+    @pytest.mark.parametrize('engine', engines(), ids=lambda engine: engine.name)
+    def test_group_sum(self, nam_data, engine):
+        result = engine.group_sum(['ctr', 'Set_j'], years=[2018, 2020], data_path=nam_data,
+                                  set_i_prefix='CPA_', domestic=False)
+        df = nam_loader.load(years=[2018, 2020], data_path=nam_data)
+        df = df[df['Set_i'].str.startswith('CPA_') & (df['m'] != df['ctr'])]
+        expected = df.groupby(['ctr', 'Set_j'])['value'].sum()
+        pd.testing.assert_series_equal(result, expected)
+
+    @pytest.mark.skipif(nam_engine.pl is None, reason='polars is not installed')
+    def test_engines_agree(self, nam_data):
+        pandas_engine, polars_engine = nam_engine.PandasEngine(), nam_engine.PolarsEngine()
+        keys = ['base', 'Set_j']
+        pd.testing.assert_series_equal(
+            polars_engine.group_sum(keys, data_path=nam_data, set_i='D11'),
+            pandas_engine.group_sum(keys, data_path=nam_data, set_i='D11'))
+        order = ['ctr', 'Set_i', 'm', 'Set_j']
+        pd.testing.assert_frame_equal(
+            polars_engine.load(years=2019, data_path=nam_data).sort_values(order, ignore_index=True),
+            pandas_engine.load(years=2019, data_path=nam_data).sort_values(order, ignore_index=True))
+
+
+class TestEngineSelection:
+    """Test engine selection from the command line and environment."""
+
+    def test_flag_overrides_environment(self, monkeypatch):
+        monkeypatch.setenv('NAM_ENGINE', 'polars')
+        assert nam_engine.engine_name(['--engine', 'pandas']) == 'pandas'
+        assert nam_engine.engine_name(['--engine=pandas']) == 'pandas'
+        assert nam_engine.engine_name([]) == 'polars'
+        monkeypatch.delenv('NAM_ENGINE')
+        assert nam_engine.engine_name([]) == 'pandas'
+
+    def test_fallback_without_polars(self, monkeypatch):
+        monkeypatch.setattr(nam_engine, 'pl', None)
+        assert nam_engine.get_engine('polars').name == 'pandas'
+        with pytest.raises(ValueError):
+            nam_engine.get_engine('spark')
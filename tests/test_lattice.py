@@ -0,0 +1,58 @@
+"""Tests for the materialised aggregate lattice."""
+import pandas as pd
+import pytest
+
+import nam_lattice
+from nam_query import FigaroDataset
+
+
+@pytest.fixture(scope='module')
+def lattice_path(nam_data, tmp_path_factory):
+    path = tmp_path_factory.mktemp('lattice')
+    nam_lattice.build_lattice(nam_data, path, budget_rows=10**6, workers=1)
+    return path
+
+
+class TestLattice:
+    """Test view selection, the budget and answers against raw scans."""
+
+    def test_views_cover(self):
+        assert nam_lattice.covers(('Set_i', 'm'), {'Set_i', 'origin'})
+        assert not nam_lattice.covers(('Set_i', 'origin'), {'m'})
+        assert nam_lattice.needed_dims(['ctr', 'Set_j'], {'set_i': 'D11', 'domestic': True}) == \
+            {'Set_i', 'Set_j', 'origin'}
+        assert nam_lattice.needed_dims([], {'filter': None, 'set_j': 'P6'}) == {'Set_j'}
+
+    def test_budget_limits_selection(self, nam_data):
+        raw_rows, sizes = nam_lattice.estimate_sizes(nam_data)
+        chosen = nam_lattice.select_views(sizes, raw_rows, budget_rows=raw_rows // 10)
+        assert chosen and sum(sizes[name] for name in chosen) <= raw_rows // 10
+        assert nam_lattice.select_views(sizes, raw_rows, budget_rows=0) == []
+        assert set(nam_lattice.select_views(sizes, raw_rows, budget_rows=raw_rows * 3)) == set(sizes)
+
+    @pytest.mark.parametrize('keys, predicates', [
+        ((), {'set_i': 'D11', 'domestic': True}),
+        (('ctr', 'Set_j'), {'set_i': 'D11', 'domestic': True}),
+        (('base',), {'set_i_prefix': 'CPA_', 'domestic': False}),
+        (('m',), {'set_j': ['P6', 'P3_S14'], 'years': [2018, 2020], 'ctr': 'FR'}),
+    ])
+    def test_answers_match_scan(self, nam_data, lattice_path, keys, predicates):
+        with_views = FigaroDataset(nam_data, lattice_path=lattice_path).query(**predicates)
+        scan = FigaroDataset(nam_data, lattice_path=None).query(**predicates)
+        assert with_views.view(keys) is not None and scan.view(keys) is None
+        if keys:
+            pd.testing.assert_series_equal(with_views.group_by(*keys).sum(), scan.group_by(*keys).sum())
+        else:
+            assert with_views.sum() == pytest.approx(scan.sum())
+
+    def test_smallest_view_and_fallback(self, nam_data, lattice_path):
+        lattice = nam_lattice.open_lattice(lattice_path, nam_data)
+        assert lattice.choose(['Set_j'], {'domestic': True}) == 'Set_j+origin'
+        assert lattice.choose([], {'m': 'DE'}) == 'm'
+        assert lattice.choose([], {'set_i': 'D11', 'set_j': 'P6', 'm': 'DE'}) is None
+        assert lattice.answer(set_i='D11', set_j='P6', m='DE') is None
+
+    def test_stale_lattice_ignored(self, nam_data, lattice_path, tmp_path):
+        assert nam_lattice.open_lattice(tmp_path, nam_data) is None
+        other = FigaroDataset(tmp_path, lattice_path=lattice_path)
+        assert other.lattice is None
@@ -0,0 +1,59 @@
+"""Tests for the batched Leontief-inverse engine."""
+import os
+
+import numpy as np
+
+import nam_leontief
+import nam_loader
+from nam_codes import NACE_INDUSTRIES, nace_industry
+
+
+def direct_inverse(data_path, year, ctr):
+    """Technical coefficients and inverse of one country-year, computed with pandas and inv."""
+    df = nam_loader.load_country_year(ctr, year, data_path=data_path)
+    industry = df[df['Set_j'].isin(NACE_INDUSTRIES)]
+    output = industry.groupby('Set_j')['value'].sum().reindex(NACE_INDUSTRIES, fill_value=0.0)
+    flows = industry[industry['Set_i'].str.startswith('CPA_') & (industry['m'] == ctr)]
+    flows = flows.assign(row=flows['Set_i'].map(nace_industry))
+    z = flows.pivot_table(index='row', columns='Set_j', values='value', aggfunc='sum')
+    z = z.reindex(index=NACE_INDUSTRIES, columns=NACE_INDUSTRIES, fill_value=0.0).fillna(0.0)
+    a = z.to_numpy() / np.where(output > 0, output, 1.0)
+    a[:, output.to_numpy() <= 0] = 0.0
+    return a, np.linalg.inv(np.eye(len(NACE_INDUSTRIES)) - a)
+
+
+class TestLeontief:
+    """Test the batched inverses against per-matrix computations."""
+
+    def test_matches_direct_inverse(self, nam_data):
+        leontief = nam_leontief.build_leontief(data_path=nam_data, cache_path=None, workers=2)
+        assert leontief.inverses.shape == (9, len(NACE_INDUSTRIES), len(NACE_INDUSTRIES))
+        for year, ctr in [(2018, 'AT'), (2020, 'FR')]:
+            a, inverse = direct_inverse(nam_data, year, ctr)
+            np.testing.assert_allclose(leontief.technical(year, ctr).to_numpy(), a, atol=1e-12)
+            np.testing.assert_allclose(leontief.inverse(year, ctr).to_numpy(), inverse, atol=1e-12)
+        multipliers = leontief.multipliers()
+        de = multipliers[(multipliers['year'] == 2019) & (multipliers['country'] == 'DE')]
+        expected = direct_inverse(nam_data, 2019, 'DE')[1].sum(axis=0)
+        np.testing.assert_allclose(de['multiplier'], expected)
+
+    def test_singular_matrix_gets_nan(self):
+        coefficients = np.stack([np.full((2, 2), 0.1), np.eye(2)])
+        inverse = nam_leontief.leontief_inverse(coefficients)
+        np.testing.assert_allclose(inverse[0], np.linalg.inv(np.eye(2) - coefficients[0]))
+        assert np.isnan(inverse[1]).all()
+
+    def test_cache_roundtrip_and_staleness(self, nam_data, tmp_path):
+        built = nam_leontief.build_leontief(data_path=nam_data, cache_path=tmp_path, workers=1)
+        cached = nam_leontief.open_leontief(tmp_path, nam_data)
+        assert cached.partitions == built.partitions
+        np.testing.assert_array_equal(cached.inverses, built.inverses)
+
+        source = nam_loader.partition_path('DE', 2019, nam_data)
+        stat = source.stat()
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        try:
+            assert nam_leontief.open_leontief(tmp_path, nam_data) is None
+        finally:
+            os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert nam_leontief.open_leontief(tmp_path / 'missing', nam_data) is None
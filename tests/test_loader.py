@@ -0,0 +1,103 @@
+"""Tests for the shared partition-aware loader."""
+import pandas as pd
+import pyarrow.compute as pc
+
+import nam_loader
+from tests.conftest import make_partition
+
+
+class TestPartitions:
+    """Test partition resolution."""
+
+    def test_list_all(self, nam_data):
+        assert len(nam_loader.list_partitions(data_path=nam_data)) == 9
+
+    def test_missing_partition_skipped(self, nam_data):
+        parts = nam_loader.list_partitions(['DE', 'XX'], [2019, 2030], data_path=nam_data)
+        assert parts == [(2019, 'DE')]
+
+    def test_missing_partition_empty_frame(self, nam_data):
+        df = nam_loader.load_country_year('XX', 2019, data_path=nam_data)
+        assert df.empty
+        assert list(df.columns) == nam_loader.DATA_COLUMNS
+
+
+class TestPushdown:
+    """Test predicates and projection against a pandas reference."""
+
+    def test_projection(self, nam_data):
+        df = nam_loader.load_country_year('DE', 2019, columns=['Set_j', 'value'], data_path=nam_data)
+        assert list(df.columns) == ['Set_j', 'value']
+        assert len(df) == len(make_partition(2019, 'DE'))
+
+    def test_domestic_code_filter(self, nam_data):
+        ref = make_partition(2019, 'DE')
+        ref = ref[(ref['Set_i'] == 'D11') & (ref['m'] == 'DE')]
+        df = nam_loader.load_country_year('DE', 2019, set_i='D11', domestic=True, data_path=nam_data)
+        assert len(df) == len(ref)
+        assert abs(df['value'].sum() - ref['value'].sum()) < 1e-9
+
+    def test_prefix_foreign_filter(self, nam_data):
+        ref = make_partition(2020, 'AT')
+        ref = ref[ref['Set_i'].str.startswith('CPA_') & (ref['m'] != 'AT')]
+        df = nam_loader.load_country_year('AT', 2020, set_i_prefix='CPA_', domestic=False,
+                                          data_path=nam_data)
+        assert abs(df['value'].sum() - ref['value'].sum()) < 1e-9
+
+    def test_multi_partition_with_extra_filter(self, nam_data):
+        df = nam_loader.load(ctr=['AT', 'FR'], years=[2018, 2019], m='DE',
+                             filter=pc.field('value') < 0, data_path=nam_data)
+        assert set(df['ctr']) <= {'AT', 'FR'}
+        assert (df['m'] == 'DE').all()
+        assert (df['value'] < 0).all()
+
+
+class TestCategorical:
+    """Test dictionary-encoded loading and the code helpers."""
+
+    def test_code_columns_are_categorical(self, nam_data):
+        df = nam_loader.load(years=2019, data_path=nam_data, categorical=True)
+        for column in nam_loader.CODE_COLUMNS + nam_loader.PARTITION_COLUMNS:
+            assert isinstance(df[column].dtype, pd.CategoricalDtype)
+        assert list(df['Set_i'].cat.categories) == sorted(df['Set_i'].unique())
+
+    def test_filtered_categories_drop_unused(self, nam_data):
+        df = nam_loader.load_country_year('DE', 2019, set_i='D11', data_path=nam_data,
+                                          categorical=True)
+        assert list(df['Set_i'].cat.categories) == ['D11']
+
+    def test_helpers_match_string_semantics(self, nam_data):
+        cat = nam_loader.load(years=2020, data_path=nam_data, categorical=True)
+        obj = nam_loader.load(years=2020, data_path=nam_data)
+        assert (nam_loader.code_startswith(cat['Set_i'], 'CPA_') == obj['Set_i'].str.startswith('CPA_')).all()
+        assert (nam_loader.code_match(cat['Set_j'], r'^[A-T]') == obj['Set_j'].str.match(r'^[A-T]')).all()
+        assert (nam_loader.codes_equal(cat['m'], cat['ctr']) == (obj['m'] == obj['ctr'])).all()
+        mapped = nam_loader.map_codes(cat['Set_i'], lambda c: c[:1])
+        assert (mapped.astype(str) == obj['Set_i'].str[:1]).all()
+
+
+class TestReadAhead:
+    """Test the concurrent partition iterator."""
+
+    def test_order_and_missing(self, nam_data):
+        keys = [(2020, 'FR'), (2018, 'XX'), (2019, 'AT'), (2018, 'DE')]
+        frames = list(nam_loader.iter_partitions(keys, data_path=nam_data, read_ahead=2, set_i='D11'))
+        assert [key for key, _ in frames] == keys
+        assert frames[1][1].empty
+        ref = make_partition(2019, 'AT')
+        assert frames[2][1]['value'].sum() == ref[ref['Set_i'] == 'D11']['value'].sum()
+
+    def test_in_flight_bounded(self, nam_data, monkeypatch):
+        loaded = []
+        original = nam_loader.load_country_year
+
+        def tracking(ctr, year, *args, **kwargs):
+            loaded.append((year, ctr))
+            return original(ctr, year, *args, **kwargs)
+
+        monkeypatch.setattr(nam_loader, 'load_country_year', tracking)
+        keys = [(y, c) for y in (2018, 2019, 2020) for c in ('AT', 'DE', 'FR')]
+        frames = nam_loader.iter_partitions(keys, data_path=nam_data, read_ahead=3)
+        next(frames)
+        assert len(loaded) <= 4
+        frames.close()
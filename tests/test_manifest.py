@@ -0,0 +1,58 @@
+"""Tests for the dataset manifest and `_metadata` summary."""
+import os
+import shutil
+
+import pytest
+
+import nam_loader
+import nam_manifest
+from tests.conftest import make_partition
+
+
+@pytest.fixture
+def manifested(nam_data, tmp_path):
+    root = tmp_path / 'parquet'
+    shutil.copytree(nam_data, root)
+    nam_manifest.build_manifest(root)
+    return root
+
+
+class TestManifest:
+    """Test manifest contents, discovery and staleness."""
+
+    def test_index_contents(self, manifested):
+        manifest = nam_loader.read_manifest(manifested)
+        assert len(manifest['partitions']) == 9
+        assert manifest['rows'] == 9 * len(make_partition(2019, 'DE'))
+        assert (manifested / nam_loader.METADATA_FILE).exists()
+        assert (manifested / nam_loader.COMMON_METADATA_FILE).exists()
+        assert nam_manifest.verify_manifest(manifested) == []
+
+    def test_discovery_matches_directory_walk(self, manifested):
+        for ctr, years in ((None, None), ('DE', None), (None, [2020, 2018]), (['FR', 'XX'], 2019)):
+            assert (nam_loader.list_partitions(ctr, years, manifested)
+                    == nam_loader.list_partitions(ctr, years, manifested, use_manifest=False))
+
+    def test_summary_scan_matches_files(self, manifested, nam_data):
+        fragments = nam_loader._summary_fragments([(2019, 'AT'), (2020, 'FR')], manifested,
+                                                  nam_loader.PARQUET_FORMAT)
+        assert len(fragments) == 2
+        for categorical in (False, True):
+            df = nam_loader.load(ctr='AT', data_path=manifested, categorical=categorical,
+                                 set_i='D11')
+            ref = nam_loader.load(ctr='AT', data_path=nam_data, set_i='D11')
+            assert len(df) == len(ref)
+            assert df['value'].sum() == pytest.approx(ref['value'].sum())
+
+    def test_rewritten_file_bypasses_summary(self, manifested):
+        path = nam_loader.partition_path('DE', 2019, manifested)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        assert nam_loader._summary_fragments([(2019, 'DE')], manifested,
+                                             nam_loader.PARQUET_FORMAT) is None
+        assert len(nam_loader.load(ctr='DE', data_path=manifested)) == 3 * len(make_partition(2019, 'DE'))
+
+    def test_new_partition_makes_manifest_stale(self, manifested):
+        shutil.copytree(manifested / 'base=2019' / 'ctr=DE', manifested / 'base=2019' / 'ctr=IT')
+        assert nam_loader.read_manifest(manifested) is None
+        assert (2019, 'IT') in nam_loader.list_partitions(data_path=manifested)
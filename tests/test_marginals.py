@@ -0,0 +1,54 @@
+"""Tests for the per-partition marginals sidecar."""
+import os
+import shutil
+
+import pytest
+
+import nam_loader
+import nam_marginals
+
+
+@pytest.fixture(scope='module')
+def with_sidecars(nam_data, tmp_path_factory):
+    root = tmp_path_factory.mktemp('marginals') / 'parquet'
+    shutil.copytree(nam_data, root)
+    nam_marginals.build_sidecars(root, workers=1)
+    return root
+
+
+class TestMarginals:
+    """Test sidecar totals against direct sums and the staleness check."""
+
+    @pytest.mark.parametrize('spec', [
+        {'set_i': 'D11', 'domestic': True},
+        {'set_j': ['P3_S14', 'P6'], 'domestic': False},
+        {'set_i_prefix': 'CPA_', 'domestic': False},
+        {'m': 'FR'},
+        {},
+    ])
+    def test_aggregate_matches_parquet(self, with_sidecars, spec):
+        marginals = nam_marginals.read_marginals('DE', 2019, with_sidecars)
+        df = nam_loader.load_country_year('DE', 2019, data_path=with_sidecars, **spec)
+        assert nam_marginals.aggregate(marginals, **spec) == pytest.approx(df['value'].sum())
+
+    def test_two_axes_rejected(self, with_sidecars):
+        marginals = nam_marginals.read_marginals('DE', 2019, with_sidecars)
+        with pytest.raises(ValueError):
+            nam_marginals.aggregate(marginals, set_i='D11', set_j='P6')
+
+    def test_sidecar_invisible_to_loader(self, with_sidecars, nam_data):
+        assert nam_loader.list_partitions(data_path=with_sidecars) == \
+            nam_loader.list_partitions(data_path=nam_data)
+        assert len(nam_loader.load(data_path=with_sidecars)) == len(nam_loader.load(data_path=nam_data))
+
+    def test_rewritten_source_is_stale(self, with_sidecars, nam_data):
+        path = nam_loader.partition_path('AT', 2020, with_sidecars)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        try:
+            assert nam_marginals.read_marginals('AT', 2020, with_sidecars) is None
+            assert nam_marginals.time_series_row(2020, 'AT', with_sidecars) is None
+        finally:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        assert nam_marginals.time_series_row(2020, 'AT', with_sidecars)['year'] == 2020
+        assert nam_marginals.read_marginals('AT', 2020, nam_data) is None
@@ -0,0 +1,50 @@
+"""Tests for the fused multi-metric aggregation kernel."""
+import numpy as np
+import pytest
+
+import nam_loader
+import nam_metrics
+
+METRICS = {
+    **nam_metrics.TIME_SERIES_METRICS,
+    'exports_any': {'set_j': 'P6'},
+    'foreign_wages': {'set_i': ['D11', 'B2'], 'domestic': False},
+    'industry_products': {'set_i_prefix': 'CPA_', 'set_j_prefix': ('A', 'C')},
+    'from_fr': {'m': 'FR', 'set_j': 'P3_S14'},
+    'all': {},
+}
+
+
+def masked_sum(df, ctr, spec):
+    mask = np.ones(len(df), dtype=bool)
+    for column, key, prefix in [('Set_i', 'set_i', 'set_i_prefix'), ('Set_j', 'set_j', 'set_j_prefix')]:
+        if key in spec:
+            mask &= df[column].astype(str).isin(nam_loader._as_list(spec[key]))
+        if prefix in spec:
+            mask &= df[column].astype(str).str.startswith(spec[prefix])
+    if 'm' in spec:
+        mask &= df['m'].astype(str) == spec['m']
+    if 'domestic' in spec:
+        mask &= (df['m'].astype(str) == ctr) == spec['domestic']
+    return df.loc[mask, 'value'].sum()
+
+
+class TestComputeMetrics:
+    """Test the single-scan kernel against one mask per metric."""
+
+    @pytest.mark.parametrize('categorical', [False, True])
+    def test_matches_masks(self, nam_data, categorical):
+        df = nam_loader.load_country_year('DE', 2019, data_path=nam_data, categorical=categorical)
+        result = nam_metrics.compute_metrics(df, 'DE', METRICS)
+        assert list(result) == list(METRICS)
+        for name, spec in METRICS.items():
+            assert result[name] == pytest.approx(masked_sum(df, 'DE', spec)), name
+
+    def test_empty_partition(self, nam_data):
+        df = nam_loader.load_country_year('DE', 1990, data_path=nam_data)
+        assert nam_metrics.compute_metrics(df, 'DE') == dict.fromkeys(nam_metrics.TIME_SERIES_METRICS, 0.0)
+
+    def test_too_many_metrics(self, nam_data):
+        df = nam_loader.load_country_year('DE', 2019, data_path=nam_data)
+        with pytest.raises(ValueError):
+            nam_metrics.compute_metrics(df, 'DE', {f'm{k}': {} for k in range(65)})
@@ -0,0 +1,51 @@
+"""Tests for the partner-clustered mirror."""
+import os
+import shutil
+
+import pytest
+
+import nam_loader
+import nam_mirror
+
+KEYS = ['ctr', 'Set_i', 'Set_j']
+
+
+@pytest.fixture(scope='module')
+def mirrored(nam_data, tmp_path_factory):
+    root = tmp_path_factory.mktemp('mirror') / 'parquet'
+    shutil.copytree(nam_data, root)
+    nam_mirror.build_mirror(root)
+    return root
+
+
+def exports(data_path, categorical=False, **predicates):
+    df = nam_loader.load(ctr=['AT', 'FR'], years=2019, columns=nam_loader.DATA_COLUMNS + ['ctr'],
+                         m='DE', data_path=data_path, categorical=categorical, **predicates)
+    return df.astype({c: str for c in KEYS + ['m']}).sort_values(KEYS).reset_index(drop=True)
+
+
+class TestMirror:
+    """Test mirror layout and automatic selection."""
+
+    def test_layout(self, mirrored):
+        path = nam_loader.mirror_partition_path('DE', 2019, mirrored)
+        assert path.exists()
+        assert nam_loader.mirror_path(mirrored).name == 'parquet_by_m'
+
+    @pytest.mark.parametrize('categorical', [False, True])
+    def test_export_query_uses_mirror(self, mirrored, nam_data, categorical):
+        assert nam_loader._mirror_scan(['AT', 'FR'], 2019, mirrored, categorical, {'m': 'DE'})
+        assert exports(mirrored, categorical).equals(exports(nam_data))
+        assert exports(mirrored, categorical, set_i='D11').equals(exports(nam_data, set_i='D11'))
+
+    def test_single_country_stays_on_primary(self, mirrored):
+        assert nam_loader._mirror_scan('AT', 2019, mirrored, False, {'m': 'DE'}) is None
+
+    def test_changed_source_falls_back(self, mirrored):
+        path = nam_loader.partition_path('FR', 2019, mirrored)
+        stat = path.stat()
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        try:
+            assert nam_loader._mirror_scan(['AT', 'FR'], 2019, mirrored, False, {'m': 'DE'}) is None
+        finally:
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
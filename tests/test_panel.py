@@ -0,0 +1,92 @@
+"""Tests for the all-countries time-series panel."""
+import os
+import shutil
+
+import pytest
+
+import nam_loader
+import nam_metrics
+import nam_panel
+import nam_regions
+
+
+@pytest.fixture(scope='module')
+def panel_data(nam_data, tmp_path_factory):
+    root = tmp_path_factory.mktemp('panel') / 'parquet'
+    shutil.copytree(nam_data, root)
+    return root
+
+
+class TestPanel:
+    """Test panel contents, per-country slices and staleness."""
+
+    def test_grid_matches_partition_kernel(self, panel_data):
+        panel = nam_panel.build_panel(data_path=panel_data, workers=2)
+        assert list(panel.columns) == ['year', 'country', *nam_metrics.TIME_SERIES_METRICS]
+        assert len(panel) == 3 * 3
+        fr = nam_panel.country_series(panel, 'FR')
+        assert fr['year'].tolist() == [2018, 2019, 2020]
+        df = nam_loader.load_country_year('FR', 2019, data_path=panel_data)
+        expected = nam_metrics.compute_metrics(df, 'FR')
+        row = fr[fr['year'] == 2019].iloc[0]
+        for name, value in expected.items():
+            assert row[name] == pytest.approx(value)
+
+    def test_roundtrip_and_staleness(self, panel_data, tmp_path):
+        panel = nam_panel.build_panel(years=[2018, 2019], countries=['AT'],
+                                      data_path=panel_data, workers=1)
+        path = nam_panel.write_panel(panel, tmp_path / 'panel.parquet', panel_data)
+        loaded = nam_panel.load_panel(path, panel_data)
+        assert loaded.equals(panel)
+        assert nam_panel.load_panel(path, panel_data, metrics={'all': {}}) is None
+
+        source = nam_loader.partition_path('DE', 2020, panel_data)
+        stat = source.stat()
+        os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        try:
+            assert nam_panel.load_panel(path, panel_data) is None
+        finally:
+            os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+    def test_custom_metrics(self, panel_data):
+        metrics = {'exports': {'set_j': 'P6'}, 'foreign_wages': {'set_i': 'D11', 'set_j_prefix': 'A'}}
+        panel = nam_panel.build_panel(years=2020, countries='DE', data_path=panel_data,
+                                      metrics=metrics, workers=1)
+        df = nam_loader.load_country_year('DE', 2020, data_path=panel_data, set_j='P6')
+        assert panel['exports'].iloc[0] == pytest.approx(df['value'].sum())
+        # Restricts both axes, so the sidecar cannot answer it and the partition is read
+        df = nam_loader.load_country_year('DE', 2020, data_path=panel_data, set_i='D11')
+        expected = df.loc[df['Set_j'].str.startswith('A'), 'value'].sum()
+        assert expected != 0
+        assert panel['foreign_wages'].iloc[0] == pytest.approx(expected)
+
+
+class TestRegions:
+    """Test region totals stored alongside the country rows."""
+
+    REGIONS = {'ALPS': ['AT', 'DE'], 'EU27': nam_regions.EU27, 'TRIO': ['FR', 'DE', 'AT']}
+
+    def test_region_rows_sum_members(self, panel_data):
+        panel = nam_panel.build_panel(data_path=panel_data, workers=1, regions=self.REGIONS)
+        assert panel['country'].tolist()[9:] == ['ALPS'] * 3 + ['TRIO'] * 3
+        alps = nam_panel.country_series(panel, 'ALPS')
+        at = nam_panel.country_series(panel, 'AT')
+        de = nam_panel.country_series(panel, 'DE')
+        assert alps['year'].tolist() == [2018, 2019, 2020]
+        for name in nam_metrics.TIME_SERIES_METRICS:
+            assert alps[name].tolist() == pytest.approx((at[name] + de[name]).tolist())
+
+    def test_incomplete_regions_are_left_out(self, panel_data):
+        panel = nam_panel.build_panel(countries=['AT', 'FR'], data_path=panel_data, workers=1,
+                                      regions=self.REGIONS)
+        assert sorted(panel['country'].unique()) == ['AT', 'FR']
+        assert nam_regions.region_of('DE', ['TRIO', 'ALPS'], self.REGIONS) == 'TRIO'
+        assert nam_regions.region_of('US', regions=self.REGIONS) is None
+
+    def test_regions_in_provenance(self, panel_data, tmp_path):
+        panel = nam_panel.build_panel(years=2019, data_path=panel_data, workers=1,
+                                      regions=self.REGIONS)
+        path = nam_panel.write_panel(panel, tmp_path / 'panel.parquet', panel_data,
+                                     regions=self.REGIONS)
+        assert nam_panel.load_panel(path, panel_data, regions=self.REGIONS).equals(panel)
+        assert nam_panel.load_panel(path, panel_data) is None
@@ -0,0 +1,37 @@
+"""Tests for the process-pool map-reduce executor."""
+import pyarrow.compute as pc
+
+import nam_loader
+import nam_parallel
+
+KEYS = [(y, c) for y in (2018, 2019, 2020) for c in ('AT', 'DE', 'FR')]
+
+
+def negatives(year, ctr, data_path):
+    return nam_loader.load_country_year(ctr, year, columns=nam_loader.ALL_COLUMNS,
+                                        data_path=data_path, filter=pc.field('value') < 0)
+
+
+def total(year, ctr, data_path):
+    return year, ctr, nam_loader.load_country_year(ctr, year, data_path=data_path)['value'].sum()
+
+
+class TestExecutor:
+    """Test the pool against the serial path."""
+
+    def test_results_in_input_order(self, nam_data):
+        pooled = nam_parallel.map_partitions(total, KEYS, workers=2, data_path=nam_data)
+        serial = nam_parallel.map_partitions(total, KEYS, workers=1, data_path=nam_data)
+        assert [r[:2] for r in pooled] == KEYS
+        assert pooled == serial
+
+    def test_map_reduce_concat(self, nam_data):
+        merged = nam_parallel.map_reduce(negatives, KEYS, nam_parallel.concat_frames,
+                                         workers=2, data_path=nam_data)
+        ref = nam_loader.load(data_path=nam_data, filter=pc.field('value') < 0)
+        assert len(merged) == len(ref)
+        assert (merged['value'] < 0).all()
+
+    def test_empty_partitions(self):
+        assert nam_parallel.map_partitions(total, [], data_path=None) == []
+        assert nam_parallel.concat_frames([]).empty
@@ -0,0 +1,50 @@
+"""Tests for the FigaroDataset query API."""
+import pandas as pd
+import pytest
+
+import nam_loader
+from nam_query import FigaroDataset
+
+
+class TestQuery:
+    """Test query verbs against direct loads and the scan plan."""
+
+    def test_group_by_matches_pandas(self, nam_data):
+        nam = FigaroDataset(nam_data)
+        result = nam.query(years=2019, ctr='DE', set_i_prefix='CPA_', domestic=True).group_by('Set_j').sum()
+        df = nam_loader.load_country_year('DE', 2019, data_path=nam_data)
+        df = df[df['Set_i'].str.startswith('CPA_') & (df['m'] == 'DE')]
+        expected = df.groupby('Set_j')['value'].sum()
+        pd.testing.assert_series_equal(result.rename_axis('Set_j'), expected)
+
+    def test_agg_falls_back_to_pandas(self, nam_data):
+        grouped = FigaroDataset(nam_data).query(years=2019, set_j='P6').group_by('ctr', 'm')
+        result = grouped.agg('sum', 'median', 'nunique')
+        df = nam_loader.load(years=2019, set_j='P6', data_path=nam_data)
+        expected = df.groupby(['ctr', 'm'])['value'].agg(['sum', 'median', 'nunique'])
+        pd.testing.assert_frame_equal(result, expected)
+        pd.testing.assert_frame_equal(result[['sum']], grouped.agg('sum'))
+
+    def test_sum_and_count(self, nam_data):
+        query = FigaroDataset(nam_data).query(years=[2018, 2020], set_j='P6', domestic=False)
+        df = nam_loader.load(years=[2018, 2020], data_path=nam_data)
+        df = df[(df['Set_j'] == 'P6') & (df['m'] != df['ctr'])]
+        assert query.sum() == pytest.approx(df['value'].sum())
+        assert query.count() == len(df)
+
+    def test_partner_group_by(self, nam_data):
+        exports = FigaroDataset(nam_data).query(years=2019, m='DE', domestic=False).group_by('ctr').sum()
+        assert list(exports.index) == ['AT', 'FR']
+
+    def test_unknown_predicate(self, nam_data):
+        with pytest.raises(TypeError):
+            FigaroDataset(nam_data).query(years=2019, setj='P6')
+
+    def test_plan_prunes_partitions(self, nam_data):
+        nam = FigaroDataset(nam_data)
+        plan = nam.query(years=2019, ctr=['AT', 'DE']).plan()
+        assert sorted(plan['file']) == ['base=2019/ctr=AT', 'base=2019/ctr=DE']
+        narrow = nam.query(years=2019, ctr='DE', set_j='P6').select('value').plan()
+        assert narrow['bytes_read'].sum() < plan[plan['file'] == 'base=2019/ctr=DE']['bytes_read'].sum()
+        assert 'base=2019/ctr=DE' in nam.query(years=2019, ctr='DE').explain()
+        assert 'No partitions match' in nam.query(years=1999).explain()
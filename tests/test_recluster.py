@@ -0,0 +1,46 @@
+"""Tests for the re-clustered parquet layout and row-group skipping."""
+import shutil
+
+import pandas as pd
+import pytest
+
+import nam_loader
+import nam_recluster
+from tests.conftest import make_partition
+
+
+@pytest.fixture(scope='module')
+def clustered(nam_data, tmp_path_factory):
+    root = tmp_path_factory.mktemp('clustered') / 'parquet'
+    shutil.copytree(nam_data, root)
+    report = nam_recluster.recluster(root, row_group_size=16)
+    return root, report
+
+
+class TestRecluster:
+    """Test the rewrite and the skip report."""
+
+    def test_sorted_and_lossless(self, clustered):
+        root, _ = clustered
+        path = nam_loader.partition_path('DE', 2019, root)
+        assert nam_recluster.is_clustered(path, row_group_size=16)
+        df = pd.read_parquet(path)
+        assert df.equals(df.sort_values(nam_recluster.SORT_COLUMNS).reset_index(drop=True))
+        ref = make_partition(2019, 'DE').sort_values(nam_recluster.SORT_COLUMNS)
+        assert df['value'].tolist() == ref['value'].tolist()
+
+    def test_report_counts_skipped_groups(self, clustered):
+        _, report = clustered
+        summary = nam_recluster.summarize(report).set_index(['probe', 'stage'])
+        assert summary.loc[("Set_i == 'D11'", 'before'), 'row_groups_skipped'] == 0
+        assert summary.loc[("Set_i == 'D11'", 'after'), 'row_groups_skipped_pct'] > 50
+        assert summary.loc[("Set_i starts with 'CPA_'", 'after'), 'bytes_skipped'] > 0
+
+    def test_pruned_categorical_load_matches(self, clustered, nam_data):
+        root, _ = clustered
+        for predicates in ({'set_i': 'D11', 'domestic': True}, {'set_i_prefix': 'CPA_'}):
+            pruned = nam_loader.load_country_year('AT', 2020, data_path=root, categorical=True,
+                                                  **predicates)
+            full = nam_loader.load_country_year('AT', 2020, data_path=nam_data, **predicates)
+            assert len(pruned) == len(full)
+            assert pruned['value'].sum() == pytest.approx(full['value'].sum())
@@ -0,0 +1,50 @@
+"""Tests for the sparse hierarchical rollups."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import nam_rollup
+from nam_rollup import aggregation_operator, rollup, rollup_array
+
+
+class TestRollup:
+    """Test rollups against string-prefix group-bys."""
+
+    def test_section_rollup_matches_groupby(self):
+        codes = ['C29', 'C10-C12', 'A01', 'G46', 'D11', 'CPA_C29']
+        series = pd.Series([1.0, 2.0, 4.0, np.nan, 100.0, 8.0], index=codes)
+        result = rollup(series, 'nace_section')
+        assert result.to_dict() == {'A': 4.0, 'C': 11.0, 'G': 0.0}
+        assert result.index.name == 'nace_section'
+
+    def test_prefix_grouping_first_match(self):
+        grouping = {'Vehicles': ['CPA_C29'], 'Manufacturing': ['CPA_C'], 'Other': ['']}
+        series = pd.Series([1.0, 2.0, 3.0], index=['CPA_C29', 'CPA_C20', 'D11'])
+        assert rollup(series, grouping).to_dict() == {'Vehicles': 1.0, 'Manufacturing': 2.0,
+                                                      'Other': 3.0}
+
+    def test_frame_and_array_axes(self):
+        frame = pd.DataFrame(np.arange(6.0).reshape(2, 3), index=['CPA_A01', 'CPA_G46'],
+                             columns=['A01', 'G47', 'K64'])
+        by_column = rollup(frame, 'broad_sector', axis=1)
+        assert list(by_column.columns) == ['Agriculture', 'Services']
+        assert by_column.loc['CPA_G46', 'Services'] == 9.0
+        rolled, groups = rollup_array(frame.to_numpy()[None], frame.index, 'broad_sector', axis=1)
+        assert rolled.shape == (1, 2, 3)
+        np.testing.assert_array_equal(rolled[0], rollup(frame, 'broad_sector').to_numpy())
+
+    def test_operator_is_sparse_and_cached(self):
+        matrix, groups = aggregation_operator(['C29', 'C20', 'B'], 'nace_section')
+        assert matrix.nnz == 3 and list(groups) == ['B', 'C']
+        assert aggregation_operator(['C29', 'C20', 'B'], 'nace_section')[0] is matrix
+        with pytest.raises(KeyError):
+            aggregation_operator(['C29'], 'no_such_grouping')
+
+    def test_custom_grouping_in_config(self, monkeypatch):
+        monkeypatch.setitem(nam_rollup.GROUPINGS, 'energy', {'Energy': ['D35', 'CPA_D35']})
+        series = pd.Series([5.0, 1.0], index=['D35', 'C29'])
+        assert rollup(series, 'energy').to_dict() == {'Energy': 5.0}
+        monkeypatch.setitem(nam_rollup.GROUPINGS, 'energy', {'Energy': ['D35', 'CPA_D35', 'C29']})
+        assert rollup(series, 'energy').to_dict() == {'Energy': 6.0}
+        nam_rollup.GROUPINGS['energy']['Energy'].remove('C29')
+        assert rollup(series, 'energy').to_dict() == {'Energy': 5.0}
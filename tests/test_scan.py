@@ -0,0 +1,106 @@
+"""Tests for the shared-scan framework."""
+import importlib
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import nam_engine
+import nam_loader
+import nam_parallel
+import nam_scan
+
+
+class RowCount(nam_scan.Consumer):
+    name = 'rows'
+    columns = ['value']
+
+    def on_partition(self, df, ctr, year):
+        return len(df)
+
+    def merge(self, partials):
+        return sum(partials.values())
+
+
+class Negatives(nam_scan.Consumer):
+    name = 'negatives'
+
+    def partitions(self, available):
+        return [(2019, 'DE'), (2020, 'FR'), (2099, 'XX')]
+
+    def on_partition(self, df, ctr, year):
+        return df[df['value'] < 0]
+
+    def merge(self, partials):
+        return list(partials), nam_parallel.concat_frames(partials.values())
+
+
+class TestSharedScan:
+    """Test that consumers see the partitions they asked for, read once."""
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_results_match_direct_reads(self, nam_data, workers):
+        results = nam_scan.run([RowCount(), Negatives()], nam_data, workers=workers)
+        assert results['rows'] == len(nam_loader.load(data_path=nam_data))
+        visited, negatives = results['negatives']
+        assert visited == [(2019, 'DE'), (2020, 'FR')]
+        expected = nam_loader.load(ctr=['DE', 'FR'], years=[2019, 2020], data_path=nam_data)
+        keep = expected[(expected['value'] < 0) & (
+            ((expected['ctr'] == 'DE') & (expected['base'] == 2019)) |
+            ((expected['ctr'] == 'FR') & (expected['base'] == 2020)))]
+        assert len(negatives) == len(keep)
+        assert negatives['value'].sum() == pytest.approx(keep['value'].sum())
+
+    def test_each_partition_read_once(self, nam_data, monkeypatch):
+        reads = []
+        load = nam_loader.load_country_year
+
+        def counting_load(ctr, year, *args, **kwargs):
+            reads.append((year, ctr))
+            return load(ctr, year, *args, **kwargs)
+
+        monkeypatch.setattr(nam_loader, 'load_country_year', counting_load)
+        nam_scan.run([RowCount(), Negatives()], nam_data, workers=1)
+        assert sorted(reads) == sorted(nam_loader.list_partitions(data_path=nam_data))
+
+    def test_duplicate_names_rejected(self, nam_data):
+        with pytest.raises(ValueError):
+            nam_scan.run([RowCount(), RowCount()], nam_data, workers=1)
+
+
+class TestScriptConsumers:
+    """Test the scripts' consumers on the fixture, which lacks most requested partitions."""
+
+    def test_merged_grids_match_standalone_paths(self, nam_data, tmp_path, monkeypatch):
+        # The scripts create outputs/ relative to the working directory on import
+        monkeypatch.chdir(tmp_path)
+        (tmp_path / 'outputs' / 'tables').mkdir(parents=True)
+        (tmp_path / 'outputs' / 'figures').mkdir()
+        modules = {name: importlib.import_module(name) for name in nam_scan.EXPLORATION_SCRIPTS}
+        results = nam_scan.run([c for m in modules.values() for c in m.consumers()], nam_data,
+                               workers=1)
+
+        top_flows = modules['02_top_flows']
+        rows = results['top_flows']['rows']
+        assert list(rows) == top_flows.SAMPLE_COUNTRIES
+        metrics = nam_engine.PandasEngine().metric_rows(
+            [(top_flows.SAMPLE_YEAR, ctr) for ctr in top_flows.SAMPLE_COUNTRIES], nam_data)
+        for row in metrics:
+            for metric, column in top_flows.SUMMARY_COLUMNS.items():
+                assert rows[row['country']][column] == pytest.approx(row[metric])
+
+        temporal = modules['03_temporal_analysis']
+        monkeypatch.setattr(temporal, 'DATA_PATH', nam_data)
+        series = results['temporal']['series']
+        pd.testing.assert_frame_equal(series['DE'], temporal.build_time_series('DE', 'pandas'))
+        assert list(series['IT']['year']) == temporal.YEARS
+        assert results['temporal']['sectors'][2022].empty
+
+        baseline = modules['05_baseline_trend']
+        monkeypatch.setattr(baseline, 'DATA_PATH', nam_data)
+        monkeypatch.setattr(baseline, 'NAM', baseline.FigaroDataset(nam_data))
+        totals = results['baseline']
+        assert len(totals) == len(baseline.SAMPLE_COUNTRIES) * len(range(2010, 2021))
+        for partition in [(2019, 'DE'), (2015, 'DE'), (2020, 'IT')]:
+            expected = baseline.load_key_aggregates(*partition)
+            np.testing.assert_allclose(list(totals[partition].values()), list(expected.values()))
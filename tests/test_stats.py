@@ -0,0 +1,78 @@
+"""Tests for the online (streaming) accumulators."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import nam_loader
+from nam_stats import ExactQuantiles, GroupedStats, QuantileSketch, RunningStats
+
+
+class TestAccumulators:
+    """Test batch-wise accumulation against pandas on the whole dataset."""
+
+    def test_running_stats_match_pandas(self, nam_data):
+        df = nam_loader.load(data_path=nam_data)
+        stats = RunningStats()
+        for batch in nam_loader.open_dataset(data_path=nam_data).to_batches(batch_size=100):
+            stats.update(batch.column('value').to_numpy())
+        values = df['value']
+        assert stats.count == len(values)
+        assert stats.mean == pytest.approx(values.mean())
+        assert stats.std == pytest.approx(values.std())
+        assert (stats.min, stats.max) == (values.min(), values.max())
+        assert stats.negatives == (values < 0).sum()
+
+    def test_grouped_stats_match_groupby(self, nam_data):
+        df = nam_loader.load(data_path=nam_data, categorical=True)
+        grouped = GroupedStats()
+        for start in range(0, len(df), 250):
+            chunk = df.iloc[start:start + 250]
+            grouped.update([chunk['ctr'], chunk['Set_i']], chunk['value'])
+        result = grouped.result()
+        ref = df.groupby(['ctr', 'Set_i'], observed=True)['value'].agg(['count', 'sum', 'mean', 'std'])
+        result.index = result.index.set_levels([level.astype(str) for level in result.index.levels])
+        ref.index = ref.index.set_levels([level.astype(str) for level in ref.index.levels])
+        pd.testing.assert_frame_equal(result.sort_index(), ref.sort_index(), check_dtype=False)
+
+    def test_merge_equals_single_pass(self):
+        rng = np.random.default_rng(0)
+        values = rng.normal(10, 3, 1000)
+        whole = RunningStats().update(values)
+        parts = RunningStats().update(values[:300]).merge(RunningStats().update(values[300:]))
+        assert parts.count == whole.count
+        assert parts.variance == pytest.approx(whole.variance)
+        assert np.isnan(RunningStats().update([np.nan]).mean)
+
+
+class TestQuantileSketch:
+    """Test the KLL sketch against exact quantiles."""
+
+    QUANTILES = [0.01, 0.25, 0.5, 0.75, 0.95, 0.99]
+
+    def test_rank_error_within_bound(self):
+        values = np.random.default_rng(3).lognormal(0, 2, 500_000)
+        sketch = QuantileSketch(k=200)
+        for chunk in np.array_split(values, 9):
+            sketch.update(chunk)
+        ranks = np.searchsorted(np.sort(values), sketch.quantile(self.QUANTILES), side='right')
+        assert np.abs(ranks / len(values) - self.QUANTILES).max() < 0.0165
+        assert len(sketch) < 2000
+
+    def test_merged_partitions_within_bound(self):
+        values = np.random.default_rng(4).normal(0, 1, 300_000)
+        sketches = [QuantileSketch(seed=i).update(part)
+                    for i, part in enumerate(np.array_split(values, 100))]
+        merged = sketches[0]
+        for sketch in sketches[1:]:
+            merged.merge(sketch)
+        assert merged.count == len(values)
+        assert (merged.quantile(0), merged.quantile(1)) == (values.min(), values.max())
+        for q in self.QUANTILES:
+            assert abs(merged.rank(merged.quantile(q)) - q) < 0.0165
+            assert abs((values <= merged.quantile(q)).mean() - q) < 0.0165
+
+    def test_exact_mode_matches_pandas(self, nam_data):
+        values = nam_loader.load(data_path=nam_data)['value']
+        exact = ExactQuantiles().update(values[:500]).merge(ExactQuantiles().update(values[500:]))
+        assert list(exact.quantile(self.QUANTILES)) == [values.quantile(q) for q in self.QUANTILES]
+        assert exact.rank(0) == (values <= 0).mean()
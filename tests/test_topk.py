@@ -0,0 +1,43 @@
+"""Tests for the bounded-heap top-k flow finder."""
+import numpy as np
+import pandas as pd
+import pytest
+
+import nam_loader
+from nam_topk import FLOW_COLUMNS, TopK, select_top, top_flows
+
+
+@pytest.fixture
+def flows(nam_data):
+    """All rows of the synthetic dataset with plain string codes."""
+    return nam_loader.load(data_path=nam_data)[FLOW_COLUMNS]
+
+
+class TestTopK:
+    """Test top-k selection against a full sort."""
+
+    def test_select_top(self):
+        scores = np.array([3.0, np.nan, 7.0, 7.0, -1.0, 5.0])
+        assert select_top(scores, 3).tolist() == [2, 3, 5]
+        assert select_top(scores, 10).tolist() == [2, 3, 5, 0, 4, 1]
+
+    @pytest.mark.parametrize('workers', [1, 2])
+    def test_top_flows_across_partitions(self, nam_data, flows, workers):
+        result = top_flows(15, data_path=nam_data, workers=workers)
+        expected = flows.loc[flows['value'].abs().sort_values(ascending=False).index[:15]]
+        np.testing.assert_allclose(result['value'], expected['value'])
+        assert list(result.columns) == FLOW_COLUMNS
+
+    def test_top_flows_per_group(self, nam_data, flows):
+        result = top_flows(2, years=2019, by=['base', 'ctr'], absolute=False,
+                           data_path=nam_data, set_j='P6')
+        rows = flows[(flows['base'] == 2019) & (flows['Set_j'] == 'P6')]
+        expected = rows.sort_values('value', ascending=False).groupby('ctr').head(2)
+        expected = expected.sort_values(['ctr', 'value'], ascending=[True, False])
+        assert result['ctr'].tolist() == expected['ctr'].tolist()
+        np.testing.assert_allclose(result['value'], expected['value'])
+
+    def test_merge_matches_single_update(self, flows):
+        halves = TopK(10).update(flows.iloc[::2]).merge(TopK(10).update(flows.iloc[1::2]))
+        whole = TopK(10).update(flows).result()
+        pd.testing.assert_series_equal(halves.result()['value'].abs(), whole['value'].abs())